@@ -1,209 +1,413 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 
-# Read the Excel file from parent directory
+# Make the shared helpers in Analysis/common importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.bootstrap import bootstrap_mean_ci, mean_score
+from common.fingerprint import source_fingerprint
+from common.incremental import score_incrementally
+from common.loader import load_qualtrics_export
+from common.memo import code_version, load_stage, save_stage, stage_key
+from common.output import ResultWriter, replay_tables
+from common.parsing import explode_aligned, parse_delimited_numeric, split_delimited
+from common.stages import NO_TIMER, timer_from_argv
+from common.summary import ci_rows, render_summary, stat_rows
+from common.trial_store import TrialStore, cached_trial_store
+
+# Read the Excel file from parent directory (parsed once, then served from a cache)
 file_name = "../1_values_excel.xlsx"
-df = pd.read_excel(file_name, header=0, skiprows=[1, 2])
-
-# ============================================================================
-# AST ANALYSIS - Reverse-Scored Pleasantness Ratings
-# ============================================================================
-# Formula: Reverse score = 10 - original score
-# Calculate mean of all reverse-scored items
-
-ast_results = []
-coding_data = []
-subject_number = 1
-
-for idx, row in df.iterrows():
-    participant_id = row['ResponseId']
-    main_ratings = row['main_pleasantness_ratings']
-    main_descriptions = row['main_outcome_descriptions']
-
-    # Parse ratings
-    if pd.isna(main_ratings):
-        ratings_list = []
-    else:
-        ratings_list = str(main_ratings).split(';')
 
-    # Parse descriptions
-    if pd.isna(main_descriptions):
-        descriptions_list = []
-    else:
-        descriptions_list = str(main_descriptions).split('|')
-
-    # Reverse score ratings: 10 - x
-    reverse_scored_ratings = []
-    for rating in ratings_list:
-        try:
-            original_score = float(rating.strip())
-            reverse_score = 10 - original_score
-            reverse_scored_ratings.append(reverse_score)
-        except (ValueError, AttributeError):
-            reverse_scored_ratings.append(np.nan)
-
-    # Calculate mean of reverse-scored ratings
-    valid_reverse_scores = [score for score in reverse_scored_ratings if not pd.isna(score)]
-
-    if len(valid_reverse_scores) > 0:
-        mean_reverse_score = np.mean(valid_reverse_scores)
-        has_ratings_data = True
-    else:
-        mean_reverse_score = np.nan
-        has_ratings_data = False
-
-    # Check if descriptions are valid (not just x, -, ?, etc.)
-    valid_descriptions = []
-    invalid_markers = ['x', '-', '?', 'nan', '']
-
-    for desc in descriptions_list:
-        desc_clean = str(desc).strip().lower()
-        # Consider valid if it has more than 2 characters and isn't just a marker
-        if len(desc_clean) > 2 and desc_clean not in invalid_markers:
-            valid_descriptions.append(str(desc).strip())
+# Export columns the AST scores are computed from
+AST_SOURCE_COLUMNS = ['main_pleasantness_ratings', 'main_outcome_descriptions']
+
+# All export columns the analysis reads; the loader materializes only these
+REQUIRED_COLUMNS = ['ResponseId'] + AST_SOURCE_COLUMNS
+
+# Columns holding the task's responses; rows without any are participants
+# who did not do the task
+DATA_COLUMNS = AST_SOURCE_COLUMNS
+
+
+def ast_trial_store(df):
+    """
+    Return the parsed pleasantness ratings as a TrialStore, re-using the
+    memory-mapped store from an earlier run when the source column is unchanged
+    """
+    def build():
+        trials, n_trials = explode_aligned({
+            'rating': parse_delimited_numeric(df['main_pleasantness_ratings'], ';', skip_blank_cells=False)
+        })
+        return TrialStore.from_trials(trials, n_trials, participant_ids=df['ResponseId'])
+
+    return cached_trial_store(df, 'ast', ['main_pleasantness_ratings'], build)
+
+
+def ast_rating_components(store):
+    """
+    Per-rating terms of the mean reverse-scored rating (see
+    common/bootstrap.py): the reverse-scored rating and whether it is valid
+    """
+    rating = store.fields['rating']
+    valid = ~np.isnan(rating)
+    return np.column_stack([np.where(valid, 10 - rating, 0.0), valid])
+
+
+def score_ast_legacy(df):
+    """
+    Score the AST with the original per-participant loop
+
+    Returns the participant-level results and the coding template. Ratings
+    are parsed cell by cell, independently of common/parsing.py, so this
+    engine stays a reference for the trial store the vectorized engine reads.
+    """
+    ast_results = []
+    coding_data = []
+    subject_number = 1
+
+    for idx, row in df.iterrows():
+        participant_id = row['ResponseId']
+        main_ratings = row['main_pleasantness_ratings']
+        main_descriptions = row['main_outcome_descriptions']
+
+        # Parse ratings
+        if pd.isna(main_ratings):
+            ratings_list = []
         else:
-            valid_descriptions.append(None)
+            ratings_list = str(main_ratings).split(';')
+
+        # Parse descriptions
+        if pd.isna(main_descriptions):
+            descriptions_list = []
+        else:
+            descriptions_list = str(main_descriptions).split('|')
+
+        # Reverse score ratings: 10 - x
+        reverse_scored_ratings = []
+        for rating in ratings_list:
+            try:
+                original_score = float(rating.strip())
+                reverse_score = 10 - original_score
+                reverse_scored_ratings.append(reverse_score)
+            except (ValueError, AttributeError):
+                reverse_scored_ratings.append(np.nan)
+
+        # Calculate mean of reverse-scored ratings
+        valid_reverse_scores = [score for score in reverse_scored_ratings if not pd.isna(score)]
+
+        if len(valid_reverse_scores) > 0:
+            mean_reverse_score = np.mean(valid_reverse_scores)
+            has_ratings_data = True
+        else:
+            mean_reverse_score = np.nan
+            has_ratings_data = False
+
+        # Check if descriptions are valid (not just x, -, ?, etc.)
+        valid_descriptions = []
+        invalid_markers = ['x', '-', '?', 'nan', '']
+
+        for desc in descriptions_list:
+            desc_clean = str(desc).strip().lower()
+            # Consider valid if it has more than 2 characters and isn't just a marker
+            if len(desc_clean) > 2 and desc_clean not in invalid_markers:
+                valid_descriptions.append(str(desc).strip())
+            else:
+                valid_descriptions.append(None)
+
+        has_description_data = any(d is not None for d in valid_descriptions)
+
+        # Store results
+        ast_results.append({
+            'ResponseId': participant_id,
+            'Mean_Reverse_Scored_Rating': mean_reverse_score,
+            'Total_Ratings': len(ratings_list),
+            'Valid_Ratings': len(valid_reverse_scores),
+            'Total_Descriptions': len(descriptions_list),
+            'Valid_Descriptions': sum(1 for d in valid_descriptions if d is not None),
+            'Has_Ratings_Data': 'Yes' if has_ratings_data else 'No',
+            'Has_Description_Data': 'Yes' if has_description_data else 'No'
+        })
+
+        # Prepare coding template data (only if participant has valid descriptions)
+        if has_description_data:
+            for desc_idx, description in enumerate(descriptions_list, 1):
+                desc_clean = str(description).strip()
+                # Add to coding template even if individual description might be invalid
+                # Coders can mark these as unclear if needed
+                coding_data.append({
+                    'Subject': subject_number,
+                    'Main_Outcome_Descriptions': desc_clean,
+                    'Coder_1': '',
+                    'Coder_2': '',
+                    'Final': '',
+                    'Coder_3': ''
+                })
+            subject_number += 1
+
+    ast_results_df = pd.DataFrame(ast_results)
+    coding_template_df = pd.DataFrame(coding_data)
+
+    return ast_results_df, coding_template_df
+
+
+# Description markers that do not count as a usable outcome description
+INVALID_MARKERS = ['x', '-', '?', 'nan', '']
+
+
+def score_ast(df, store=None):
+    """
+    Score the AST for all participants at once
+
+    Ratings come from the trial store and descriptions are exploded in one
+    pass; reverse scores, validity masks and the coding template (with its
+    sequential Subject numbers) are computed with column operations. Output
+    matches score_ast_legacy; store is the parsed ratings (built from df when
+    not given).
+    """
+    n_rows = len(df)
 
-    has_description_data = any(d is not None for d in valid_descriptions)
+    # Reverse score ratings: 10 - x (blank or non-numeric ratings are NaN)
+    ratings = (ast_trial_store(df) if store is None else store).ragged('rating')
+    reverse_scored = 10 - np.asarray(ratings.values)
+    valid_rating = ~np.isnan(reverse_scored)
+    rating_rows = ratings.row_ids
 
-    # Store results
-    ast_results.append({
-        'ResponseId': participant_id,
+    valid_ratings = np.bincount(rating_rows, weights=valid_rating, minlength=n_rows).astype(np.int64)
+    reverse_sum = np.bincount(rating_rows[valid_rating], weights=reverse_scored[valid_rating], minlength=n_rows)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_reverse_score = np.where(valid_ratings > 0, reverse_sum / np.maximum(valid_ratings, 1), np.nan)
+
+    # Descriptions are '|'-separated; stripped tokens are what coders see
+    descriptions = split_delimited(df['main_outcome_descriptions'], '|', skip_blank_cells=False)
+    description_text = pd.Series(descriptions.values, dtype=object).fillna('')
+    description_rows = descriptions.row_ids
+
+    # Valid if it has more than 2 characters and isn't just a marker
+    valid_description = ((description_text.str.len() > 2)
+                         & ~description_text.str.lower().isin(INVALID_MARKERS)).to_numpy()
+    valid_descriptions = np.bincount(description_rows, weights=valid_description, minlength=n_rows).astype(np.int64)
+    has_ratings_data = valid_ratings > 0
+    has_description_data = valid_descriptions > 0
+
+    ast_results_df = pd.DataFrame({
+        'ResponseId': df['ResponseId'].to_numpy(),
         'Mean_Reverse_Scored_Rating': mean_reverse_score,
-        'Total_Ratings': len(ratings_list),
-        'Valid_Ratings': len(valid_reverse_scores),
-        'Total_Descriptions': len(descriptions_list),
-        'Valid_Descriptions': sum(1 for d in valid_descriptions if d is not None),
-        'Has_Ratings_Data': 'Yes' if has_ratings_data else 'No',
-        'Has_Description_Data': 'Yes' if has_description_data else 'No'
+        'Total_Ratings': ratings.lengths,
+        'Valid_Ratings': valid_ratings,
+        'Total_Descriptions': descriptions.lengths,
+        'Valid_Descriptions': valid_descriptions,
+        'Has_Ratings_Data': np.where(has_ratings_data, 'Yes', 'No').astype(object),
+        'Has_Description_Data': np.where(has_description_data, 'Yes', 'No').astype(object)
     })
 
-    # Prepare coding template data (only if participant has valid descriptions)
-    if has_description_data:
-        for desc_idx, description in enumerate(descriptions_list, 1):
-            desc_clean = str(description).strip()
-            # Add to coding template even if individual description might be invalid
-            # Coders can mark these as unclear if needed
-            coding_data.append({
-                'Subject': subject_number,
-                'Main_Outcome_Descriptions': desc_clean,
-                'Coder_1': '',
-                'Coder_2': '',
-                'Final': '',
-                'Coder_3': ''
-            })
-        subject_number += 1
-
-ast_results_df = pd.DataFrame(ast_results)
-coding_template_df = pd.DataFrame(coding_data)
-
-# ============================================================================
-# CALCULATE SUMMARY STATISTICS FOR REVERSE-SCORED RATINGS
-# ============================================================================
-
-valid_participants = ast_results_df[ast_results_df['Mean_Reverse_Scored_Rating'].notna()]
-
-if len(valid_participants) > 0:
-    summary_data = {
-        'Metric': [
-            'Total Participants',
-            'Participants with Valid Ratings',
-            'Participants with Missing Ratings',
-            None,
-            'Mean Reverse-Scored Rating - Mean',
-            'Mean Reverse-Scored Rating - SD',
-            'Mean Reverse-Scored Rating - Min',
-            'Mean Reverse-Scored Rating - Max',
-            'Mean Reverse-Scored Rating - Median',
-            None,
-            'Total Ratings per Participant - Mean',
-            'Valid Ratings per Participant - Mean',
-            None,
-            'Participants with Description Data',
-            'Participants without Description Data'
-        ],
-        'Value': [
-            str(len(ast_results_df)),
-            str(len(valid_participants)),
-            str(len(ast_results_df) - len(valid_participants)),
-            '',
-            f"{valid_participants['Mean_Reverse_Scored_Rating'].mean():.4f}",
-            f"{valid_participants['Mean_Reverse_Scored_Rating'].std():.4f}",
-            f"{valid_participants['Mean_Reverse_Scored_Rating'].min():.4f}",
-            f"{valid_participants['Mean_Reverse_Scored_Rating'].max():.4f}",
-            f"{valid_participants['Mean_Reverse_Scored_Rating'].median():.4f}",
-            '',
-            f"{valid_participants['Total_Ratings'].mean():.2f}",
-            f"{valid_participants['Valid_Ratings'].mean():.2f}",
-            '',
-            str(len(ast_results_df[ast_results_df['Has_Description_Data'] == 'Yes'])),
-            str(len(ast_results_df[ast_results_df['Has_Description_Data'] == 'No']))
-        ]
-    }
-else:
-    summary_data = {
-        'Metric': ['Total Participants', 'Participants with Valid Ratings'],
-        'Value': [str(len(ast_results_df)), '0']
-    }
-
-summary_df = pd.DataFrame(summary_data)
-
-# Combine participant results with summary
-results_sheet_df = pd.concat([
-    ast_results_df,
-    pd.DataFrame([{}]),  # Empty row separator
-    summary_df
-], ignore_index=True)
-
-# ============================================================================
-# DATA QUALITY REPORT
-# ============================================================================
-
-quality_data = []
-
-for idx, row in ast_results_df.iterrows():
-    quality_data.append({
-        'ResponseId': row['ResponseId'],
-        'Has_Ratings_Data': row['Has_Ratings_Data'],
-        'Total_Ratings': row['Total_Ratings'],
-        'Valid_Ratings': row['Valid_Ratings'],
-        'Has_Description_Data': row['Has_Description_Data'],
-        'Total_Descriptions': row['Total_Descriptions'],
-        'Valid_Descriptions': row['Valid_Descriptions'],
-        'Data_Status': 'Complete' if row['Has_Ratings_Data'] == 'Yes' and row['Has_Description_Data'] == 'Yes'
-                       else 'Partial' if row['Has_Ratings_Data'] == 'Yes' or row['Has_Description_Data'] == 'Yes'
-                       else 'No Data'
+    # Coding template: every description of participants with at least one
+    # valid description (coders can mark individual ones as unclear), with
+    # Subject numbering those participants 1, 2, ...
+    subject_numbers = np.cumsum(has_description_data)
+    coded = has_description_data[description_rows]
+    if not coded.any():
+        return ast_results_df, pd.DataFrame()
+
+    coding_template_df = pd.DataFrame({
+        'Subject': subject_numbers[description_rows[coded]],
+        'Main_Outcome_Descriptions': description_text.to_numpy()[coded],
+        'Coder_1': '',
+        'Coder_2': '',
+        'Final': '',
+        'Coder_3': ''
     })
 
-quality_df = pd.DataFrame(quality_data)
+    return ast_results_df, coding_template_df
+
+
+def score_ast_incrementally(df, score, engine):
+    """
+    Score only new or changed responses, re-using the stored results of the rest
+
+    Coding template rows are stored with their participant's ResponseId so they
+    can be re-used too; Subject numbers are then reassigned over the merged rows.
+    """
+    def score_with_ids(rows):
+        ast_results_df, coding_template_df = score(rows)
+        if len(coding_template_df) > 0:
+            coded_ids = ast_results_df.loc[ast_results_df['Has_Description_Data'] == 'Yes', 'ResponseId'].to_numpy()
+            coding_template_df = coding_template_df.assign(
+                ResponseId=coded_ids[coding_template_df['Subject'].to_numpy() - 1])
+        return ast_results_df, coding_template_df
+
+    ast_results_df, coding_template_df = score_incrementally(
+        df, 'ast', AST_SOURCE_COLUMNS, score_with_ids,
+        params={'engine': engine, 'code': source_fingerprint(__file__)})
+
+    if len(coding_template_df) == 0:
+        return ast_results_df, pd.DataFrame()
+
+    coding_template_df['Subject'] = pd.factorize(coding_template_df['ResponseId'])[0] + 1
+    return ast_results_df, coding_template_df.drop(columns='ResponseId')
+
+
+def run_ast_analysis(df, output_dir=".", engine="vectorized", incremental=False, timer=None,
+                     formats=('xlsx',), xlsx_engine="auto", memo=True, bootstrap=0, bootstrap_workers=1):
+    """
+    Run the AST analysis on a loaded Qualtrics DataFrame and write the
+    output files to output_dir
+
+    engine="legacy" scores with the original per-participant loop. With
+    incremental=True only responses that are new or changed since the last
+    run are scored (see common/incremental.py). With memo=True the scores and
+    result files of an earlier run on the same responses, with the same
+    parameters and code, are re-used (see common/memo.py).
+
+    With bootstrap=N the summary also gives a confidence interval of the mean
+    reverse-scored rating from N bootstrap resamples of participants and their
+    ratings (see common/bootstrap.py), spread over bootstrap_workers processes.
+
+    formats selects the result files to write ('xlsx', 'csv', 'parquet') and
+    xlsx_engine the workbook writer (see common/output.py).
+
+    timer (see common/stages.py) records the duration and memory use of each
+    stage of the run and writes them to ast_run_report.json in output_dir.
+    """
+    timer = timer or NO_TIMER
+    timer.start()
+
+    # ============================================================================
+    # AST ANALYSIS - Reverse-Scored Pleasantness Ratings
+    # ============================================================================
+    # Formula: Reverse score = 10 - original score
+    # Calculate mean of all reverse-scored items
+
+    score = score_ast_legacy if engine == "legacy" else score_ast
+    score_key = stage_key('ast', 'score', df, REQUIRED_COLUMNS, params={'engine': engine},
+                          code=code_version(score, ast_trial_store, score_ast_incrementally)) if memo else None
+    scores = load_stage(score_key)
+    reused = ['parse', 'score'] if scores is not None else []
+    if scores is None:
+        if incremental:
+            scores = score_ast_incrementally(df, score, engine)
+        else:
+            # The legacy engine parses the export cells itself
+            store = None if engine == "legacy" else ast_trial_store(df)
+            timer.lap('parse')
+            scores = score(df) if store is None else score(df, store)
+        save_stage(score_key, scores)
+    ast_results_df, coding_template_df = scores
+    timer.lap('score')
+    timer.count('rows', len(df))
+    timer.count('trials', ast_results_df['Total_Ratings'].sum())
+
+    # Summary and result files only change with the scores, this function's
+    # code and the output options
+    output_file = os.path.join(output_dir, "ast_analysis_results.xlsx")
+    report_key = stage_key('ast', 'report', params={'output_file': os.path.abspath(output_file),
+                                                    'formats': list(formats), 'xlsx_engine': xlsx_engine,
+                                                    'bootstrap': bootstrap},
+                           code=code_version(run_ast_analysis), upstream=score_key) if memo else None
+    tables = load_stage(report_key)
+    if tables is not None:
+        replay_tables(tables)
+        timer.lap('export')
+        timer.write_report(os.path.join(output_dir, "ast_run_report.json"),
+                           task='ast', engine=engine, incremental=incremental, reused=reused + ['report'])
+        print(f"AST results are up to date: {output_file}")
+        return
+
+    # ============================================================================
+    # CALCULATE SUMMARY STATISTICS FOR REVERSE-SCORED RATINGS
+    # ============================================================================
+
+    valid_participants = ast_results_df[ast_results_df['Mean_Reverse_Scored_Rating'].notna()]
+
+    # Bootstrap confidence interval of the mean (participants and their ratings resampled)
+    rating_ci = None
+    if bootstrap:
+        store = ast_trial_store(df)
+        rating_ci = bootstrap_mean_ci(ast_rating_components(store), store.offsets, mean_score,
+                                      n_resamples=bootstrap, workers=bootstrap_workers)
+        timer.lap('bootstrap')
+
+    if len(valid_participants) > 0:
+        summary_spec = [
+            ('Total Participants', str(len(ast_results_df))),
+            ('Participants with Valid Ratings', str(len(valid_participants))),
+            ('Participants with Missing Ratings', str(len(ast_results_df) - len(valid_participants))),
+            (None, ''),
+            *stat_rows('Mean Reverse-Scored Rating', 'Mean_Reverse_Scored_Rating', '.4f'),
+            *ci_rows('Mean Reverse-Scored Rating', rating_ci, '.4f'),
+            (None, ''),
+            ('Total Ratings per Participant - Mean', 'Total_Ratings', 'mean', '.2f'),
+            ('Valid Ratings per Participant - Mean', 'Valid_Ratings', 'mean', '.2f'),
+            (None, ''),
+            ('Participants with Description Data', str(len(ast_results_df[ast_results_df['Has_Description_Data'] == 'Yes']))),
+            ('Participants without Description Data', str(len(ast_results_df[ast_results_df['Has_Description_Data'] == 'No'])))
+        ]
+        summary_df = render_summary(valid_participants, summary_spec)
+    else:
+        summary_df = pd.DataFrame({
+            'Metric': ['Total Participants', 'Participants with Valid Ratings'],
+            'Value': [str(len(ast_results_df)), '0']
+        })
+
+    # Combine participant results with summary
+    results_sheet_df = pd.concat([
+        ast_results_df,
+        pd.DataFrame([{}]),  # Empty row separator
+        summary_df
+    ], ignore_index=True)
+
+    # ============================================================================
+    # DATA QUALITY REPORT
+    # ============================================================================
+
+    has_ratings = ast_results_df['Has_Ratings_Data'] == 'Yes'
+    has_descriptions = ast_results_df['Has_Description_Data'] == 'Yes'
+
+    quality_df = ast_results_df[['ResponseId', 'Has_Ratings_Data', 'Total_Ratings', 'Valid_Ratings',
+                                 'Has_Description_Data', 'Total_Descriptions', 'Valid_Descriptions']].copy()
+    quality_df['Data_Status'] = np.select([has_ratings & has_descriptions, has_ratings | has_descriptions],
+                                          ['Complete', 'Partial'], default='No Data').astype(object)
+
+    timer.lap('summarize')
+
+    # ============================================================================
+    # EXPORT RESULTS TO EXCEL
+    # ============================================================================
+
+    # Write to Excel with 3 sheets
+    with ResultWriter(output_file, formats, xlsx_engine) as writer:
+        # Sheet 1: Reverse-Scored Ratings (includes participant-level and summary)
+        writer.write(ast_results_df, 'Reverse-Scored Ratings')
 
-# ============================================================================
-# EXPORT RESULTS TO EXCEL
-# ============================================================================
+        # Add summary to same sheet with spacing
+        writer.write(summary_df, 'Reverse-Scored Ratings', startrow=len(ast_results_df) + 2,
+                     table_name='Reverse-Scored Summary')
 
-output_file = "ast_analysis_results.xlsx"
+        # Sheet 2: Data Quality Report
+        writer.write(quality_df, 'Data Quality')
 
-# Write to Excel with 3 sheets
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-    # Sheet 1: Reverse-Scored Ratings (includes participant-level and summary)
-    ast_results_df.to_excel(writer, sheet_name='Reverse-Scored Ratings', index=False)
+        # Sheet 3: Coding Template for manual coding
+        writer.write(coding_template_df, 'Coding Template')
+    save_stage(report_key, writer.tables, outputs=writer.files)
 
-    # Add summary to same sheet with spacing
-    summary_df.to_excel(writer, sheet_name='Reverse-Scored Ratings',
-                       startrow=len(ast_results_df) + 2, index=False)
+    timer.lap('export')
+    timer.write_report(os.path.join(output_dir, "ast_run_report.json"),
+                       task='ast', engine=engine, incremental=incremental, reused=reused)
 
-    # Sheet 2: Data Quality Report
-    quality_df.to_excel(writer, sheet_name='Data Quality', index=False)
+    print(f"AST analysis complete. Results saved to: {', '.join(writer.outputs)}")
+    print(f"\nSummary:")
+    print(f"  Total participants: {len(ast_results_df)}")
+    print(f"  Participants with valid ratings: {len(valid_participants)}")
+    if len(valid_participants) > 0:
+        print(f"  Mean reverse-scored rating: {valid_participants['Mean_Reverse_Scored_Rating'].mean():.4f} (SD: {valid_participants['Mean_Reverse_Scored_Rating'].std():.4f})")
+        print(f"  Range: {valid_participants['Mean_Reverse_Scored_Rating'].min():.4f} - {valid_participants['Mean_Reverse_Scored_Rating'].max():.4f}")
+    print(f"\n  Participants in coding template: {(ast_results_df['Has_Description_Data'] == 'Yes').sum()}")
+    print(f"  Total descriptions to code: {len(coding_template_df)}")
 
-    # Sheet 3: Coding Template for manual coding
-    coding_template_df.to_excel(writer, sheet_name='Coding Template', index=False)
 
-print(f"AST analysis complete. Results saved to: {output_file}")
-print(f"\nSummary:")
-print(f"  Total participants: {len(ast_results_df)}")
-print(f"  Participants with valid ratings: {len(valid_participants)}")
-if len(valid_participants) > 0:
-    print(f"  Mean reverse-scored rating: {valid_participants['Mean_Reverse_Scored_Rating'].mean():.4f} (SD: {valid_participants['Mean_Reverse_Scored_Rating'].std():.4f})")
-    print(f"  Range: {valid_participants['Mean_Reverse_Scored_Rating'].min():.4f} - {valid_participants['Mean_Reverse_Scored_Rating'].max():.4f}")
-print(f"\n  Participants in coding template: {subject_number - 1}")
-print(f"  Total descriptions to code: {len(coding_template_df)}")
+if __name__ == "__main__":
+    timer = timer_from_argv()
+    df = load_qualtrics_export(file_name, columns=REQUIRED_COLUMNS)
+    timer.lap('load')
+    run_ast_analysis(df, timer=timer)
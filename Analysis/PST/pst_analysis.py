@@ -1,220 +1,439 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 
-# Read the Excel file from parent directory
+# Make the shared helpers in Analysis/common importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.fingerprint import source_fingerprint
+from common.bootstrap import bootstrap_mean_ci, mean_difference
+from common.incremental import score_incrementally
+from common.loader import load_qualtrics_export
+from common.memo import code_version, load_stage, save_stage, stage_key
+from common.output import ResultWriter, replay_tables
+from common.reliability import split_half_reliability
+from common.parsing import explode_aligned, parse_delimited_numeric, split_delimited
+from common.stages import NO_TIMER, timer_from_argv
+from common.summary import ci_rows, reliability_rows, render_summary, stat_rows
+from common.trial_schema import ACCURACY, VALENCES
+from common.trial_store import TrialStore, cached_trial_store
+
+# Read the Excel file from parent directory (parsed once, then served from a cache)
 file_name = "../1_values_excel.xlsx"
-df = pd.read_excel(file_name, header=0, skiprows=[1, 2])
-
-# ============================================================================
-# PST ANALYSIS - RT Bias Index Calculation
-# ============================================================================
-# Only correctly resolved scenarios (main_word_accuracy == true) are included
-# Negative scenarios = anxiety + depression
-# Positive scenarios = positive
-# Formula: RT bias index = Negative mean RT - Positive mean RT
-# The smaller the RT bias index, the faster the formation of negative interpretations
-
-pst_results = []
-
-for idx, row in df.iterrows():
-    participant_id = row['ResponseId']
-    list_assignment = row['list_assignment']
-    main_scenarios_completed = row['main_scenarios_completed']
-
-    main_rts = row['main_reaction_times']
-    main_word_acc = row['main_word_accuracy']
-    main_comp_acc = row['main_comprehension_accuracy']
-    main_scenario_types = row['main_scenario_types']
-
-    # Check if participant has valid PST data
-    if pd.isna(main_rts) or pd.isna(main_scenario_types) or pd.isna(main_word_acc):
+
+
+PST_TRIAL_COLUMNS = ['main_reaction_times', 'main_word_accuracy', 'main_comprehension_accuracy',
+                     'main_scenario_types']
+
+# Fixed vocabularies of the categorical trial fields (see common/trial_schema.py)
+PST_VOCABULARIES = {'word_accuracy': ACCURACY, 'comprehension_accuracy': ACCURACY, 'scenario_type': VALENCES}
+
+# Export columns the PST scores are computed from
+PST_SOURCE_COLUMNS = ['list_assignment', 'main_scenarios_completed'] + PST_TRIAL_COLUMNS
+
+# All export columns the analysis reads; the loader materializes only these
+REQUIRED_COLUMNS = ['ResponseId'] + PST_SOURCE_COLUMNS
+
+# Columns holding the task's responses; rows without any are participants
+# who did not do the task
+DATA_COLUMNS = ['main_scenarios_completed'] + PST_TRIAL_COLUMNS
+
+
+def pst_trial_store(df):
+    """
+    Return the parsed PST trials as a TrialStore, re-using the memory-mapped
+    store from an earlier run when the source columns are unchanged
+
+    Values are split on semicolons with empty strings (e.g. from trailing
+    semicolons) filtered out, and aligned by index across the fields. Text
+    fields are stored as categoricals over PST_VOCABULARIES.
+    """
+    def build():
+        trials, n_trials = explode_aligned({
+            'rt': parse_delimited_numeric(df['main_reaction_times'], ';', drop_empty=True),
+            'word_accuracy': split_delimited(df['main_word_accuracy'], ';', drop_empty=True, lower=True),
+            'comprehension_accuracy': split_delimited(df['main_comprehension_accuracy'], ';', drop_empty=True, lower=True),
+            'scenario_type': split_delimited(df['main_scenario_types'], ';', drop_empty=True, lower=True)
+        })
+        return TrialStore.from_trials(trials, n_trials, participant_ids=df['ResponseId'],
+                                      vocabularies=PST_VOCABULARIES)
+
+    return cached_trial_store(df, 'pst', PST_TRIAL_COLUMNS, build)
+
+
+def pst_bias_components(store):
+    """
+    Per-trial terms of the RT bias index (see common/bootstrap.py): RT and
+    count of the correctly resolved negative trials, then of the positive ones
+    """
+    trials = store.to_frame()
+    valid = (trials['word_accuracy'] == 'true') & trials['rt'].notna() & trials['scenario_type'].notna()
+    negative = (valid & trials['scenario_type'].isin(['anxiety', 'depression'])).to_numpy()
+    positive = (valid & (trials['scenario_type'] == 'positive')).to_numpy()
+    rt = trials['rt'].to_numpy()
+    return np.column_stack([np.where(negative, rt, 0.0), negative, np.where(positive, rt, 0.0), positive])
+
+
+def score_pst_legacy(df):
+    """
+    Score the PST one participant at a time (reference implementation)
+
+    Cells are parsed one by one, independently of common/parsing.py, so this
+    engine stays a reference for the trial store the vectorized engine reads.
+    """
+    pst_results = []
+
+    for idx, row in df.iterrows():
+        participant_id = row['ResponseId']
+        list_assignment = row['list_assignment']
+        main_scenarios_completed = row['main_scenarios_completed']
+
+        main_rts = row['main_reaction_times']
+        main_word_acc = row['main_word_accuracy']
+        main_comp_acc = row['main_comprehension_accuracy']
+        main_scenario_types = row['main_scenario_types']
+
+        # Check if participant has valid PST data
+        if pd.isna(main_rts) or pd.isna(main_scenario_types) or pd.isna(main_word_acc):
+            pst_results.append({
+                'ResponseId': participant_id,
+                'List_Assignment': list_assignment,
+                'Main_Scenarios_Completed': main_scenarios_completed,
+                'N_Correctly_Resolved': np.nan,
+                'N_Negative_Valid': np.nan,
+                'N_Positive_Valid': np.nan,
+                'Mean_RT_Negative': np.nan,
+                'Mean_RT_Positive': np.nan,
+                'RT_Bias_Index': np.nan,
+                'Data_Quality': "No data"
+            })
+            continue
+
+        # Parse semicolon-separated values, filtering out empty strings from trailing semicolons
+        rts_raw = [x.strip() for x in str(main_rts).split(';') if x.strip() != '']
+        word_accs = [x.strip().lower() for x in str(main_word_acc).split(';') if x.strip() != '']
+        comp_accs = [x.strip().lower() for x in str(main_comp_acc).split(';') if x.strip() != ''] if not pd.isna(main_comp_acc) else []
+        scenario_types = [x.strip().lower() for x in str(main_scenario_types).split(';') if x.strip() != '']
+
+        # Parse RTs to float
+        rts = []
+        for val in rts_raw:
+            try:
+                rts.append(float(val))
+            except ValueError:
+                rts.append(np.nan)
+
+        # Build trial-level data aligned by index
+        n_trials = max(len(rts), len(word_accs), len(scenario_types))
+
+        negative_rts = []
+        positive_rts = []
+        n_correctly_resolved = 0
+
+        for i in range(n_trials):
+            rt = rts[i] if i < len(rts) else np.nan
+            word_acc = word_accs[i] if i < len(word_accs) else None
+            scenario_type = scenario_types[i] if i < len(scenario_types) else None
+
+            # Only include correctly resolved scenarios (word fragment correctly filled)
+            if word_acc != 'true':
+                continue
+
+            n_correctly_resolved += 1
+
+            if pd.isna(rt) or scenario_type is None:
+                continue
+
+            if scenario_type in ('anxiety', 'depression'):
+                negative_rts.append(rt)
+            elif scenario_type == 'positive':
+                positive_rts.append(rt)
+
+        # Calculate mean RTs
+        mean_rt_negative = np.mean(negative_rts) if len(negative_rts) > 0 else np.nan
+        mean_rt_positive = np.mean(positive_rts) if len(positive_rts) > 0 else np.nan
+
+        # RT bias index = Negative mean RT - Positive mean RT
+        if not (pd.isna(mean_rt_negative) or pd.isna(mean_rt_positive)):
+            rt_bias_index = mean_rt_negative - mean_rt_positive
+        else:
+            rt_bias_index = np.nan
+
+        # Data quality
+        if not pd.isna(main_scenarios_completed) and n_correctly_resolved == int(main_scenarios_completed):
+            data_quality = f"Complete: {n_correctly_resolved}/{int(main_scenarios_completed)}"
+        else:
+            data_quality = f"Correctly resolved: {n_correctly_resolved} of {int(main_scenarios_completed) if not pd.isna(main_scenarios_completed) else '?'} completed"
+
         pst_results.append({
             'ResponseId': participant_id,
             'List_Assignment': list_assignment,
             'Main_Scenarios_Completed': main_scenarios_completed,
-            'N_Correctly_Resolved': np.nan,
-            'N_Negative_Valid': np.nan,
-            'N_Positive_Valid': np.nan,
-            'Mean_RT_Negative': np.nan,
-            'Mean_RT_Positive': np.nan,
-            'RT_Bias_Index': np.nan,
-            'Data_Quality': "No data"
+            'N_Correctly_Resolved': n_correctly_resolved,
+            'N_Negative_Valid': len(negative_rts),
+            'N_Positive_Valid': len(positive_rts),
+            'Mean_RT_Negative': mean_rt_negative,
+            'Mean_RT_Positive': mean_rt_positive,
+            'RT_Bias_Index': rt_bias_index,
+            'Data_Quality': data_quality
         })
-        continue
-
-    # Parse semicolon-separated values, filtering out empty strings from trailing semicolons
-    rts_raw = [x.strip() for x in str(main_rts).split(';') if x.strip() != '']
-    word_accs = [x.strip().lower() for x in str(main_word_acc).split(';') if x.strip() != '']
-    comp_accs = [x.strip().lower() for x in str(main_comp_acc).split(';') if x.strip() != ''] if not pd.isna(main_comp_acc) else []
-    scenario_types = [x.strip().lower() for x in str(main_scenario_types).split(';') if x.strip() != '']
-
-    # Parse RTs to float
-    rts = []
-    for val in rts_raw:
-        try:
-            rts.append(float(val))
-        except ValueError:
-            rts.append(np.nan)
-
-    # Build trial-level data aligned by index
-    n_trials = max(len(rts), len(word_accs), len(scenario_types))
-
-    negative_rts = []
-    positive_rts = []
-    n_correctly_resolved = 0
-
-    for i in range(n_trials):
-        rt = rts[i] if i < len(rts) else np.nan
-        word_acc = word_accs[i] if i < len(word_accs) else None
-        scenario_type = scenario_types[i] if i < len(scenario_types) else None
-
-        # Only include correctly resolved scenarios (word fragment correctly filled)
-        if word_acc != 'true':
-            continue
 
-        n_correctly_resolved += 1
+    return pd.DataFrame(pst_results)
 
-        if pd.isna(rt) or scenario_type is None:
-            continue
 
-        if scenario_type in ('anxiety', 'depression'):
-            negative_rts.append(rt)
-        elif scenario_type == 'positive':
-            positive_rts.append(rt)
+def score_pst(df, store=None):
+    """
+    Score the PST for all participants at once
 
-    # Calculate mean RTs
-    mean_rt_negative = np.mean(negative_rts) if len(negative_rts) > 0 else np.nan
-    mean_rt_positive = np.mean(positive_rts) if len(positive_rts) > 0 else np.nan
+    RTs, word accuracies, comprehension accuracies and scenario types of every
+    participant are exploded into one long trial table and all participant-level
+    metrics come from masked groupby aggregations. Output matches score_pst_legacy.
+    """
+    trials = (pst_trial_store(df) if store is None else store).to_frame()
 
-    # RT bias index = Negative mean RT - Positive mean RT
-    if not (pd.isna(mean_rt_negative) or pd.isna(mean_rt_positive)):
-        rt_bias_index = mean_rt_negative - mean_rt_positive
-    else:
-        rt_bias_index = np.nan
+    # Only correctly resolved scenarios (word fragment correctly filled) are included
+    correctly_resolved = trials['word_accuracy'] == 'true'
+    valid = correctly_resolved & trials['rt'].notna() & trials['scenario_type'].notna()
+    negative = valid & trials['scenario_type'].isin(['anxiety', 'depression'])
+    positive = valid & (trials['scenario_type'] == 'positive')
+
+    flags = pd.DataFrame({
+        'row': trials['row'],
+        'n_correctly_resolved': correctly_resolved,
+        'n_negative': negative,
+        'n_positive': positive,
+        'rt_negative': trials['rt'].where(negative),
+        'rt_positive': trials['rt'].where(positive)
+    })
+    per_row = flags.groupby('row').agg({
+        'n_correctly_resolved': 'sum',
+        'n_negative': 'sum',
+        'n_positive': 'sum',
+        'rt_negative': 'mean',
+        'rt_positive': 'mean'
+    }).reindex(np.arange(len(df)))
+
+    # Participants missing any of the required columns have no PST data
+    no_data = (df['main_reaction_times'].isna() | df['main_scenario_types'].isna()
+               | df['main_word_accuracy'].isna()).to_numpy()
+
+    has_data = ~no_data
+    counts = {name: per_row[name].fillna(0).astype(int) for name in ['n_correctly_resolved', 'n_negative', 'n_positive']}
+    if no_data.any():
+        counts = {name: values.where(has_data) for name, values in counts.items()}
+    mean_rt_negative = per_row['rt_negative'].where(has_data)
+    mean_rt_positive = per_row['rt_positive'].where(has_data)
 
     # Data quality
-    if not pd.isna(main_scenarios_completed) and n_correctly_resolved == int(main_scenarios_completed):
-        data_quality = f"Complete: {n_correctly_resolved}/{int(main_scenarios_completed)}"
-    else:
-        data_quality = f"Correctly resolved: {n_correctly_resolved} of {int(main_scenarios_completed) if not pd.isna(main_scenarios_completed) else '?'} completed"
-
-    pst_results.append({
-        'ResponseId': participant_id,
-        'List_Assignment': list_assignment,
-        'Main_Scenarios_Completed': main_scenarios_completed,
-        'N_Correctly_Resolved': n_correctly_resolved,
-        'N_Negative_Valid': len(negative_rts),
-        'N_Positive_Valid': len(positive_rts),
-        'Mean_RT_Negative': mean_rt_negative,
-        'Mean_RT_Positive': mean_rt_positive,
-        'RT_Bias_Index': rt_bias_index,
+    n_correctly_resolved = per_row['n_correctly_resolved'].fillna(0).astype(int).to_numpy()
+    completed = df['main_scenarios_completed'].to_numpy()
+    has_completed = pd.notna(completed)
+    completed_int = np.where(has_completed, completed, 0).astype(int)
+    completed_text = np.where(has_completed, completed_int.astype(str), '?')
+    n_text = n_correctly_resolved.astype(str)
+    data_quality = np.where(
+        has_completed & (n_correctly_resolved == completed_int),
+        np.char.add(np.char.add("Complete: ", n_text), np.char.add("/", completed_text)),
+        np.char.add(np.char.add("Correctly resolved: ", n_text),
+                    np.char.add(" of ", np.char.add(completed_text, " completed")))
+    ).astype(object)
+    data_quality[no_data] = "No data"
+
+    return pd.DataFrame({
+        'ResponseId': df['ResponseId'].to_numpy(),
+        'List_Assignment': df['list_assignment'].to_numpy(),
+        'Main_Scenarios_Completed': completed,
+        'N_Correctly_Resolved': counts['n_correctly_resolved'].to_numpy(),
+        'N_Negative_Valid': counts['n_negative'].to_numpy(),
+        'N_Positive_Valid': counts['n_positive'].to_numpy(),
+        'Mean_RT_Negative': mean_rt_negative.to_numpy(),
+        'Mean_RT_Positive': mean_rt_positive.to_numpy(),
+        'RT_Bias_Index': (mean_rt_negative - mean_rt_positive).to_numpy(),
         'Data_Quality': data_quality
     })
 
-pst_results_df = pd.DataFrame(pst_results)
-
-# ============================================================================
-# CALCULATE SUMMARY STATISTICS
-# ============================================================================
-
-valid_participants = pst_results_df[pst_results_df['RT_Bias_Index'].notna()]
-
-if len(valid_participants) > 0:
-    summary_data = {
-        'Metric': [
-            'Total Participants',
-            'Participants with Valid Data',
-            'Participants with Missing Data',
-            None,
-            'RT Bias Index - Mean',
-            'RT Bias Index - SD',
-            'RT Bias Index - Min',
-            'RT Bias Index - Max',
-            'RT Bias Index - Median',
-            None,
-            'Mean RT Negative - Mean',
-            'Mean RT Negative - SD',
-            'Mean RT Positive - Mean',
-            'Mean RT Positive - SD',
-            None,
-            'Correctly Resolved Scenarios - Mean',
-            'Correctly Resolved Scenarios - SD',
-            'Correctly Resolved Scenarios - Min',
-            'Correctly Resolved Scenarios - Max'
-        ],
-        'Value': [
-            str(len(pst_results_df)),
-            str(len(valid_participants)),
-            str(len(pst_results_df) - len(valid_participants)),
-            '',
-            f"{valid_participants['RT_Bias_Index'].mean():.3f}",
-            f"{valid_participants['RT_Bias_Index'].std():.3f}",
-            f"{valid_participants['RT_Bias_Index'].min():.3f}",
-            f"{valid_participants['RT_Bias_Index'].max():.3f}",
-            f"{valid_participants['RT_Bias_Index'].median():.3f}",
-            '',
-            f"{valid_participants['Mean_RT_Negative'].mean():.3f}",
-            f"{valid_participants['Mean_RT_Negative'].std():.3f}",
-            f"{valid_participants['Mean_RT_Positive'].mean():.3f}",
-            f"{valid_participants['Mean_RT_Positive'].std():.3f}",
-            '',
-            f"{valid_participants['N_Correctly_Resolved'].mean():.2f}",
-            f"{valid_participants['N_Correctly_Resolved'].std():.2f}",
-            f"{valid_participants['N_Correctly_Resolved'].min():.0f}",
-            f"{valid_participants['N_Correctly_Resolved'].max():.0f}"
+
+def run_pst_analysis(df, output_dir=".", engine="vectorized", incremental=False, timer=None,
+                     formats=('xlsx',), xlsx_engine="auto", memo=True, bootstrap=0, bootstrap_workers=1,
+                     reliability=0, reliability_workers=1):
+    """
+    Run the PST analysis on a loaded Qualtrics DataFrame and write the
+    output files to output_dir
+
+    With incremental=True only responses that are new or changed since the
+    last run are scored (see common/incremental.py). With memo=True the scores
+    and result files of an earlier run on the same responses, with the same
+    parameters and code, are re-used (see common/memo.py).
+
+    With bootstrap=N the summary also gives a confidence interval of the mean
+    RT bias index from N bootstrap resamples of participants and their trials
+    (see common/bootstrap.py), spread over bootstrap_workers processes. With
+    reliability=N it also gives the split-half reliability of the RT bias
+    index over N random splits of every participant's trials within scenario
+    types (see common/reliability.py), spread over reliability_workers
+    processes.
+
+    formats selects the result files to write ('xlsx', 'csv', 'parquet') and
+    xlsx_engine the workbook writer (see common/output.py).
+
+    timer (see common/stages.py) records the duration and memory use of each
+    stage of the run and writes them to pst_run_report.json in output_dir.
+    """
+    timer = timer or NO_TIMER
+    timer.start()
+
+    # ============================================================================
+    # PST ANALYSIS - RT Bias Index Calculation
+    # ============================================================================
+    # Only correctly resolved scenarios (main_word_accuracy == true) are included
+    # Negative scenarios = anxiety + depression
+    # Positive scenarios = positive
+    # Formula: RT bias index = Negative mean RT - Positive mean RT
+    # The smaller the RT bias index, the faster the formation of negative interpretations
+
+    score = score_pst_legacy if engine == 'legacy' else score_pst
+    score_key = stage_key('pst', 'score', df, REQUIRED_COLUMNS, params={'engine': engine},
+                          code=code_version(score, pst_trial_store, score_incrementally)) if memo else None
+    pst_results_df = load_stage(score_key)
+    reused = ['parse', 'score'] if pst_results_df is not None else []
+    if pst_results_df is None:
+        if incremental:
+            pst_results_df = score_incrementally(df, 'pst', PST_SOURCE_COLUMNS, score,
+                                                 params={'engine': engine, 'code': source_fingerprint(__file__)})
+        else:
+            if engine == 'legacy':
+                # The legacy engine parses the export cells itself
+                pst_results_df = score(df)
+            else:
+                store = pst_trial_store(df)
+                timer.lap('parse')
+                timer.count('trials', store.offsets[-1])
+                pst_results_df = score(df, store)
+        save_stage(score_key, pst_results_df)
+    timer.lap('score')
+    timer.count('rows', len(df))
+
+    # Summary and result files only change with the scores, this function's
+    # code and the output options
+    output_file = os.path.join(output_dir, "pst_analysis_results.xlsx")
+    report_key = stage_key('pst', 'report', params={'output_file': os.path.abspath(output_file),
+                                                    'formats': list(formats), 'xlsx_engine': xlsx_engine,
+                                                    'bootstrap': bootstrap, 'reliability': reliability},
+                           code=code_version(run_pst_analysis), upstream=score_key) if memo else None
+    tables = load_stage(report_key)
+    if tables is not None:
+        replay_tables(tables)
+        timer.lap('export')
+        timer.write_report(os.path.join(output_dir, "pst_run_report.json"),
+                           task='pst', engine=engine, incremental=incremental, reused=reused + ['report'])
+        print(f"PST results are up to date: {output_file}")
+        return
+
+    # ============================================================================
+    # BOOTSTRAP CONFIDENCE INTERVAL AND SPLIT-HALF RELIABILITY
+    # ============================================================================
+
+    valid_participants = pst_results_df[pst_results_df['RT_Bias_Index'].notna()]
+
+    rt_bias_ci = None
+    if bootstrap:
+        store = pst_trial_store(df)
+        rt_bias_ci = bootstrap_mean_ci(pst_bias_components(store), store.offsets, mean_difference,
+                                       n_resamples=bootstrap, workers=bootstrap_workers,
+                                       participants=pst_results_df['RT_Bias_Index'].notna().to_numpy())
+        timer.lap('bootstrap')
+
+    rt_bias_reliability = None
+    if reliability:
+        store = pst_trial_store(df)
+        rt_bias_reliability = split_half_reliability(pst_bias_components(store), store.offsets, mean_difference,
+                                                     n_splits=reliability, strata=store.fields['scenario_type'],
+                                                     workers=reliability_workers)
+        timer.lap('reliability')
+
+    # ============================================================================
+    # CALCULATE SUMMARY STATISTICS
+    # ============================================================================
+
+    if len(valid_participants) > 0:
+        summary_spec = [
+            ('Total Participants', str(len(pst_results_df))),
+            ('Participants with Valid Data', str(len(valid_participants))),
+            ('Participants with Missing Data', str(len(pst_results_df) - len(valid_participants))),
+            (None, ''),
+            *stat_rows('RT Bias Index', 'RT_Bias_Index', '.3f'),
+            *ci_rows('RT Bias Index', rt_bias_ci, '.3f'),
+            *reliability_rows('RT Bias Index', rt_bias_reliability),
+            (None, ''),
+            *stat_rows('Mean RT Negative', 'Mean_RT_Negative', '.3f', ('mean', 'std')),
+            *stat_rows('Mean RT Positive', 'Mean_RT_Positive', '.3f', ('mean', 'std')),
+            (None, ''),
+            *stat_rows('Correctly Resolved Scenarios', 'N_Correctly_Resolved', '.2f', ('mean', 'std')),
+            *stat_rows('Correctly Resolved Scenarios', 'N_Correctly_Resolved', '.0f', ('min', 'max'))
         ]
-    }
-else:
-    summary_data = {
-        'Metric': ['Total Participants', 'Participants with Valid Data'],
-        'Value': [str(len(pst_results_df)), '0']
-    }
-
-summary_df = pd.DataFrame(summary_data)
-
-# ============================================================================
-# ANALYSIS BY LIST ASSIGNMENT
-# ============================================================================
-
-list_assignments = valid_participants['List_Assignment'].dropna().unique()
-list_summary_data = []
-
-for list_num in sorted(list_assignments):
-    list_data = valid_participants[valid_participants['List_Assignment'] == list_num]
-
-    if len(list_data) > 0:
-        list_summary_data.append({
-            'List_Assignment': f"List {int(list_num)}",
-            'N_Participants': len(list_data),
-            'RT_Bias_Index_Mean': f"{list_data['RT_Bias_Index'].mean():.3f}",
-            'RT_Bias_Index_SD': f"{list_data['RT_Bias_Index'].std():.3f}",
-            'RT_Bias_Index_Median': f"{list_data['RT_Bias_Index'].median():.3f}",
-            'Mean_RT_Negative_Mean': f"{list_data['Mean_RT_Negative'].mean():.3f}",
-            'Mean_RT_Positive_Mean': f"{list_data['Mean_RT_Positive'].mean():.3f}"
+        summary_df = render_summary(valid_participants, summary_spec)
+    else:
+        summary_df = pd.DataFrame({
+            'Metric': ['Total Participants', 'Participants with Valid Data'],
+            'Value': [str(len(pst_results_df)), '0']
         })
 
-if list_summary_data:
-    list_summary_df = pd.DataFrame(list_summary_data)
-else:
-    list_summary_df = pd.DataFrame({'Message': ['No list assignment data available']})
-
-# ============================================================================
-# EXPORT RESULTS TO EXCEL
-# ============================================================================
-
-output_file = "pst_analysis_results.xlsx"
-
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-    pst_results_df.to_excel(writer, sheet_name='PST Results', index=False)
-    summary_df.to_excel(writer, sheet_name='PST Summary', index=False)
-    list_summary_df.to_excel(writer, sheet_name='Summary by List', index=False)
-
-print(f"PST analysis complete. Results saved to: {output_file}")
-print(f"\nSummary:")
-print(f"  Total participants: {len(pst_results_df)}")
-print(f"  Participants with valid data: {len(valid_participants)}")
-if len(valid_participants) > 0:
-    print(f"  Mean RT bias index: {valid_participants['RT_Bias_Index'].mean():.3f} (SD: {valid_participants['RT_Bias_Index'].std():.3f})")
-    print(f"  Range: {valid_participants['RT_Bias_Index'].min():.3f} - {valid_participants['RT_Bias_Index'].max():.3f}")
-    print(f"  Mean RT Negative: {valid_participants['Mean_RT_Negative'].mean():.3f}")
-    print(f"  Mean RT Positive: {valid_participants['Mean_RT_Positive'].mean():.3f}")
+    # ============================================================================
+    # ANALYSIS BY LIST ASSIGNMENT
+    # ============================================================================
+
+    list_assignments = valid_participants['List_Assignment'].dropna().unique()
+    list_summary_data = []
+
+    for list_num in sorted(list_assignments):
+        list_data = valid_participants[valid_participants['List_Assignment'] == list_num]
+
+        if len(list_data) > 0:
+            list_summary_data.append({
+                'List_Assignment': f"List {int(list_num)}",
+                'N_Participants': len(list_data),
+                'RT_Bias_Index_Mean': f"{list_data['RT_Bias_Index'].mean():.3f}",
+                'RT_Bias_Index_SD': f"{list_data['RT_Bias_Index'].std():.3f}",
+                'RT_Bias_Index_Median': f"{list_data['RT_Bias_Index'].median():.3f}",
+                'Mean_RT_Negative_Mean': f"{list_data['Mean_RT_Negative'].mean():.3f}",
+                'Mean_RT_Positive_Mean': f"{list_data['Mean_RT_Positive'].mean():.3f}"
+            })
+
+    if list_summary_data:
+        list_summary_df = pd.DataFrame(list_summary_data)
+    else:
+        list_summary_df = pd.DataFrame({'Message': ['No list assignment data available']})
+
+    timer.lap('summarize')
+
+    # ============================================================================
+    # EXPORT RESULTS TO EXCEL
+    # ============================================================================
+
+    with ResultWriter(output_file, formats, xlsx_engine) as writer:
+        writer.write(pst_results_df, 'PST Results')
+        writer.write(summary_df, 'PST Summary')
+        writer.write(list_summary_df, 'Summary by List')
+    save_stage(report_key, writer.tables, outputs=writer.files)
+
+    timer.lap('export')
+    timer.write_report(os.path.join(output_dir, "pst_run_report.json"),
+                       task='pst', engine=engine, incremental=incremental, reused=reused)
+
+    print(f"PST analysis complete. Results saved to: {', '.join(writer.outputs)}")
+    print(f"\nSummary:")
+    print(f"  Total participants: {len(pst_results_df)}")
+    print(f"  Participants with valid data: {len(valid_participants)}")
+    if len(valid_participants) > 0:
+        print(f"  Mean RT bias index: {valid_participants['RT_Bias_Index'].mean():.3f} (SD: {valid_participants['RT_Bias_Index'].std():.3f})")
+        print(f"  Range: {valid_participants['RT_Bias_Index'].min():.3f} - {valid_participants['RT_Bias_Index'].max():.3f}")
+        print(f"  Mean RT Negative: {valid_participants['Mean_RT_Negative'].mean():.3f}")
+        print(f"  Mean RT Positive: {valid_participants['Mean_RT_Positive'].mean():.3f}")
+
+
+if __name__ == "__main__":
+    timer = timer_from_argv()
+    df = load_qualtrics_export(file_name, columns=REQUIRED_COLUMNS)
+    timer.lap('load')
+    run_pst_analysis(df, timer=timer)
@@ -1,379 +1,383 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 
-# Read the Excel file from parent directory
+# Make the shared helpers in Analysis/common importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.fingerprint import source_fingerprint
+from common.incremental import score_incrementally
+from common.loader import load_qualtrics_export
+from common.memo import code_version, load_stage, save_stage, stage_key
+from common.output import ResultWriter, replay_tables
+from common.scales import score_scales
+from common.stages import NO_TIMER, timer_from_argv
+from common.summary import render_summary, stat_rows
+
+# Read the Excel file from parent directory (parsed once, then served from a cache)
 file_name = "../1_values_excel.xlsx"
-df = pd.read_excel(file_name, header=0, skiprows=[1, 2])
 
 # ============================================================================
-# QIDS ANALYSIS - Columns S-AG (Q2-Q16)
+# SCALE REGISTRY
 # ============================================================================
+# Item numbers below are 1-based positions in 'items' (see common/scales.py)
+
+SCALES = {
+    # QIDS - Columns S-AG (Q2-Q16)
+    'QIDS': {
+        'items': ['Q2', 'Q3', 'Q4', 'Q5', 'Q6', 'Q7', 'Q8', 'Q9',
+                  'Q10', 'Q11', 'Q12', 'Q13', 'Q14', 'Q15', 'Q16'],
+        'score_prefix': 'Questionnaire'
+    },
+    # GAD-7 - Columns AH-AN (Q1_1-Q1_7)
+    'GAD': {
+        'items': ['Q1_1', 'Q1_2', 'Q1_3', 'Q1_4', 'Q1_5', 'Q1_6', 'Q1_7'],
+        'score_prefix': 'GAD'
+    },
+    # MASQ - Columns AO-BN (Q1_1.1-Q1_26)
+    'MASQ': {
+        'items': ['Q1_1.1', 'Q1_2.1', 'Q1_3.1', 'Q1_4.1', 'Q1_5.1', 'Q1_6.1', 'Q1_7.1',
+                  'Q1_8', 'Q1_9', 'Q1_10', 'Q1_11', 'Q1_12', 'Q1_13', 'Q1_14', 'Q1_15',
+                  'Q1_16', 'Q1_17', 'Q1_18', 'Q1_19', 'Q1_20', 'Q1_21', 'Q1_22', 'Q1_23',
+                  'Q1_24', 'Q1_25', 'Q1_26'],
+        # Negatively keyed items, reverse scored as 6 - response
+        'reverse_keyed': [1, 9, 15, 19, 23, 25],
+        'response_range': (1, 5),
+        'subscales': {
+            'GD': [2, 3, 7, 12, 13, 17, 20, 21],  # General Distress
+            'AA': [4, 6, 8, 10, 14, 16, 18, 22, 24, 26],  # Anxious Arousal
+            # Anhedonic Depression - positively keyed (5, 11) and negatively keyed items
+            'AD': [5, 11, 1, 9, 15, 19, 23, 25]
+        }
+    }
+}
 
-# Define the columns to sum (S-AG = Q2-Q16)
-questionnaire_cols = ['Q2', 'Q3', 'Q4', 'Q5', 'Q6', 'Q7', 'Q8', 'Q9',
-                      'Q10', 'Q11', 'Q12', 'Q13', 'Q14', 'Q15', 'Q16']
+# All export columns the analysis reads; the loader materializes only these
+REQUIRED_COLUMNS = ['ResponseId'] + [column for scale in SCALES.values() for column in scale['items']]
 
-results = []
+# Columns holding the task's responses; rows without any are participants
+# who did not do the task
+DATA_COLUMNS = REQUIRED_COLUMNS[1:]
 
-for idx, row in df.iterrows():
-    participant_id = row['ResponseId']
 
-    # Extract questionnaire responses
-    responses = row[questionnaire_cols]
+def score_questionnaires_legacy(df):
+    """
+    Score QIDS, GAD-7 and MASQ with the original per-participant loops
 
-    # Convert to numeric, replacing any non-numeric with NaN
-    responses_numeric = pd.to_numeric(responses, errors='coerce')
+    Returns scale name -> participant-level results DataFrame.
+    """
+    # ============================================================================
+    # QIDS ANALYSIS - Columns S-AG (Q2-Q16)
+    # ============================================================================
 
-    # Calculate total score
-    total_score = responses_numeric.sum()
+    # Define the columns to sum (S-AG = Q2-Q16)
+    questionnaire_cols = ['Q2', 'Q3', 'Q4', 'Q5', 'Q6', 'Q7', 'Q8', 'Q9',
+                          'Q10', 'Q11', 'Q12', 'Q13', 'Q14', 'Q15', 'Q16']
 
-    # Count valid (non-NaN) responses
-    valid_responses = responses_numeric.notna().sum()
+    results = []
 
-    # Count missing responses
-    missing_responses = responses_numeric.isna().sum()
+    for idx, row in df.iterrows():
+        participant_id = row['ResponseId']
 
-    # Calculate mean score (average per item)
-    mean_score = responses_numeric.mean() if valid_responses > 0 else np.nan
+        # Extract questionnaire responses
+        responses = row[questionnaire_cols]
 
-    results.append({
-        'ResponseId': participant_id,
-        'Questionnaire_Total_Score': total_score,
-        'Questionnaire_Mean_Score': mean_score,
-        'Valid_Items': valid_responses,
-        'Missing_Items': missing_responses,
-        'Total_Items': len(questionnaire_cols),
-        'Completion_Rate': f"{(valid_responses/len(questionnaire_cols)*100):.1f}%"
-    })
+        # Convert to numeric, replacing any non-numeric with NaN
+        responses_numeric = pd.to_numeric(responses, errors='coerce')
 
-results_df = pd.DataFrame(results)
+        # Calculate total score
+        total_score = responses_numeric.sum()
 
-# ============================================================================
-# CALCULATE SUMMARY STATISTICS
-# ============================================================================
+        # Count valid (non-NaN) responses
+        valid_responses = responses_numeric.notna().sum()
 
-# Filter out any participants with no valid data
-valid_participants = results_df[results_df['Valid_Items'] > 0]
-
-if len(valid_participants) > 0:
-    # Create summary statistics DataFrame
-    summary_data = {
-        'Metric': [
-            'Total Participants',
-            'Participants with Valid Data',
-            'Participants with Missing Data',
-            None,
-            'Total Score - Mean',
-            'Total Score - SD',
-            'Total Score - Min',
-            'Total Score - Max',
-            'Total Score - Median',
-            None,
-            'Mean Score (per item) - Mean',
-            'Mean Score (per item) - SD',
-            'Mean Score (per item) - Min',
-            'Mean Score (per item) - Max',
-            None,
-            'Average Completion Rate',
-            'Participants with Complete Data',
-            'Participants with Incomplete Data'
-        ],
-        'Value': [
-            str(len(results_df)),
-            str(len(valid_participants)),
-            str(len(results_df) - len(valid_participants)),
-            '',
-            f"{valid_participants['Questionnaire_Total_Score'].mean():.2f}",
-            f"{valid_participants['Questionnaire_Total_Score'].std():.2f}",
-            f"{valid_participants['Questionnaire_Total_Score'].min():.2f}",
-            f"{valid_participants['Questionnaire_Total_Score'].max():.2f}",
-            f"{valid_participants['Questionnaire_Total_Score'].median():.2f}",
-            '',
-            f"{valid_participants['Questionnaire_Mean_Score'].mean():.2f}",
-            f"{valid_participants['Questionnaire_Mean_Score'].std():.2f}",
-            f"{valid_participants['Questionnaire_Mean_Score'].min():.2f}",
-            f"{valid_participants['Questionnaire_Mean_Score'].max():.2f}",
-            '',
-            f"{(valid_participants['Valid_Items'].sum()/(len(valid_participants)*len(questionnaire_cols))*100):.1f}%",
-            str(len(valid_participants[valid_participants['Valid_Items'] == len(questionnaire_cols)])),
-            str(len(valid_participants[valid_participants['Valid_Items'] < len(questionnaire_cols)]))
-        ]
-    }
-else:
-    summary_data = {
-        'Metric': ['Total Participants', 'Participants with Valid Data'],
-        'Value': [str(len(results_df)), '0']
-    }
+        # Count missing responses
+        missing_responses = responses_numeric.isna().sum()
 
-summary_df = pd.DataFrame(summary_data)
+        # Calculate mean score (average per item)
+        mean_score = responses_numeric.mean() if valid_responses > 0 else np.nan
 
-# ============================================================================
-# GAD ANALYSIS - Columns AH-AN (Q1_1-Q1_7)
-# ============================================================================
+        results.append({
+            'ResponseId': participant_id,
+            'Questionnaire_Total_Score': total_score,
+            'Questionnaire_Mean_Score': mean_score,
+            'Valid_Items': valid_responses,
+            'Missing_Items': missing_responses,
+            'Total_Items': len(questionnaire_cols),
+            'Completion_Rate': f"{(valid_responses/len(questionnaire_cols)*100):.1f}%"
+        })
 
-# Define the GAD columns (AH-AN = Q1_1-Q1_7)
-gad_cols = ['Q1_1', 'Q1_2', 'Q1_3', 'Q1_4', 'Q1_5', 'Q1_6', 'Q1_7']
+    results_df = pd.DataFrame(results)
 
-gad_results = []
+    # ============================================================================
+    # GAD ANALYSIS - Columns AH-AN (Q1_1-Q1_7)
+    # ============================================================================
 
-for idx, row in df.iterrows():
-    participant_id = row['ResponseId']
+    # Define the GAD columns (AH-AN = Q1_1-Q1_7)
+    gad_cols = ['Q1_1', 'Q1_2', 'Q1_3', 'Q1_4', 'Q1_5', 'Q1_6', 'Q1_7']
 
-    # Extract GAD responses
-    responses = row[gad_cols]
+    gad_results = []
 
-    # Convert to numeric, replacing any non-numeric with NaN
-    responses_numeric = pd.to_numeric(responses, errors='coerce')
+    for idx, row in df.iterrows():
+        participant_id = row['ResponseId']
 
-    # Calculate total score
-    total_score = responses_numeric.sum()
+        # Extract GAD responses
+        responses = row[gad_cols]
 
-    # Count valid (non-NaN) responses
-    valid_responses = responses_numeric.notna().sum()
+        # Convert to numeric, replacing any non-numeric with NaN
+        responses_numeric = pd.to_numeric(responses, errors='coerce')
 
-    # Count missing responses
-    missing_responses = responses_numeric.isna().sum()
+        # Calculate total score
+        total_score = responses_numeric.sum()
 
-    # Calculate mean score (average per item)
-    mean_score = responses_numeric.mean() if valid_responses > 0 else np.nan
+        # Count valid (non-NaN) responses
+        valid_responses = responses_numeric.notna().sum()
 
-    gad_results.append({
-        'ResponseId': participant_id,
-        'GAD_Total_Score': total_score,
-        'GAD_Mean_Score': mean_score,
-        'Valid_Items': valid_responses,
-        'Missing_Items': missing_responses,
-        'Total_Items': len(gad_cols),
-        'Completion_Rate': f"{(valid_responses/len(gad_cols)*100):.1f}%"
-    })
-
-gad_results_df = pd.DataFrame(gad_results)
-
-# ============================================================================
-# CALCULATE GAD SUMMARY STATISTICS
-# ============================================================================
-
-# Filter out any participants with no valid data
-gad_valid_participants = gad_results_df[gad_results_df['Valid_Items'] > 0]
-
-if len(gad_valid_participants) > 0:
-    # Create summary statistics DataFrame
-    gad_summary_data = {
-        'Metric': [
-            'Total Participants',
-            'Participants with Valid Data',
-            'Participants with Missing Data',
-            None,
-            'Total Score - Mean',
-            'Total Score - SD',
-            'Total Score - Min',
-            'Total Score - Max',
-            'Total Score - Median',
-            None,
-            'Mean Score (per item) - Mean',
-            'Mean Score (per item) - SD',
-            'Mean Score (per item) - Min',
-            'Mean Score (per item) - Max',
-            None,
-            'Average Completion Rate',
-            'Participants with Complete Data',
-            'Participants with Incomplete Data'
-        ],
-        'Value': [
-            str(len(gad_results_df)),
-            str(len(gad_valid_participants)),
-            str(len(gad_results_df) - len(gad_valid_participants)),
-            '',
-            f"{gad_valid_participants['GAD_Total_Score'].mean():.2f}",
-            f"{gad_valid_participants['GAD_Total_Score'].std():.2f}",
-            f"{gad_valid_participants['GAD_Total_Score'].min():.2f}",
-            f"{gad_valid_participants['GAD_Total_Score'].max():.2f}",
-            f"{gad_valid_participants['GAD_Total_Score'].median():.2f}",
-            '',
-            f"{gad_valid_participants['GAD_Mean_Score'].mean():.2f}",
-            f"{gad_valid_participants['GAD_Mean_Score'].std():.2f}",
-            f"{gad_valid_participants['GAD_Mean_Score'].min():.2f}",
-            f"{gad_valid_participants['GAD_Mean_Score'].max():.2f}",
-            '',
-            f"{(gad_valid_participants['Valid_Items'].sum()/(len(gad_valid_participants)*len(gad_cols))*100):.1f}%",
-            str(len(gad_valid_participants[gad_valid_participants['Valid_Items'] == len(gad_cols)])),
-            str(len(gad_valid_participants[gad_valid_participants['Valid_Items'] < len(gad_cols)]))
-        ]
-    }
-else:
-    gad_summary_data = {
-        'Metric': ['Total Participants', 'Participants with Valid Data'],
-        'Value': [str(len(gad_results_df)), '0']
-    }
+        # Count missing responses
+        missing_responses = responses_numeric.isna().sum()
 
-gad_summary_df = pd.DataFrame(gad_summary_data)
+        # Calculate mean score (average per item)
+        mean_score = responses_numeric.mean() if valid_responses > 0 else np.nan
 
-# ============================================================================
-# MASQ ANALYSIS - Columns AO-BN (Q1_1.1-Q1_26)
-# ============================================================================
+        gad_results.append({
+            'ResponseId': participant_id,
+            'GAD_Total_Score': total_score,
+            'GAD_Mean_Score': mean_score,
+            'Valid_Items': valid_responses,
+            'Missing_Items': missing_responses,
+            'Total_Items': len(gad_cols),
+            'Completion_Rate': f"{(valid_responses/len(gad_cols)*100):.1f}%"
+        })
 
-# Define the MASQ columns (AO-BN = Q1_1.1-Q1_26)
-masq_cols = ['Q1_1.1', 'Q1_2.1', 'Q1_3.1', 'Q1_4.1', 'Q1_5.1', 'Q1_6.1', 'Q1_7.1',
-             'Q1_8', 'Q1_9', 'Q1_10', 'Q1_11', 'Q1_12', 'Q1_13', 'Q1_14', 'Q1_15',
-             'Q1_16', 'Q1_17', 'Q1_18', 'Q1_19', 'Q1_20', 'Q1_21', 'Q1_22', 'Q1_23',
-             'Q1_24', 'Q1_25', 'Q1_26']
-
-# Define subscale items (using 1-based indexing as in the instructions)
-# Negatively keyed items that need reverse scoring
-negative_keyed_items = [1, 9, 15, 19, 23, 25]
-
-# Subscale item numbers (1-based)
-gd_items = [2, 3, 7, 12, 13, 17, 20, 21]  # General Distress
-aa_items = [4, 6, 8, 10, 14, 16, 18, 22, 24, 26]  # Anxious Arousal
-ad_positive_items = [5, 11]  # Anhedonic Depression - positively keyed
-ad_negative_items = [1, 9, 15, 19, 23, 25]  # Anhedonic Depression - negatively keyed
-
-masq_results = []
-
-for idx, row in df.iterrows():
-    participant_id = row['ResponseId']
-
-    # Extract MASQ responses
-    responses = row[masq_cols]
-
-    # Convert to numeric, replacing any non-numeric with NaN
-    responses_numeric = pd.to_numeric(responses, errors='coerce')
-
-    # Create a copy for scoring (1-based indexing for easier mapping)
-    # Index 0 will be unused, indices 1-26 correspond to items 1-26
-    scored_items = [np.nan] + list(responses_numeric.values)
-
-    # Reverse score negatively keyed items
-    for item_num in negative_keyed_items:
-        if not pd.isna(scored_items[item_num]):
-            scored_items[item_num] = 6 - scored_items[item_num]
-
-    # Calculate GD (General Distress) score
-    gd_values = [scored_items[i] for i in gd_items]
-    gd_valid = sum(1 for v in gd_values if not pd.isna(v))
-    gd_total = sum(v for v in gd_values if not pd.isna(v))
-
-    # Calculate AA (Anxious Arousal) score
-    aa_values = [scored_items[i] for i in aa_items]
-    aa_valid = sum(1 for v in aa_values if not pd.isna(v))
-    aa_total = sum(v for v in aa_values if not pd.isna(v))
-
-    # Calculate AD (Anhedonic Depression) score
-    ad_values = [scored_items[i] for i in ad_positive_items + ad_negative_items]
-    ad_valid = sum(1 for v in ad_values if not pd.isna(v))
-    ad_total = sum(v for v in ad_values if not pd.isna(v))
-
-    # Overall data quality
-    total_valid = sum(1 for v in scored_items[1:] if not pd.isna(v))
-    total_missing = len(masq_cols) - total_valid
-
-    masq_results.append({
-        'ResponseId': participant_id,
-        'GD_Total_Score': gd_total,
-        'GD_Valid_Items': gd_valid,
-        'AA_Total_Score': aa_total,
-        'AA_Valid_Items': aa_valid,
-        'AD_Total_Score': ad_total,
-        'AD_Valid_Items': ad_valid,
-        'Total_Valid_Items': total_valid,
-        'Total_Missing_Items': total_missing,
-        'Total_Items': len(masq_cols),
-        'Completion_Rate': f"{(total_valid/len(masq_cols)*100):.1f}%"
-    })
-
-masq_results_df = pd.DataFrame(masq_results)
+    gad_results_df = pd.DataFrame(gad_results)
 
-# ============================================================================
-# CALCULATE MASQ SUMMARY STATISTICS
-# ============================================================================
+    # ============================================================================
+    # MASQ ANALYSIS - Columns AO-BN (Q1_1.1-Q1_26)
+    # ============================================================================
 
-# Filter out any participants with no valid data
-masq_valid_participants = masq_results_df[masq_results_df['Total_Valid_Items'] > 0]
-
-if len(masq_valid_participants) > 0:
-    # Create summary statistics DataFrame for all three subscales
-    masq_summary_data = {
-        'Metric': [
-            'Total Participants',
-            'Participants with Valid Data',
-            'Participants with Missing Data',
-            'Average Completion Rate',
-            '',
-            'GD Total Score - Mean',
-            'GD Total Score - SD',
-            'GD Total Score - Min',
-            'GD Total Score - Max',
-            'GD Total Score - Median',
-            '',
-            'AA Total Score - Mean',
-            'AA Total Score - SD',
-            'AA Total Score - Min',
-            'AA Total Score - Max',
-            'AA Total Score - Median',
-            '',
-            'AD Total Score - Mean',
-            'AD Total Score - SD',
-            'AD Total Score - Min',
-            'AD Total Score - Max',
-            'AD Total Score - Median'
-        ],
-        'Value': [
-            str(len(masq_results_df)),
-            str(len(masq_valid_participants)),
-            str(len(masq_results_df) - len(masq_valid_participants)),
-            f"{(masq_valid_participants['Total_Valid_Items'].sum()/(len(masq_valid_participants)*len(masq_cols))*100):.1f}%",
-            '',
-            f"{masq_valid_participants['GD_Total_Score'].mean():.2f}",
-            f"{masq_valid_participants['GD_Total_Score'].std():.2f}",
-            f"{masq_valid_participants['GD_Total_Score'].min():.2f}",
-            f"{masq_valid_participants['GD_Total_Score'].max():.2f}",
-            f"{masq_valid_participants['GD_Total_Score'].median():.2f}",
-            '',
-            f"{masq_valid_participants['AA_Total_Score'].mean():.2f}",
-            f"{masq_valid_participants['AA_Total_Score'].std():.2f}",
-            f"{masq_valid_participants['AA_Total_Score'].min():.2f}",
-            f"{masq_valid_participants['AA_Total_Score'].max():.2f}",
-            f"{masq_valid_participants['AA_Total_Score'].median():.2f}",
-            '',
-            f"{masq_valid_participants['AD_Total_Score'].mean():.2f}",
-            f"{masq_valid_participants['AD_Total_Score'].std():.2f}",
-            f"{masq_valid_participants['AD_Total_Score'].min():.2f}",
-            f"{masq_valid_participants['AD_Total_Score'].max():.2f}",
-            f"{masq_valid_participants['AD_Total_Score'].median():.2f}"
+    # Define the MASQ columns (AO-BN = Q1_1.1-Q1_26)
+    masq_cols = ['Q1_1.1', 'Q1_2.1', 'Q1_3.1', 'Q1_4.1', 'Q1_5.1', 'Q1_6.1', 'Q1_7.1',
+                 'Q1_8', 'Q1_9', 'Q1_10', 'Q1_11', 'Q1_12', 'Q1_13', 'Q1_14', 'Q1_15',
+                 'Q1_16', 'Q1_17', 'Q1_18', 'Q1_19', 'Q1_20', 'Q1_21', 'Q1_22', 'Q1_23',
+                 'Q1_24', 'Q1_25', 'Q1_26']
+
+    # Define subscale items (using 1-based indexing as in the instructions)
+    # Negatively keyed items that need reverse scoring
+    negative_keyed_items = [1, 9, 15, 19, 23, 25]
+
+    # Subscale item numbers (1-based)
+    gd_items = [2, 3, 7, 12, 13, 17, 20, 21]  # General Distress
+    aa_items = [4, 6, 8, 10, 14, 16, 18, 22, 24, 26]  # Anxious Arousal
+    ad_positive_items = [5, 11]  # Anhedonic Depression - positively keyed
+    ad_negative_items = [1, 9, 15, 19, 23, 25]  # Anhedonic Depression - negatively keyed
+
+    masq_results = []
+
+    for idx, row in df.iterrows():
+        participant_id = row['ResponseId']
+
+        # Extract MASQ responses
+        responses = row[masq_cols]
+
+        # Convert to numeric, replacing any non-numeric with NaN
+        responses_numeric = pd.to_numeric(responses, errors='coerce')
+
+        # Create a copy for scoring (1-based indexing for easier mapping)
+        # Index 0 will be unused, indices 1-26 correspond to items 1-26
+        scored_items = [np.nan] + list(responses_numeric.values)
+
+        # Reverse score negatively keyed items
+        for item_num in negative_keyed_items:
+            if not pd.isna(scored_items[item_num]):
+                scored_items[item_num] = 6 - scored_items[item_num]
+
+        # Calculate GD (General Distress) score
+        gd_values = [scored_items[i] for i in gd_items]
+        gd_valid = sum(1 for v in gd_values if not pd.isna(v))
+        gd_total = sum(v for v in gd_values if not pd.isna(v))
+
+        # Calculate AA (Anxious Arousal) score
+        aa_values = [scored_items[i] for i in aa_items]
+        aa_valid = sum(1 for v in aa_values if not pd.isna(v))
+        aa_total = sum(v for v in aa_values if not pd.isna(v))
+
+        # Calculate AD (Anhedonic Depression) score
+        ad_values = [scored_items[i] for i in ad_positive_items + ad_negative_items]
+        ad_valid = sum(1 for v in ad_values if not pd.isna(v))
+        ad_total = sum(v for v in ad_values if not pd.isna(v))
+
+        # Overall data quality
+        total_valid = sum(1 for v in scored_items[1:] if not pd.isna(v))
+        total_missing = len(masq_cols) - total_valid
+
+        masq_results.append({
+            'ResponseId': participant_id,
+            'GD_Total_Score': gd_total,
+            'GD_Valid_Items': gd_valid,
+            'AA_Total_Score': aa_total,
+            'AA_Valid_Items': aa_valid,
+            'AD_Total_Score': ad_total,
+            'AD_Valid_Items': ad_valid,
+            'Total_Valid_Items': total_valid,
+            'Total_Missing_Items': total_missing,
+            'Total_Items': len(masq_cols),
+            'Completion_Rate': f"{(total_valid/len(masq_cols)*100):.1f}%"
+        })
+
+    masq_results_df = pd.DataFrame(masq_results)
+
+    return {'QIDS': results_df, 'GAD': gad_results_df, 'MASQ': masq_results_df}
+
+
+def scale_summary(results_df, scale):
+    """
+    Metric/Value summary of one scale's participant-level results
+    """
+    n_items = len(scale['items'])
+    valid_column = 'Total_Valid_Items' if 'subscales' in scale else 'Valid_Items'
+
+    # Filter out any participants with no valid data
+    valid_participants = results_df[results_df[valid_column] > 0]
+    n_valid = len(valid_participants)
+
+    if n_valid == 0:
+        return pd.DataFrame({
+            'Metric': ['Total Participants', 'Participants with Valid Data'],
+            'Value': [str(len(results_df)), '0']
+        })
+
+    participant_rows = [
+        ('Total Participants', str(len(results_df))),
+        ('Participants with Valid Data', str(n_valid)),
+        ('Participants with Missing Data', str(len(results_df) - n_valid))
+    ]
+    completion_rate = ('Average Completion Rate',
+                       f"{(valid_participants[valid_column].sum()/(n_valid*n_items)*100):.1f}%")
+
+    if 'subscales' in scale:
+        summary_spec = participant_rows + [completion_rate]
+        for name in scale['subscales']:
+            summary_spec += [('', ''), *stat_rows(f"{name} Total Score", f"{name}_Total_Score", '.2f')]
+    else:
+        prefix = scale['score_prefix']
+        summary_spec = participant_rows + [
+            (None, ''),
+            *stat_rows('Total Score', f"{prefix}_Total_Score", '.2f'),
+            (None, ''),
+            *stat_rows('Mean Score (per item)', f"{prefix}_Mean_Score", '.2f', ('mean', 'std', 'min', 'max')),
+            (None, ''),
+            completion_rate,
+            ('Participants with Complete Data', str((valid_participants[valid_column] == n_items).sum())),
+            ('Participants with Incomplete Data', str((valid_participants[valid_column] < n_items).sum()))
         ]
-    }
-else:
-    masq_summary_data = {
-        'Metric': ['Total Participants', 'Participants with Valid Data'],
-        'Value': [str(len(masq_results_df)), '0']
-    }
-
-masq_summary_df = pd.DataFrame(masq_summary_data)
-
-# ============================================================================
-# EXPORT RESULTS TO EXCEL
-# ============================================================================
-
-output_file = "questionnaire_analysis_results.xlsx"
-
-# Write to Excel with multiple sheets
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-    # Sheet 1: QIDS Participant-level results
-    results_df.to_excel(writer, sheet_name='QIDS Results', index=False)
-
-    # Sheet 2: QIDS Summary statistics
-    summary_df.to_excel(writer, sheet_name='QIDS Summary', index=False)
-
-    # Sheet 3: GAD Participant-level results
-    gad_results_df.to_excel(writer, sheet_name='GAD Results', index=False)
-
-    # Sheet 4: GAD Summary statistics
-    gad_summary_df.to_excel(writer, sheet_name='GAD Summary', index=False)
-
-    # Sheet 5: MASQ Participant-level results
-    masq_results_df.to_excel(writer, sheet_name='MASQ Results', index=False)
-
-    # Sheet 6: MASQ Summary statistics
-    masq_summary_df.to_excel(writer, sheet_name='MASQ Summary', index=False)
 
-print(f"Questionnaire analysis complete. Results saved to: {output_file}")
+    return render_summary(valid_participants, summary_spec)
+
+
+def run_questionnaire_analysis(df, output_dir=".", engine="vectorized", incremental=False, timer=None,
+                               formats=('xlsx',), xlsx_engine="auto", memo=True):
+    """
+    Run the questionnaire (QIDS, GAD-7, MASQ) analysis on a loaded Qualtrics DataFrame and write the
+    output files to output_dir
+
+    engine="legacy" scores with the original per-participant loops. With
+    incremental=True only responses that are new or changed since the last
+    run are scored (see common/incremental.py). With memo=True the scores and
+    result files of an earlier run on the same responses, with the same
+    parameters and code, are re-used (see common/memo.py).
+
+    formats selects the result files to write ('xlsx', 'csv', 'parquet') and
+    xlsx_engine the workbook writer (see common/output.py).
+
+    timer (see common/stages.py) records the duration and memory use of each
+    stage of the run and writes them to questionnaire_run_report.json in output_dir.
+    """
+    timer = timer or NO_TIMER
+    timer.start()
+
+    def score(rows):
+        scored = score_questionnaires_legacy(rows) if engine == "legacy" else score_scales(rows, SCALES)
+        return tuple(scored[name] for name in SCALES)
+
+    score_key = stage_key('questionnaire', 'score', df, REQUIRED_COLUMNS, params={'engine': engine},
+                          code=code_version(score, score_incrementally)) if memo else None
+    scored = load_stage(score_key)
+    reused = ['score'] if scored is not None else []
+    if scored is None:
+        if incremental:
+            item_columns = [column for scale in SCALES.values() for column in scale['items']]
+            scored = score_incrementally(df, 'questionnaire', item_columns, score,
+                                         params={'engine': engine, 'code': source_fingerprint(__file__)})
+        else:
+            scored = score(df)
+        save_stage(score_key, scored)
+    timer.lap('score')
+    timer.count('rows', len(df))
+
+    # Summary and result files only change with the scores, this function's
+    # code and the output options
+    output_file = os.path.join(output_dir, "questionnaire_analysis_results.xlsx")
+    report_key = stage_key('questionnaire', 'report',
+                           params={'output_file': os.path.abspath(output_file),
+                                   'formats': list(formats), 'xlsx_engine': xlsx_engine},
+                           code=code_version(run_questionnaire_analysis), upstream=score_key) if memo else None
+    tables = load_stage(report_key)
+    if tables is not None:
+        replay_tables(tables)
+        timer.lap('export')
+        timer.write_report(os.path.join(output_dir, "questionnaire_run_report.json"),
+                           task='questionnaire', engine=engine, incremental=incremental,
+                           reused=reused + ['report'])
+        print(f"Questionnaire results are up to date: {output_file}")
+        return
+
+    results_df, gad_results_df, masq_results_df = scored
+
+    # ============================================================================
+    # CALCULATE SUMMARY STATISTICS
+    # ============================================================================
+
+    summary_df = scale_summary(results_df, SCALES['QIDS'])
+    gad_summary_df = scale_summary(gad_results_df, SCALES['GAD'])
+    masq_summary_df = scale_summary(masq_results_df, SCALES['MASQ'])
+
+    timer.lap('summarize')
+
+    # ============================================================================
+    # EXPORT RESULTS TO EXCEL
+    # ============================================================================
+
+    # Write to Excel with multiple sheets
+    with ResultWriter(output_file, formats, xlsx_engine) as writer:
+        # Sheet 1: QIDS Participant-level results
+        writer.write(results_df, 'QIDS Results')
+
+        # Sheet 2: QIDS Summary statistics
+        writer.write(summary_df, 'QIDS Summary')
+
+        # Sheet 3: GAD Participant-level results
+        writer.write(gad_results_df, 'GAD Results')
+
+        # Sheet 4: GAD Summary statistics
+        writer.write(gad_summary_df, 'GAD Summary')
+
+        # Sheet 5: MASQ Participant-level results
+        writer.write(masq_results_df, 'MASQ Results')
+
+        # Sheet 6: MASQ Summary statistics
+        writer.write(masq_summary_df, 'MASQ Summary')
+    save_stage(report_key, writer.tables, outputs=writer.files)
+
+    timer.lap('export')
+    timer.write_report(os.path.join(output_dir, "questionnaire_run_report.json"),
+                       task='questionnaire', engine=engine, incremental=incremental, reused=reused)
+
+    print(f"Questionnaire analysis complete. Results saved to: {', '.join(writer.outputs)}")
+
+
+if __name__ == "__main__":
+    timer = timer_from_argv()
+    df = load_qualtrics_export(file_name, columns=REQUIRED_COLUMNS)
+    timer.lap('load')
+    run_questionnaire_analysis(df, timer=timer)
@@ -1,57 +1,108 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 
-# Read the Excel file from parent directory
+# Make the shared helpers in Analysis/common importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.bootstrap import bootstrap_mean_ci, ratio
+from common.fingerprint import source_fingerprint
+from common.incremental import score_incrementally
+from common.loader import load_qualtrics_export
+from common.memo import code_version, load_stage, save_stage, stage_key
+from common.output import ResultWriter, replay_tables
+from common.parsing import split_delimited
+from common.stages import NO_TIMER, timer_from_argv
+from common.summary import ci_rows, render_summary, stat_rows
+
+# Read the Excel file from parent directory (parsed once, then served from a cache)
 file_name = "../1_values_excel.xlsx"
-df = pd.read_excel(file_name, header=0, skiprows=[1, 2])
-
-# ============================================================================
-# SST ANALYSIS - Negativity Score Calculation
-# ============================================================================
-# Formula: Negativity score = Total negative sentences / (Total negative + Total positive sentences)
-# Mixed and unclear sentences are excluded from both numerator and denominator
-# Participants where mixed > (positive + negative) are excluded
-# For anxiety and depression stimuli only
-
-sst_results = []
-
-for idx, row in df.iterrows():
-    participant_id = row['ResponseId']
-    list_assignment = row['list_assignment']
-    main_total_completed = row['main_total_completed']
-    main_sentence_interpretations = row['main_sentence_interpretations']
-
-    # Check if participant has valid SST data
-    if pd.isna(main_sentence_interpretations) or pd.isna(main_total_completed):
-        sst_results.append({
-            'ResponseId': participant_id,
-            'List_Assignment': list_assignment,
-            'Total_Completed_Sentences': main_total_completed,
-            'Negative_D_Count': np.nan,
-            'Negative_GA_Count': np.nan,
-            'Total_Negative_Count': np.nan,
-            'Positive_Count': np.nan,
-            'Mixed_Count': np.nan,
-            'Unclear_Count': np.nan,
-            'Negativity_Score': np.nan,
-            'Data_Quality': "No data"
-        })
-        continue
 
-    # Parse interpretations
-    interpretations = str(main_sentence_interpretations).split(';')
+# Export columns the SST scores are computed from
+SST_SOURCE_COLUMNS = ['list_assignment', 'main_sentence_interpretations', 'main_total_completed']
 
-    # Count each interpretation type
-    negative_d_count = interpretations.count('negative_D')
-    negative_ga_count = interpretations.count('negative_GA')
-    total_negative_count = negative_d_count + negative_ga_count
-    positive_count = interpretations.count('positive')
-    mixed_count = interpretations.count('mixed')
-    unclear_count = interpretations.count('unclear')
+# All export columns the analysis reads; the loader materializes only these
+REQUIRED_COLUMNS = ['ResponseId'] + SST_SOURCE_COLUMNS
+
+# Columns holding the task's responses; rows without any are participants
+# who did not do the task
+DATA_COLUMNS = ['main_sentence_interpretations', 'main_total_completed']
+
+
+def score_sst_legacy(df):
+    """
+    Score the SST one participant at a time (reference implementation)
+    """
+    sst_results = []
+
+    for idx, row in df.iterrows():
+        participant_id = row['ResponseId']
+        list_assignment = row['list_assignment']
+        main_total_completed = row['main_total_completed']
+        main_sentence_interpretations = row['main_sentence_interpretations']
+
+        # Check if participant has valid SST data
+        if pd.isna(main_sentence_interpretations) or pd.isna(main_total_completed):
+            sst_results.append({
+                'ResponseId': participant_id,
+                'List_Assignment': list_assignment,
+                'Total_Completed_Sentences': main_total_completed,
+                'Negative_D_Count': np.nan,
+                'Negative_GA_Count': np.nan,
+                'Total_Negative_Count': np.nan,
+                'Positive_Count': np.nan,
+                'Mixed_Count': np.nan,
+                'Unclear_Count': np.nan,
+                'Negativity_Score': np.nan,
+                'Data_Quality': "No data"
+            })
+            continue
+
+        # Parse interpretations
+        interpretations = str(main_sentence_interpretations).split(';')
+
+        # Count each interpretation type
+        negative_d_count = interpretations.count('negative_D')
+        negative_ga_count = interpretations.count('negative_GA')
+        total_negative_count = negative_d_count + negative_ga_count
+        positive_count = interpretations.count('positive')
+        mixed_count = interpretations.count('mixed')
+        unclear_count = interpretations.count('unclear')
+
+        # Exclude participant if mixed > total positive + negative
+        valid_denominator = positive_count + total_negative_count
+        if mixed_count > valid_denominator:
+            sst_results.append({
+                'ResponseId': participant_id,
+                'List_Assignment': list_assignment,
+                'Total_Completed_Sentences': main_total_completed,
+                'Negative_D_Count': negative_d_count,
+                'Negative_GA_Count': negative_ga_count,
+                'Total_Negative_Count': total_negative_count,
+                'Positive_Count': positive_count,
+                'Mixed_Count': mixed_count,
+                'Unclear_Count': unclear_count,
+                'Negativity_Score': np.nan,
+                'Data_Quality': f"Excluded: Mixed ({mixed_count}) > Positive + Negative ({valid_denominator})"
+            })
+            continue
+
+        # Calculate negativity score
+        # Negativity score = Total negative sentences / (Total negative + Total positive)
+        # Mixed and unclear sentences are excluded from both numerator and denominator
+        if valid_denominator > 0:
+            negativity_score = total_negative_count / valid_denominator
+        else:
+            negativity_score = np.nan
+
+        # Data quality check
+        total_interpretations = len(interpretations)
+        if total_interpretations == main_total_completed:
+            data_quality = f"Complete: {total_interpretations}/{main_total_completed}"
+        else:
+            data_quality = f"Mismatch: {total_interpretations} interpretations vs {main_total_completed} completed"
 
-    # Exclude participant if mixed > total positive + negative
-    valid_denominator = positive_count + total_negative_count
-    if mixed_count > valid_denominator:
         sst_results.append({
             'ResponseId': participant_id,
             'List_Assignment': list_assignment,
@@ -62,30 +113,67 @@ for idx, row in df.iterrows():
             'Positive_Count': positive_count,
             'Mixed_Count': mixed_count,
             'Unclear_Count': unclear_count,
-            'Negativity_Score': np.nan,
-            'Data_Quality': f"Excluded: Mixed ({mixed_count}) > Positive + Negative ({valid_denominator})"
+            'Negativity_Score': negativity_score,
+            'Data_Quality': data_quality
         })
-        continue
 
-    # Calculate negativity score
+    return pd.DataFrame(sst_results)
+
+
+SST_CATEGORIES = ['negative_D', 'negative_GA', 'positive', 'mixed', 'unclear']
+
+
+def score_sst(df):
+    """
+    Score the SST for all participants at once
+
+    Interpretations are exploded once and counted into a participant-by-category
+    matrix with a single bincount; the exclusion rule and negativity score are
+    then applied as column operations. Output matches score_sst_legacy.
+    """
+    n_rows = len(df)
+    n_categories = len(SST_CATEGORIES)
+    total_completed = df['main_total_completed']
+
+    interpretations = split_delimited(df['main_sentence_interpretations'], ';',
+                                      skip_blank_cells=False, strip=False)
+    # Code 0 collects anything outside the five interpretation types
+    codes = pd.Categorical(interpretations.values, categories=SST_CATEGORIES).codes.astype(np.int64) + 1
+    counts = np.bincount(interpretations.row_ids * (n_categories + 1) + codes,
+                         minlength=n_rows * (n_categories + 1)).reshape(n_rows, n_categories + 1)
+    negative_d_count, negative_ga_count, positive_count, mixed_count, unclear_count = counts[:, 1:].T
+
+    total_negative_count = negative_d_count + negative_ga_count
+    valid_denominator = positive_count + total_negative_count
+    total_interpretations = interpretations.lengths
+
+    no_data = (df['main_sentence_interpretations'].isna() | total_completed.isna()).to_numpy()
+    excluded = ~no_data & (mixed_count > valid_denominator)
+
     # Negativity score = Total negative sentences / (Total negative + Total positive)
     # Mixed and unclear sentences are excluded from both numerator and denominator
-    if valid_denominator > 0:
-        negativity_score = total_negative_count / valid_denominator
-    else:
-        negativity_score = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        negativity_score = np.where(valid_denominator > 0, total_negative_count / valid_denominator, np.nan)
+    negativity_score[no_data | excluded] = np.nan
 
     # Data quality check
-    total_interpretations = len(interpretations)
-    if total_interpretations == main_total_completed:
-        data_quality = f"Complete: {total_interpretations}/{main_total_completed}"
-    else:
-        data_quality = f"Mismatch: {total_interpretations} interpretations vs {main_total_completed} completed"
+    completed_text = total_completed.astype(str).to_numpy().astype(str)
+    n_text = total_interpretations.astype(str)
+    data_quality = np.where(
+        total_interpretations == total_completed.to_numpy(),
+        np.char.add(np.char.add("Complete: ", n_text), np.char.add("/", completed_text)),
+        np.char.add(np.char.add("Mismatch: ", n_text),
+                    np.char.add(" interpretations vs ", np.char.add(completed_text, " completed")))
+    ).astype(object)
+    data_quality[excluded] = np.char.add(
+        np.char.add("Excluded: Mixed (", mixed_count[excluded].astype(str)),
+        np.char.add(") > Positive + Negative (", np.char.add(valid_denominator[excluded].astype(str), ")")))
+    data_quality[no_data] = "No data"
 
-    sst_results.append({
-        'ResponseId': participant_id,
-        'List_Assignment': list_assignment,
-        'Total_Completed_Sentences': main_total_completed,
+    sst_results_df = pd.DataFrame({
+        'ResponseId': df['ResponseId'].to_numpy(),
+        'List_Assignment': df['list_assignment'].to_numpy(),
+        'Total_Completed_Sentences': total_completed.to_numpy(),
         'Negative_D_Count': negative_d_count,
         'Negative_GA_Count': negative_ga_count,
         'Total_Negative_Count': total_negative_count,
@@ -96,135 +184,209 @@ for idx, row in df.iterrows():
         'Data_Quality': data_quality
     })
 
-sst_results_df = pd.DataFrame(sst_results)
-
-# ============================================================================
-# CALCULATE SUMMARY STATISTICS
-# ============================================================================
-
-# Filter out any participants with no valid data
-valid_participants = sst_results_df[sst_results_df['Negativity_Score'].notna()]
-
-if len(valid_participants) > 0:
-    # Create summary statistics DataFrame
-    summary_data = {
-        'Metric': [
-            'Total Participants',
-            'Participants with Valid Data',
-            'Participants with Missing Data',
-            None,
-            'Negativity Score - Mean',
-            'Negativity Score - SD',
-            'Negativity Score - Min',
-            'Negativity Score - Max',
-            'Negativity Score - Median',
-            None,
-            'Total Completed Sentences - Mean',
-            'Total Completed Sentences - SD',
-            'Total Completed Sentences - Min',
-            'Total Completed Sentences - Max',
-            None,
-            'Negative Sentences (D) - Mean',
-            'Negative Sentences (D) - SD',
-            'Negative Sentences (GA) - Mean',
-            'Negative Sentences (GA) - SD',
-            'Total Negative Sentences - Mean',
-            'Total Negative Sentences - SD',
-            None,
-            'Positive Sentences - Mean',
-            'Positive Sentences - SD',
-            'Mixed Sentences - Mean',
-            'Mixed Sentences - SD',
-            'Unclear Sentences - Mean',
-            'Unclear Sentences - SD'
-        ],
-        'Value': [
-            str(len(sst_results_df)),
-            str(len(valid_participants)),
-            str(len(sst_results_df) - len(valid_participants)),
-            '',
-            f"{valid_participants['Negativity_Score'].mean():.4f}",
-            f"{valid_participants['Negativity_Score'].std():.4f}",
-            f"{valid_participants['Negativity_Score'].min():.4f}",
-            f"{valid_participants['Negativity_Score'].max():.4f}",
-            f"{valid_participants['Negativity_Score'].median():.4f}",
-            '',
-            f"{valid_participants['Total_Completed_Sentences'].mean():.2f}",
-            f"{valid_participants['Total_Completed_Sentences'].std():.2f}",
-            f"{valid_participants['Total_Completed_Sentences'].min():.0f}",
-            f"{valid_participants['Total_Completed_Sentences'].max():.0f}",
-            '',
-            f"{valid_participants['Negative_D_Count'].mean():.2f}",
-            f"{valid_participants['Negative_D_Count'].std():.2f}",
-            f"{valid_participants['Negative_GA_Count'].mean():.2f}",
-            f"{valid_participants['Negative_GA_Count'].std():.2f}",
-            f"{valid_participants['Total_Negative_Count'].mean():.2f}",
-            f"{valid_participants['Total_Negative_Count'].std():.2f}",
-            '',
-            f"{valid_participants['Positive_Count'].mean():.2f}",
-            f"{valid_participants['Positive_Count'].std():.2f}",
-            f"{valid_participants['Mixed_Count'].mean():.2f}",
-            f"{valid_participants['Mixed_Count'].std():.2f}",
-            f"{valid_participants['Unclear_Count'].mean():.2f}",
-            f"{valid_participants['Unclear_Count'].std():.2f}"
+    if no_data.any():
+        count_columns = ['Negative_D_Count', 'Negative_GA_Count', 'Total_Negative_Count',
+                         'Positive_Count', 'Mixed_Count', 'Unclear_Count']
+        sst_results_df[count_columns] = sst_results_df[count_columns].astype(float)
+        sst_results_df.loc[no_data, count_columns] = np.nan
+
+    return sst_results_df
+
+
+def sst_interpretation_components(df):
+    """
+    Per-sentence terms of the negativity score (see common/bootstrap.py):
+    whether each interpretation is negative, positive and mixed. Returns them
+    with the offsets of each participant's sentences.
+    """
+    interpretations = split_delimited(df['main_sentence_interpretations'], ';',
+                                      skip_blank_cells=False, strip=False)
+    values = interpretations.values
+    components = np.column_stack([np.isin(values, ['negative_D', 'negative_GA']),
+                                  values == 'positive', values == 'mixed'])
+    return components, interpretations.offsets
+
+
+def negativity_from_sums(sums):
+    """
+    Negativity score from summed (negative, positive, mixed) interpretations,
+    NaN for participants excluded because mixed > positive + negative
+    """
+    negative, positive, mixed = sums.T
+    valid_denominator = negative + positive
+    return np.where(mixed > valid_denominator, np.nan, ratio(negative, valid_denominator))
+
+
+def run_sst_analysis(df, output_dir=".", engine="vectorized", incremental=False, timer=None,
+                     formats=('xlsx',), xlsx_engine="auto", memo=True, bootstrap=0, bootstrap_workers=1):
+    """
+    Run the SST analysis on a loaded Qualtrics DataFrame and write the
+    output files to output_dir
+
+    With incremental=True only responses that are new or changed since the
+    last run are scored (see common/incremental.py). With memo=True the scores
+    and result files of an earlier run on the same responses, with the same
+    parameters and code, are re-used (see common/memo.py).
+
+    With bootstrap=N the summary also gives a confidence interval of the mean
+    negativity score from N bootstrap resamples of participants and their
+    sentences (see common/bootstrap.py), spread over bootstrap_workers processes.
+
+    formats selects the result files to write ('xlsx', 'csv', 'parquet') and
+    xlsx_engine the workbook writer (see common/output.py).
+
+    timer (see common/stages.py) records the duration and memory use of each
+    stage of the run and writes them to sst_run_report.json in output_dir.
+    """
+    timer = timer or NO_TIMER
+    timer.start()
+
+    # ============================================================================
+    # SST ANALYSIS - Negativity Score Calculation
+    # ============================================================================
+    # Formula: Negativity score = Total negative sentences / (Total negative + Total positive sentences)
+    # Mixed and unclear sentences are excluded from both numerator and denominator
+    # Participants where mixed > (positive + negative) are excluded
+    # For anxiety and depression stimuli only
+
+    score = score_sst_legacy if engine == 'legacy' else score_sst
+    score_key = stage_key('sst', 'score', df, REQUIRED_COLUMNS, params={'engine': engine},
+                          code=code_version(score, score_incrementally)) if memo else None
+    sst_results_df = load_stage(score_key)
+    reused = ['score'] if sst_results_df is not None else []
+    if sst_results_df is None:
+        if incremental:
+            sst_results_df = score_incrementally(df, 'sst', SST_SOURCE_COLUMNS, score,
+                                                 params={'engine': engine, 'code': source_fingerprint(__file__)})
+        else:
+            sst_results_df = score(df)
+        save_stage(score_key, sst_results_df)
+    timer.lap('score')
+    timer.count('rows', len(df))
+
+    # Summary and result files only change with the scores, this function's
+    # code and the output options
+    output_file = os.path.join(output_dir, "sst_analysis_results.xlsx")
+    report_key = stage_key('sst', 'report', params={'output_file': os.path.abspath(output_file),
+                                                    'formats': list(formats), 'xlsx_engine': xlsx_engine,
+                                                    'bootstrap': bootstrap},
+                           code=code_version(run_sst_analysis), upstream=score_key) if memo else None
+    tables = load_stage(report_key)
+    if tables is not None:
+        replay_tables(tables)
+        timer.lap('export')
+        timer.write_report(os.path.join(output_dir, "sst_run_report.json"),
+                           task='sst', engine=engine, incremental=incremental, reused=reused + ['report'])
+        print(f"SST results are up to date: {output_file}")
+        return
+
+    # Filter out any participants with no valid data
+    valid_participants = sst_results_df[sst_results_df['Negativity_Score'].notna()]
+
+    # ============================================================================
+    # BOOTSTRAP CONFIDENCE INTERVAL
+    # ============================================================================
+
+    negativity_ci = None
+    if bootstrap:
+        components, offsets = sst_interpretation_components(df)
+        negativity_ci = bootstrap_mean_ci(components, offsets, negativity_from_sums,
+                                          n_resamples=bootstrap, workers=bootstrap_workers,
+                                          participants=sst_results_df['Negativity_Score'].notna().to_numpy())
+        timer.lap('bootstrap')
+
+    # ============================================================================
+    # CALCULATE SUMMARY STATISTICS
+    # ============================================================================
+
+    if len(valid_participants) > 0:
+        # Create summary statistics DataFrame
+        summary_spec = [
+            ('Total Participants', str(len(sst_results_df))),
+            ('Participants with Valid Data', str(len(valid_participants))),
+            ('Participants with Missing Data', str(len(sst_results_df) - len(valid_participants))),
+            (None, ''),
+            *stat_rows('Negativity Score', 'Negativity_Score', '.4f'),
+            *ci_rows('Negativity Score', negativity_ci, '.4f'),
+            (None, ''),
+            *stat_rows('Total Completed Sentences', 'Total_Completed_Sentences', '.2f', ('mean', 'std')),
+            *stat_rows('Total Completed Sentences', 'Total_Completed_Sentences', '.0f', ('min', 'max')),
+            (None, ''),
+            *stat_rows('Negative Sentences (D)', 'Negative_D_Count', '.2f', ('mean', 'std')),
+            *stat_rows('Negative Sentences (GA)', 'Negative_GA_Count', '.2f', ('mean', 'std')),
+            *stat_rows('Total Negative Sentences', 'Total_Negative_Count', '.2f', ('mean', 'std')),
+            (None, ''),
+            *stat_rows('Positive Sentences', 'Positive_Count', '.2f', ('mean', 'std')),
+            *stat_rows('Mixed Sentences', 'Mixed_Count', '.2f', ('mean', 'std')),
+            *stat_rows('Unclear Sentences', 'Unclear_Count', '.2f', ('mean', 'std'))
         ]
-    }
-else:
-    summary_data = {
-        'Metric': ['Total Participants', 'Participants with Valid Data'],
-        'Value': [str(len(sst_results_df)), '0']
-    }
-
-summary_df = pd.DataFrame(summary_data)
-
-# ============================================================================
-# ANALYSIS BY LIST ASSIGNMENT
-# ============================================================================
-
-# Calculate summary statistics for each list assignment
-list_assignments = valid_participants['List_Assignment'].dropna().unique()
-list_summary_data = []
-
-for list_num in sorted(list_assignments):
-    list_data = valid_participants[valid_participants['List_Assignment'] == list_num]
-
-    if len(list_data) > 0:
-        list_summary_data.append({
-            'List_Assignment': f"List {int(list_num)}",
-            'N_Participants': len(list_data),
-            'Negativity_Score_Mean': f"{list_data['Negativity_Score'].mean():.4f}",
-            'Negativity_Score_SD': f"{list_data['Negativity_Score'].std():.4f}",
-            'Negativity_Score_Median': f"{list_data['Negativity_Score'].median():.4f}",
-            'Total_Negative_Mean': f"{list_data['Total_Negative_Count'].mean():.2f}",
-            'Total_Negative_SD': f"{list_data['Total_Negative_Count'].std():.2f}"
+        summary_df = render_summary(valid_participants, summary_spec)
+    else:
+        summary_df = pd.DataFrame({
+            'Metric': ['Total Participants', 'Participants with Valid Data'],
+            'Value': [str(len(sst_results_df)), '0']
         })
 
-if list_summary_data:
-    list_summary_df = pd.DataFrame(list_summary_data)
-else:
-    list_summary_df = pd.DataFrame({'Message': ['No list assignment data available']})
+    # ============================================================================
+    # ANALYSIS BY LIST ASSIGNMENT
+    # ============================================================================
+
+    # Calculate summary statistics for each list assignment
+    list_assignments = valid_participants['List_Assignment'].dropna().unique()
+    list_summary_data = []
+
+    for list_num in sorted(list_assignments):
+        list_data = valid_participants[valid_participants['List_Assignment'] == list_num]
+
+        if len(list_data) > 0:
+            list_summary_data.append({
+                'List_Assignment': f"List {int(list_num)}",
+                'N_Participants': len(list_data),
+                'Negativity_Score_Mean': f"{list_data['Negativity_Score'].mean():.4f}",
+                'Negativity_Score_SD': f"{list_data['Negativity_Score'].std():.4f}",
+                'Negativity_Score_Median': f"{list_data['Negativity_Score'].median():.4f}",
+                'Total_Negative_Mean': f"{list_data['Total_Negative_Count'].mean():.2f}",
+                'Total_Negative_SD': f"{list_data['Total_Negative_Count'].std():.2f}"
+            })
+
+    if list_summary_data:
+        list_summary_df = pd.DataFrame(list_summary_data)
+    else:
+        list_summary_df = pd.DataFrame({'Message': ['No list assignment data available']})
+
+    timer.lap('summarize')
+
+    # ============================================================================
+    # EXPORT RESULTS TO EXCEL
+    # ============================================================================
+
+    # Write to Excel with multiple sheets
+    with ResultWriter(output_file, formats, xlsx_engine) as writer:
+        # Sheet 1: Participant-level results
+        writer.write(sst_results_df, 'SST Results')
 
-# ============================================================================
-# EXPORT RESULTS TO EXCEL
-# ============================================================================
+        # Sheet 2: Overall summary statistics
+        writer.write(summary_df, 'SST Summary')
 
-output_file = "sst_analysis_results.xlsx"
+        # Sheet 3: Summary by list assignment
+        writer.write(list_summary_df, 'Summary by List')
+    save_stage(report_key, writer.tables, outputs=writer.files)
 
-# Write to Excel with multiple sheets
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-    # Sheet 1: Participant-level results
-    sst_results_df.to_excel(writer, sheet_name='SST Results', index=False)
+    timer.lap('export')
+    timer.write_report(os.path.join(output_dir, "sst_run_report.json"),
+                       task='sst', engine=engine, incremental=incremental, reused=reused)
 
-    # Sheet 2: Overall summary statistics
-    summary_df.to_excel(writer, sheet_name='SST Summary', index=False)
+    print(f"SST analysis complete. Results saved to: {', '.join(writer.outputs)}")
+    print(f"\nSummary:")
+    print(f"  Total participants: {len(sst_results_df)}")
+    print(f"  Participants with valid data: {len(valid_participants)}")
+    if len(valid_participants) > 0:
+        print(f"  Mean negativity score: {valid_participants['Negativity_Score'].mean():.4f} (SD: {valid_participants['Negativity_Score'].std():.4f})")
+        print(f"  Range: {valid_participants['Negativity_Score'].min():.4f} - {valid_participants['Negativity_Score'].max():.4f}")
 
-    # Sheet 3: Summary by list assignment
-    list_summary_df.to_excel(writer, sheet_name='Summary by List', index=False)
 
-print(f"SST analysis complete. Results saved to: {output_file}")
-print(f"\nSummary:")
-print(f"  Total participants: {len(sst_results_df)}")
-print(f"  Participants with valid data: {len(valid_participants)}")
-if len(valid_participants) > 0:
-    print(f"  Mean negativity score: {valid_participants['Negativity_Score'].mean():.4f} (SD: {valid_participants['Negativity_Score'].std():.4f})")
-    print(f"  Range: {valid_participants['Negativity_Score'].min():.4f} - {valid_participants['Negativity_Score'].max():.4f}")
+if __name__ == "__main__":
+    timer = timer_from_argv()
+    df = load_qualtrics_export(file_name, columns=REQUIRED_COLUMNS)
+    timer.lap('load')
+    run_sst_analysis(df, timer=timer)
@@ -1,9 +1,27 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 
-# Read the Excel file from parent directory
+# Make the shared helpers in Analysis/common importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.bootstrap import bootstrap_mean_ci, mean_difference, mean_score
+from common.fingerprint import source_fingerprint
+from common.incremental import score_incrementally
+from common.loader import load_qualtrics_export
+from common.memo import code_version, load_stage, save_stage, stage_key
+from common.output import ResultWriter, TableStream, replay_tables
+from common.reliability import split_half_reliability
+from common.parsing import explode_aligned, parse_delimited_numeric, split_delimited
+from common.stages import NO_TIMER, timer_from_argv
+from common.summary import ci_rows, reliability_rows, render_summary, stat_rows
+from common.trial_schema import BINARY_DTYPE, CHOICE_KEYS, ENDORSE_KEYS, VALENCES, categorize
+from common.trial_store import TrialStore, cached_trial_store
+
+# Read the Excel file from parent directory (parsed once, then served from a cache)
 file_name = "../1_values_excel.xlsx"
-df = pd.read_excel(file_name, header=0, skiprows=[1, 2])
+
 
 def safe_parse_comma_data(data_str, data_type='str'):
     """
@@ -62,381 +80,858 @@ def create_trial_dataframe(responses, rts, scenario_types, word_types=None):
     return pd.DataFrame(trial_data)
 
 
-# ============================================================================
-# PART 1: ORIGINAL WSAP ANALYSIS (Columns DO-DT)
-# ============================================================================
+def score_original_wsap_legacy(df, ddm_sink=None):
+    """
+    Score the Original WSAP one participant at a time (reference implementation)
 
-original_results = []
-original_ddm_data = []
+    Returns the participant-level results and the combined DDM trial data.
+    With ddm_sink (a TableStream) each participant's DDM trials are appended
+    to it as they are produced and None is returned in place of the DDM data.
+    """
+    original_results = []
+    original_ddm_data = []
+
+    for idx, row in df.iterrows():
+        participant_id = row['ResponseId']
+
+        try:
+            # Parse comma-separated values safely
+            responses = safe_parse_comma_data(row['__js_responses'])
+            rts = safe_parse_comma_data(row['__js_reaction_times'], 'float')
+            scenario_types = safe_parse_comma_data(row['__js_scenario_types'])
+            word_types = safe_parse_comma_data(row['__js_word_types'])
+
+            # Create trial-level data preserving all available information
+            trials = create_trial_dataframe(responses, rts, scenario_types, word_types)
+
+            if len(trials) == 0:
+                raise ValueError("No trial data available")
+
+        except Exception as e:
+            # Create "No data" record for this participant
+            original_results.append({
+                'ResponseId': participant_id,
+                'Original_Response_Selection_Score': "No data",
+                'Original_Prop_Negative_Endorsed': "No data",
+                'Original_Prop_Benign_Endorsed': "No data", 
+                'Original_RT_Bias_Index': "No data",
+                'Original_Mean_RT_Endorse_Negative': "No data",
+                'Original_Mean_RT_Reject_Negative': "No data",
+                'Original_N_Trials': 0,
+                'Original_N_Valid_Trials': 0,
+                'Original_N_Depression_Trials': 0,
+                'Original_N_Anxiety_Trials': 0,
+                'Original_N_Positive_Trials': 0,
+                'Original_Data_Quality': f"Error: {str(e)}"
+            })
+            continue
+
+        # Filter for valid trials with available data
+        valid_response_trials = trials[~trials['response'].isna()]
+        valid_rt_trials = trials[(~trials['response'].isna()) & (~trials['rt'].isna())]
+
+        # Calculate Response Selection Score (uses all trials with valid responses)
+        negative_trials = valid_response_trials[valid_response_trials['scenario_type'].isin(['depression', 'anxiety'])]
+        benign_trials = valid_response_trials[valid_response_trials['scenario_type'] == 'positive']
+
+        prop_negative_endorsed = (negative_trials['response'] == 'r').sum() / len(negative_trials) if len(negative_trials) > 0 else np.nan
+        prop_benign_endorsed = (benign_trials['response'] == 'r').sum() / len(benign_trials) if len(benign_trials) > 0 else np.nan
+
+        response_selection_score = prop_negative_endorsed - prop_benign_endorsed if not (pd.isna(prop_negative_endorsed) or pd.isna(prop_benign_endorsed)) else np.nan
+
+        # Calculate RT Bias Index (uses only trials with both response and RT)
+        valid_negative_trials = valid_rt_trials[valid_rt_trials['scenario_type'].isin(['depression', 'anxiety'])]
+        negative_endorsed = valid_negative_trials[valid_negative_trials['response'] == 'r']
+        negative_rejected = valid_negative_trials[valid_negative_trials['response'] == 'u']
+
+        mean_rt_endorse_negative = negative_endorsed['rt'].mean() if len(negative_endorsed) > 0 else np.nan
+        mean_rt_reject_negative = negative_rejected['rt'].mean() if len(negative_rejected) > 0 else np.nan
+
+        rt_bias_index = mean_rt_endorse_negative - mean_rt_reject_negative if not (pd.isna(mean_rt_endorse_negative) or pd.isna(mean_rt_reject_negative)) else np.nan
+
+        # Prepare clean data for DDM (complete trials only)
+        ddm_trials = valid_rt_trials[(~valid_rt_trials['scenario_type'].isna())].copy()
+        ddm_trials['response_binary'] = (ddm_trials['response'] == 'r').astype(int)
+        ddm_trials['participant_id'] = participant_id
+
+        # Separate by stimulus type for DDM
+        ddm_depression = ddm_trials[ddm_trials['scenario_type'] == 'depression'].copy()
+        ddm_anxiety = ddm_trials[ddm_trials['scenario_type'] == 'anxiety'].copy() 
+        ddm_positive = ddm_trials[ddm_trials['scenario_type'] == 'positive'].copy()
+
+        # Add to DDM dataset for export
+        if len(ddm_trials) > 0:
+            (original_ddm_data if ddm_sink is None else ddm_sink).append(ddm_trials)
 
-for idx, row in df.iterrows():
-    participant_id = row['ResponseId']
-    
-    try:
-        # Parse comma-separated values safely
-        responses = safe_parse_comma_data(row['__js_responses'])
-        rts = safe_parse_comma_data(row['__js_reaction_times'], 'float')
-        scenario_types = safe_parse_comma_data(row['__js_scenario_types'])
-        word_types = safe_parse_comma_data(row['__js_word_types'])
-        
-        # Create trial-level data preserving all available information
-        trials = create_trial_dataframe(responses, rts, scenario_types, word_types)
-        
-        if len(trials) == 0:
-            raise ValueError("No trial data available")
-    
-    except Exception as e:
-        # Create "No data" record for this participant
         original_results.append({
             'ResponseId': participant_id,
-            'Original_Response_Selection_Score': "No data",
-            'Original_Prop_Negative_Endorsed': "No data",
-            'Original_Prop_Benign_Endorsed': "No data", 
-            'Original_RT_Bias_Index': "No data",
-            'Original_Mean_RT_Endorse_Negative': "No data",
-            'Original_Mean_RT_Reject_Negative': "No data",
-            'Original_N_Trials': 0,
-            'Original_N_Valid_Trials': 0,
-            'Original_N_Depression_Trials': 0,
-            'Original_N_Anxiety_Trials': 0,
-            'Original_N_Positive_Trials': 0,
-            'Original_Data_Quality': f"Error: {str(e)}"
+            'Original_Response_Selection_Score': response_selection_score,
+            'Original_Prop_Negative_Endorsed': prop_negative_endorsed,
+            'Original_Prop_Benign_Endorsed': prop_benign_endorsed,
+            'Original_RT_Bias_Index': rt_bias_index,
+            'Original_Mean_RT_Endorse_Negative': mean_rt_endorse_negative,
+            'Original_Mean_RT_Reject_Negative': mean_rt_reject_negative,
+            'Original_N_Trials': len(trials),
+            'Original_N_Valid_Trials': len(valid_rt_trials),
+            'Original_N_Depression_Trials': len(ddm_depression),
+            'Original_N_Anxiety_Trials': len(ddm_anxiety),
+            'Original_N_Positive_Trials': len(ddm_positive),
+            'Original_Data_Quality': f"Valid: {len(valid_rt_trials)}/{len(trials)} trials"
         })
-        continue
-    
-    # Filter for valid trials with available data
-    valid_response_trials = trials[~trials['response'].isna()]
-    valid_rt_trials = trials[(~trials['response'].isna()) & (~trials['rt'].isna())]
-    
-    # Calculate Response Selection Score (uses all trials with valid responses)
-    negative_trials = valid_response_trials[valid_response_trials['scenario_type'].isin(['depression', 'anxiety'])]
-    benign_trials = valid_response_trials[valid_response_trials['scenario_type'] == 'positive']
-    
-    prop_negative_endorsed = (negative_trials['response'] == 'r').sum() / len(negative_trials) if len(negative_trials) > 0 else np.nan
-    prop_benign_endorsed = (benign_trials['response'] == 'r').sum() / len(benign_trials) if len(benign_trials) > 0 else np.nan
-    
-    response_selection_score = prop_negative_endorsed - prop_benign_endorsed if not (pd.isna(prop_negative_endorsed) or pd.isna(prop_benign_endorsed)) else np.nan
-    
-    # Calculate RT Bias Index (uses only trials with both response and RT)
-    valid_negative_trials = valid_rt_trials[valid_rt_trials['scenario_type'].isin(['depression', 'anxiety'])]
-    negative_endorsed = valid_negative_trials[valid_negative_trials['response'] == 'r']
-    negative_rejected = valid_negative_trials[valid_negative_trials['response'] == 'u']
-    
-    mean_rt_endorse_negative = negative_endorsed['rt'].mean() if len(negative_endorsed) > 0 else np.nan
-    mean_rt_reject_negative = negative_rejected['rt'].mean() if len(negative_rejected) > 0 else np.nan
-    
-    rt_bias_index = mean_rt_endorse_negative - mean_rt_reject_negative if not (pd.isna(mean_rt_endorse_negative) or pd.isna(mean_rt_reject_negative)) else np.nan
-    
-    # Prepare clean data for DDM (complete trials only)
-    ddm_trials = valid_rt_trials[(~valid_rt_trials['scenario_type'].isna())].copy()
-    ddm_trials['response_binary'] = (ddm_trials['response'] == 'r').astype(int)
-    ddm_trials['participant_id'] = participant_id
-    
-    # Separate by stimulus type for DDM
-    ddm_depression = ddm_trials[ddm_trials['scenario_type'] == 'depression'].copy()
-    ddm_anxiety = ddm_trials[ddm_trials['scenario_type'] == 'anxiety'].copy() 
-    ddm_positive = ddm_trials[ddm_trials['scenario_type'] == 'positive'].copy()
-    
-    # Add to DDM dataset for export
-    if len(ddm_trials) > 0:
-        original_ddm_data.append(ddm_trials)
-    
-    original_results.append({
-        'ResponseId': participant_id,
-        'Original_Response_Selection_Score': response_selection_score,
-        'Original_Prop_Negative_Endorsed': prop_negative_endorsed,
-        'Original_Prop_Benign_Endorsed': prop_benign_endorsed,
-        'Original_RT_Bias_Index': rt_bias_index,
-        'Original_Mean_RT_Endorse_Negative': mean_rt_endorse_negative,
-        'Original_Mean_RT_Reject_Negative': mean_rt_reject_negative,
-        'Original_N_Trials': len(trials),
-        'Original_N_Valid_Trials': len(valid_rt_trials),
-        'Original_N_Depression_Trials': len(ddm_depression),
-        'Original_N_Anxiety_Trials': len(ddm_anxiety),
-        'Original_N_Positive_Trials': len(ddm_positive),
-        'Original_Data_Quality': f"Valid: {len(valid_rt_trials)}/{len(trials)} trials"
+
+    original_df = pd.DataFrame(original_results)
+    if ddm_sink is not None:
+        return original_df, None
+    original_ddm_combined = pd.concat(original_ddm_data, ignore_index=True) if original_ddm_data else pd.DataFrame()
+
+    return original_df, original_ddm_combined
+
+
+def explode_comma_columns(df, columns):
+    """
+    Split comma-separated trial columns for all participants into one long trial table
+
+    columns maps output field name -> (source column, data type). Values are
+    parsed like safe_parse_comma_data, and each participant contributes as many
+    trials as their longest field, with shorter fields padded with NaN (as in
+    create_trial_dataframe). Returns the trial table, with 'row' (position of
+    the participant in df) and 'trial' columns, and the trial count per row.
+    """
+    fields = {}
+    for field, (column, data_type) in columns.items():
+        if data_type == 'float':
+            fields[field] = parse_delimited_numeric(df[column], ',')
+        else:
+            fields[field] = split_delimited(df[column], ',')
+    return explode_aligned(fields)
+
+
+def mark_no_data(results_df, no_data, score_columns, quality_column):
+    """
+    Give participants without any trial data the same "No data" record as the
+    per-participant path (in place)
+    """
+    if not no_data.any():
+        return
+    results_df[score_columns] = results_df[score_columns].astype(object)
+    results_df.loc[no_data, score_columns] = "No data"
+    results_df.loc[no_data, quality_column] = "Error: No trial data available"
+
+
+# Trials per DDM batch built and written at a time when streaming
+DDM_BATCH_TRIALS = 100_000
+
+
+def ddm_dataset(trials, keep, build, ddm_sink=None):
+    """
+    Build the DDM rows of the trials selected by keep (a boolean array) with
+    build(selected trials)
+
+    Without a sink the whole dataset is returned. With ddm_sink (a
+    TableStream) it is built and appended in blocks of DDM_BATCH_TRIALS
+    trials, so only one block is held in memory, and None is returned.
+    """
+    if ddm_sink is None:
+        return build(trials[keep])
+    for start in range(0, len(trials), DDM_BATCH_TRIALS):
+        end = start + DDM_BATCH_TRIALS
+        ddm_sink.append(build(trials.iloc[start:end][keep[start:end]]))
+    return None
+
+
+ORIGINAL_WSAP_COLUMNS = {
+    'response': ('__js_responses', 'str'),
+    'rt': ('__js_reaction_times', 'float'),
+    'scenario_type': ('__js_scenario_types', 'str'),
+    'word_type': ('__js_word_types', 'str')
+}
+
+# Fixed vocabularies of the categorical trial fields (see common/trial_schema.py)
+ORIGINAL_WSAP_VOCABULARIES = {'response': ENDORSE_KEYS, 'scenario_type': VALENCES, 'word_type': VALENCES}
+
+
+def wsap_trial_store(df, task_name, columns, vocabularies):
+    """
+    Return the parsed trials of one WSAP version as a TrialStore, re-using the
+    memory-mapped store from an earlier run when the source columns are unchanged
+
+    Text fields are stored as categoricals over their vocabularies.
+    """
+    def build():
+        trials, n_trials = explode_comma_columns(df, columns)
+        return TrialStore.from_trials(trials, n_trials, participant_ids=df['ResponseId'],
+                                      vocabularies=vocabularies)
+
+    return cached_trial_store(df, task_name, [column for column, _ in columns.values()], build)
+
+
+def score_original_wsap(df, store=None, ddm_sink=None):
+    """
+    Score the Original WSAP for all participants at once
+
+    Trials from every participant are exploded into one long table and all
+    participant-level metrics come from a single groupby. Output matches
+    score_original_wsap_legacy; store is the parsed trials (built from df when
+    not given). With ddm_sink the DDM data is streamed to it (see ddm_dataset).
+    """
+    if store is None:
+        store = wsap_trial_store(df, 'original_wsap', ORIGINAL_WSAP_COLUMNS, ORIGINAL_WSAP_VOCABULARIES)
+    trials, n_trials = store.to_frame(), store.n_trials
+
+    response = trials['response']
+    scenario_type = trials['scenario_type']
+    has_response = response.notna()
+    valid_rt = has_response & trials['rt'].notna()
+    is_negative = scenario_type.isin(['depression', 'anxiety'])
+    is_benign = scenario_type == 'positive'
+    endorsed = response == 'r'
+    ddm_mask = valid_rt & scenario_type.notna()
+
+    # Response Selection Score uses all trials with valid responses; the RT
+    # Bias Index uses only trials with both response and RT
+    flags = pd.DataFrame({
+        'row': trials['row'],
+        'n_valid': valid_rt,
+        'n_negative': has_response & is_negative,
+        'n_negative_endorsed': has_response & is_negative & endorsed,
+        'n_benign': has_response & is_benign,
+        'n_benign_endorsed': has_response & is_benign & endorsed,
+        'n_depression': ddm_mask & (scenario_type == 'depression'),
+        'n_anxiety': ddm_mask & (scenario_type == 'anxiety'),
+        'n_positive': ddm_mask & is_benign,
+        'rt_endorse_negative': trials['rt'].where(valid_rt & is_negative & endorsed),
+        'rt_reject_negative': trials['rt'].where(valid_rt & is_negative & (response == 'u'))
     })
+    per_row = flags.groupby('row').agg({
+        'n_valid': 'sum',
+        'n_negative': 'sum',
+        'n_negative_endorsed': 'sum',
+        'n_benign': 'sum',
+        'n_benign_endorsed': 'sum',
+        'n_depression': 'sum',
+        'n_anxiety': 'sum',
+        'n_positive': 'sum',
+        'rt_endorse_negative': 'mean',
+        'rt_reject_negative': 'mean'
+    }).reindex(np.arange(len(df)))
 
-original_df = pd.DataFrame(original_results)
+    prop_negative_endorsed = per_row['n_negative_endorsed'] / per_row['n_negative'].where(per_row['n_negative'] > 0)
+    prop_benign_endorsed = per_row['n_benign_endorsed'] / per_row['n_benign'].where(per_row['n_benign'] > 0)
+    n_valid = per_row['n_valid'].fillna(0).astype(int)
 
-# ============================================================================
-# PART 2: NEW WSAP ANALYSIS (Columns BW-BZ)
-# ============================================================================
+    original_df = pd.DataFrame({
+        'ResponseId': df['ResponseId'].to_numpy(),
+        'Original_Response_Selection_Score': (prop_negative_endorsed - prop_benign_endorsed).to_numpy(),
+        'Original_Prop_Negative_Endorsed': prop_negative_endorsed.to_numpy(),
+        'Original_Prop_Benign_Endorsed': prop_benign_endorsed.to_numpy(),
+        'Original_RT_Bias_Index': (per_row['rt_endorse_negative'] - per_row['rt_reject_negative']).to_numpy(),
+        'Original_Mean_RT_Endorse_Negative': per_row['rt_endorse_negative'].to_numpy(),
+        'Original_Mean_RT_Reject_Negative': per_row['rt_reject_negative'].to_numpy(),
+        'Original_N_Trials': n_trials,
+        'Original_N_Valid_Trials': n_valid.to_numpy(),
+        'Original_N_Depression_Trials': per_row['n_depression'].fillna(0).astype(int).to_numpy(),
+        'Original_N_Anxiety_Trials': per_row['n_anxiety'].fillna(0).astype(int).to_numpy(),
+        'Original_N_Positive_Trials': per_row['n_positive'].fillna(0).astype(int).to_numpy(),
+        'Original_Data_Quality': ("Valid: " + n_valid.astype(str) + "/" + pd.Series(n_trials).astype(str) + " trials").to_numpy()
+    })
 
-new_results = []
-new_ddm_data = []
+    mark_no_data(original_df, n_trials == 0,
+                 ['Original_Response_Selection_Score', 'Original_Prop_Negative_Endorsed',
+                  'Original_Prop_Benign_Endorsed', 'Original_RT_Bias_Index',
+                  'Original_Mean_RT_Endorse_Negative', 'Original_Mean_RT_Reject_Negative'],
+                 'Original_Data_Quality')
 
-for idx, row in df.iterrows():
-    participant_id = row['ResponseId']
-    
-    # Column names for New WSAP (adjust if needed)
-    rt_col = '__js_reaction_time'
-    valence_col = '__js_valence'
-    stimulus_col = '__js_stimulus'
-    response_col = '__js_response'
-    
-    try:
-        # Parse comma-separated values safely
-        rts = safe_parse_comma_data(row[rt_col], 'float')
-        valences = safe_parse_comma_data(row[valence_col])
-        responses = safe_parse_comma_data(row[response_col])
-        
-        if not any([rts, valences, responses]):
-            raise ValueError("No trial data available")
-        
-        # Create trial-level data with choice interpretation
-        trials_list = []
-        max_len = max(len(rts) if rts else 0, len(valences) if valences else 0, len(responses) if responses else 0)
-        
-        for i in range(max_len):
-            # Get values or NaN if missing
-            rt = rts[i] if i < len(rts) else np.nan
-            valence = valences[i] if i < len(valences) else np.nan
-            response = responses[i] if i < len(responses) else np.nan
-            
-            if pd.isna(response):
-                chosen_valence = np.nan
-            else:
-                response = str(response).strip()
-                
-                # Determine which valence was chosen
-                # j = left option (first valence), f = right option (second valence)
-                if pd.isna(valence):
+    # Prepare clean data for DDM (complete trials only)
+    response_ids = df['ResponseId'].to_numpy()
+    original_ddm_combined = ddm_dataset(trials, ddm_mask.to_numpy(), lambda ddm_trials: pd.DataFrame({
+        'response': ddm_trials['response'].array,
+        'rt': ddm_trials['rt'].to_numpy(),
+        'scenario_type': ddm_trials['scenario_type'].array,
+        'word_type': ddm_trials['word_type'].array,
+        'response_binary': (ddm_trials['response'] == 'r').to_numpy(BINARY_DTYPE),
+        'participant_id': response_ids[ddm_trials['row'].to_numpy()]
+    }), ddm_sink)
+
+    return original_df, original_ddm_combined
+
+
+def original_wsap_components(store):
+    """
+    Per-trial terms of the Original WSAP scores (see common/bootstrap.py)
+
+    Returns (components, score) of the Response Selection Score (endorsed and
+    answered negative trials, then benign ones) and of the RT Bias Index (RT
+    and count of endorsed negative trials with an RT, then of rejected ones).
+    """
+    trials = store.to_frame()
+    response = trials['response']
+    scenario_type = trials['scenario_type']
+    has_response = response.notna().to_numpy()
+    negative = has_response & scenario_type.isin(['depression', 'anxiety']).to_numpy()
+    benign = has_response & (scenario_type == 'positive').to_numpy()
+    endorsed = (response == 'r').to_numpy()
+    rt = trials['rt'].to_numpy()
+    endorse_negative = negative & endorsed & ~np.isnan(rt)
+    reject_negative = negative & (response == 'u').to_numpy() & ~np.isnan(rt)
+
+    rss = np.column_stack([negative & endorsed, negative, benign & endorsed, benign])
+    rt_bias = np.column_stack([np.where(endorse_negative, rt, 0.0), endorse_negative,
+                               np.where(reject_negative, rt, 0.0), reject_negative])
+    return (rss, mean_difference), (rt_bias, mean_difference)
+
+
+def score_new_wsap_legacy(df, ddm_sink=None):
+    """
+    Score the New WSAP one participant at a time (reference implementation)
+
+    Returns the participant-level results and the combined DDM trial data;
+    ddm_sink is used as in score_original_wsap_legacy.
+    """
+    new_results = []
+    new_ddm_data = []
+
+    for idx, row in df.iterrows():
+        participant_id = row['ResponseId']
+
+        # Column names for New WSAP (adjust if needed)
+        rt_col = '__js_reaction_time'
+        valence_col = '__js_valence'
+        stimulus_col = '__js_stimulus'
+        response_col = '__js_response'
+
+        try:
+            # Parse comma-separated values safely
+            rts = safe_parse_comma_data(row[rt_col], 'float')
+            valences = safe_parse_comma_data(row[valence_col])
+            responses = safe_parse_comma_data(row[response_col])
+
+            if not any([rts, valences, responses]):
+                raise ValueError("No trial data available")
+
+            # Create trial-level data with choice interpretation
+            trials_list = []
+            max_len = max(len(rts) if rts else 0, len(valences) if valences else 0, len(responses) if responses else 0)
+
+            for i in range(max_len):
+                # Get values or NaN if missing
+                rt = rts[i] if i < len(rts) else np.nan
+                valence = valences[i] if i < len(valences) else np.nan
+                response = responses[i] if i < len(responses) else np.nan
+
+                if pd.isna(response):
                     chosen_valence = np.nan
                 else:
-                    valence_str = str(valence)
-                    valence_pair = valence_str.split(',') if ',' in valence_str else [valence_str]
-                    
-                    if len(valence_pair) == 2:
-                        chosen_valence = valence_pair[0].strip() if response == 'j' else valence_pair[1].strip()
+                    response = str(response).strip()
+
+                    # Determine which valence was chosen
+                    # j = left option (first valence), f = right option (second valence)
+                    if pd.isna(valence):
+                        chosen_valence = np.nan
                     else:
-                        chosen_valence = valence_pair[0].strip()
-            
-            trials_list.append({
-                'rt': rt,
-                'response': response,
-                'chosen_valence': chosen_valence
+                        valence_str = str(valence)
+                        valence_pair = valence_str.split(',') if ',' in valence_str else [valence_str]
+
+                        if len(valence_pair) == 2:
+                            chosen_valence = valence_pair[0].strip() if response == 'j' else valence_pair[1].strip()
+                        else:
+                            chosen_valence = valence_pair[0].strip()
+
+                trials_list.append({
+                    'rt': rt,
+                    'response': response,
+                    'chosen_valence': chosen_valence
+                })
+
+            trials = pd.DataFrame(trials_list)
+
+            if len(trials) == 0:
+                raise ValueError("No trial data created")
+
+        except Exception as e:
+            # Create "No data" record for this participant
+            new_results.append({
+                'ResponseId': participant_id,
+                'New_Response_Selection_Score': "No data",
+                'New_Prop_Negative_Chosen': "No data",
+                'New_Prop_Benign_Chosen': "No data",
+                'New_RT_Bias_Index': "No data",
+                'New_Mean_RT_Negative': "No data",
+                'New_Mean_RT_Benign': "No data",
+                'New_N_Trials': 0,
+                'New_N_Valid_Trials': 0,
+                'New_N_Depression_Chosen': 0,
+                'New_N_Anxiety_Chosen': 0,
+                'New_N_Positive_Chosen': 0,
+                'New_Data_Quality': f"Error: {str(e)}"
             })
-        
-        trials = pd.DataFrame(trials_list)
-        
-        if len(trials) == 0:
-            raise ValueError("No trial data created")
-    
-    except Exception as e:
-        # Create "No data" record for this participant
+            continue
+
+        # Filter for valid trials
+        valid_choice_trials = trials[~trials['chosen_valence'].isna()]
+        valid_rt_trials = trials[(~trials['chosen_valence'].isna()) & (~trials['rt'].isna())]
+
+        # Calculate Response Selection Score (uses all trials with valid choices)
+        negative_chosen = valid_choice_trials[valid_choice_trials['chosen_valence'].isin(['anxiety', 'depression'])].shape[0]
+        benign_chosen = valid_choice_trials[valid_choice_trials['chosen_valence'].isin(['benign', 'positive'])].shape[0]
+
+        total_valid_choices = len(valid_choice_trials)
+        prop_negative_chosen = negative_chosen / total_valid_choices if total_valid_choices > 0 else np.nan
+        prop_benign_chosen = benign_chosen / total_valid_choices if total_valid_choices > 0 else np.nan
+
+        response_selection_score = prop_negative_chosen - prop_benign_chosen if not (pd.isna(prop_negative_chosen) or pd.isna(prop_benign_chosen)) else np.nan
+
+        # Calculate RT Bias Index (uses only trials with both choice and RT)
+        rt_negative = valid_rt_trials[valid_rt_trials['chosen_valence'].isin(['anxiety', 'depression'])]['rt'].mean()
+        rt_benign = valid_rt_trials[valid_rt_trials['chosen_valence'].isin(['benign', 'positive'])]['rt'].mean()
+
+        rt_bias_index = rt_negative - rt_benign if not (pd.isna(rt_negative) or pd.isna(rt_benign)) else np.nan
+
+        # Prepare clean data for DDM (complete trials only)
+        ddm_trials = valid_rt_trials.copy()
+        ddm_trials['participant_id'] = participant_id
+        # For new WSAP, response_binary represents choosing negative vs positive (1=negative)
+        ddm_trials['response_binary'] = ddm_trials['chosen_valence'].isin(['anxiety', 'depression']).astype(int)
+
+        # Separate by stimulus type for DDM
+        depression_trials = ddm_trials[ddm_trials['chosen_valence'] == 'depression']
+        anxiety_trials = ddm_trials[ddm_trials['chosen_valence'] == 'anxiety']
+        positive_trials = ddm_trials[ddm_trials['chosen_valence'] == 'positive']
+
+        # Add to DDM dataset for export
+        if len(ddm_trials) > 0:
+            (new_ddm_data if ddm_sink is None else ddm_sink).append(ddm_trials)
+
         new_results.append({
             'ResponseId': participant_id,
-            'New_Response_Selection_Score': "No data",
-            'New_Prop_Negative_Chosen': "No data",
-            'New_Prop_Benign_Chosen': "No data",
-            'New_RT_Bias_Index': "No data",
-            'New_Mean_RT_Negative': "No data",
-            'New_Mean_RT_Benign': "No data",
-            'New_N_Trials': 0,
-            'New_N_Valid_Trials': 0,
-            'New_N_Depression_Chosen': 0,
-            'New_N_Anxiety_Chosen': 0,
-            'New_N_Positive_Chosen': 0,
-            'New_Data_Quality': f"Error: {str(e)}"
+            'New_Response_Selection_Score': response_selection_score,
+            'New_Prop_Negative_Chosen': prop_negative_chosen,
+            'New_Prop_Benign_Chosen': prop_benign_chosen,
+            'New_RT_Bias_Index': rt_bias_index,
+            'New_Mean_RT_Negative': rt_negative,
+            'New_Mean_RT_Benign': rt_benign,
+            'New_N_Trials': len(trials),
+            'New_N_Valid_Trials': len(valid_rt_trials),
+            'New_N_Depression_Chosen': len(depression_trials),
+            'New_N_Anxiety_Chosen': len(anxiety_trials),
+            'New_N_Positive_Chosen': len(positive_trials),
+            'New_Data_Quality': f"Valid: {len(valid_rt_trials)}/{len(trials)} trials"
         })
-        continue
-    
-    # Filter for valid trials
-    valid_choice_trials = trials[~trials['chosen_valence'].isna()]
-    valid_rt_trials = trials[(~trials['chosen_valence'].isna()) & (~trials['rt'].isna())]
-    
-    # Calculate Response Selection Score (uses all trials with valid choices)
-    negative_chosen = valid_choice_trials[valid_choice_trials['chosen_valence'].isin(['anxiety', 'depression'])].shape[0]
-    benign_chosen = valid_choice_trials[valid_choice_trials['chosen_valence'].isin(['benign', 'positive'])].shape[0]
-    
-    total_valid_choices = len(valid_choice_trials)
-    prop_negative_chosen = negative_chosen / total_valid_choices if total_valid_choices > 0 else np.nan
-    prop_benign_chosen = benign_chosen / total_valid_choices if total_valid_choices > 0 else np.nan
-    
-    response_selection_score = prop_negative_chosen - prop_benign_chosen if not (pd.isna(prop_negative_chosen) or pd.isna(prop_benign_chosen)) else np.nan
-    
-    # Calculate RT Bias Index (uses only trials with both choice and RT)
-    rt_negative = valid_rt_trials[valid_rt_trials['chosen_valence'].isin(['anxiety', 'depression'])]['rt'].mean()
-    rt_benign = valid_rt_trials[valid_rt_trials['chosen_valence'].isin(['benign', 'positive'])]['rt'].mean()
-    
-    rt_bias_index = rt_negative - rt_benign if not (pd.isna(rt_negative) or pd.isna(rt_benign)) else np.nan
-    
-    # Prepare clean data for DDM (complete trials only)
-    ddm_trials = valid_rt_trials.copy()
-    ddm_trials['participant_id'] = participant_id
-    # For new WSAP, response_binary represents choosing negative vs positive (1=negative)
-    ddm_trials['response_binary'] = ddm_trials['chosen_valence'].isin(['anxiety', 'depression']).astype(int)
-    
-    # Separate by stimulus type for DDM
-    depression_trials = ddm_trials[ddm_trials['chosen_valence'] == 'depression']
-    anxiety_trials = ddm_trials[ddm_trials['chosen_valence'] == 'anxiety']
-    positive_trials = ddm_trials[ddm_trials['chosen_valence'] == 'positive']
-    
-    # Add to DDM dataset for export
-    if len(ddm_trials) > 0:
-        new_ddm_data.append(ddm_trials)
-    
-    new_results.append({
-        'ResponseId': participant_id,
-        'New_Response_Selection_Score': response_selection_score,
-        'New_Prop_Negative_Chosen': prop_negative_chosen,
-        'New_Prop_Benign_Chosen': prop_benign_chosen,
-        'New_RT_Bias_Index': rt_bias_index,
-        'New_Mean_RT_Negative': rt_negative,
-        'New_Mean_RT_Benign': rt_benign,
-        'New_N_Trials': len(trials),
-        'New_N_Valid_Trials': len(valid_rt_trials),
-        'New_N_Depression_Chosen': len(depression_trials),
-        'New_N_Anxiety_Chosen': len(anxiety_trials),
-        'New_N_Positive_Chosen': len(positive_trials),
-        'New_Data_Quality': f"Valid: {len(valid_rt_trials)}/{len(trials)} trials"
+
+    new_df = pd.DataFrame(new_results)
+    if ddm_sink is not None:
+        return new_df, None
+    new_ddm_combined = pd.concat(new_ddm_data, ignore_index=True) if new_ddm_data else pd.DataFrame()
+
+    return new_df, new_ddm_combined
+
+
+NEW_WSAP_COLUMNS = {
+    'rt': ('__js_reaction_time', 'float'),
+    'valence': ('__js_valence', 'str'),
+    'response': ('__js_response', 'str')
+}
+
+NEW_WSAP_VOCABULARIES = {'valence': VALENCES, 'response': CHOICE_KEYS}
+
+# All export columns the analysis reads; the loader materializes only these
+REQUIRED_COLUMNS = ['ResponseId'] + [column for column, _ in ORIGINAL_WSAP_COLUMNS.values()] \
+    + [column for column, _ in NEW_WSAP_COLUMNS.values()]
+
+# Columns holding the task's responses; rows without any are participants
+# who did not do the task
+DATA_COLUMNS = REQUIRED_COLUMNS[1:]
+
+
+def resolve_chosen_valence(responses, valences):
+    """
+    Determine the chosen valence for every trial at once
+
+    j = left option (first valence), f = right option (second valence). A
+    trial without a response or valence has no choice, and a single valence
+    is taken as the choice whatever the response. Returns a categorical over
+    VALENCES.
+    """
+    chosen_valence = valences.astype(object).where(responses.notna())
+
+    # Only cells that hold a valence pair need the j/f lookup
+    has_pair = chosen_valence.str.contains(',', regex=False, na=False)
+    if has_pair.any():
+        pairs = chosen_valence[has_pair].str.split(',')
+        first = pairs.str[0].str.strip()
+        second = pairs.str[1].str.strip()
+        pick_second = (pairs.str.len() == 2) & (responses[has_pair] != 'j')
+        chosen_valence[has_pair] = first.where(~pick_second, second)
+
+    return pd.Series(categorize(chosen_valence, VALENCES), index=chosen_valence.index)
+
+
+def score_new_wsap(df, store=None, ddm_sink=None):
+    """
+    Score the New WSAP for all participants at once
+
+    Responses, RTs and valences of every participant are exploded into one
+    long trial table, the chosen valence is resolved with array operations and
+    all participant-level metrics come from a single groupby. Output matches
+    score_new_wsap_legacy; store is the parsed trials (built from df when not
+    given). With ddm_sink the DDM data is streamed to it (see ddm_dataset).
+    """
+    if store is None:
+        store = wsap_trial_store(df, 'new_wsap', NEW_WSAP_COLUMNS, NEW_WSAP_VOCABULARIES)
+    trials, n_trials = store.to_frame(), store.n_trials
+    trials['chosen_valence'] = resolve_chosen_valence(trials['response'], trials['valence'])
+
+    chosen_valence = trials['chosen_valence']
+    valid_choice = chosen_valence.notna()
+    valid_rt = valid_choice & trials['rt'].notna()
+    chose_negative = chosen_valence.isin(['anxiety', 'depression'])
+    chose_benign = chosen_valence.isin(['benign', 'positive'])
+
+    flags = pd.DataFrame({
+        'row': trials['row'],
+        'n_valid_choices': valid_choice,
+        'n_negative_chosen': chose_negative,
+        'n_benign_chosen': chose_benign,
+        'n_valid': valid_rt,
+        'n_depression': valid_rt & (chosen_valence == 'depression'),
+        'n_anxiety': valid_rt & (chosen_valence == 'anxiety'),
+        'n_positive': valid_rt & (chosen_valence == 'positive'),
+        'rt_negative': trials['rt'].where(valid_rt & chose_negative),
+        'rt_benign': trials['rt'].where(valid_rt & chose_benign)
     })
+    per_row = flags.groupby('row').agg({
+        'n_valid_choices': 'sum',
+        'n_negative_chosen': 'sum',
+        'n_benign_chosen': 'sum',
+        'n_valid': 'sum',
+        'n_depression': 'sum',
+        'n_anxiety': 'sum',
+        'n_positive': 'sum',
+        'rt_negative': 'mean',
+        'rt_benign': 'mean'
+    }).reindex(np.arange(len(df)))
 
-new_df = pd.DataFrame(new_results)
-
-# ============================================================================
-# COMBINE RESULTS
-# ============================================================================
-
-combined_df = pd.merge(original_df, new_df, on='ResponseId', how='outer')
-
-# ============================================================================
-# CALCULATE SUMMARY STATISTICS
-# ============================================================================
-
-# Original WSAP Summary
-orig_rss_numeric = pd.to_numeric(original_df['Original_Response_Selection_Score'], errors='coerce').dropna()
-orig_rt_numeric = pd.to_numeric(original_df['Original_RT_Bias_Index'], errors='coerce').dropna()
-
-if len(orig_rss_numeric) > 0:
-    original_summary_data = {
-        'Metric': [
-            'Total Participants',
-            'Participants with Valid Data',
-            'Participants with Missing Data',
-            '',
-            'Response Selection Score - Mean',
-            'Response Selection Score - SD',
-            'Response Selection Score - Min',
-            'Response Selection Score - Max',
-            'Response Selection Score - Median',
-            '',
-            'RT Bias Index - Mean',
-            'RT Bias Index - SD',
-            'RT Bias Index - Min',
-            'RT Bias Index - Max',
-            'RT Bias Index - Median'
-        ],
-        'Value': [
-            str(len(original_df)),
-            str(len(orig_rss_numeric)),
-            str(len(original_df) - len(orig_rss_numeric)),
-            '',
-            f"{orig_rss_numeric.mean():.3f}",
-            f"{orig_rss_numeric.std():.3f}",
-            f"{orig_rss_numeric.min():.3f}",
-            f"{orig_rss_numeric.max():.3f}",
-            f"{orig_rss_numeric.median():.3f}",
-            '',
-            f"{orig_rt_numeric.mean():.3f}" if len(orig_rt_numeric) > 0 else 'No data',
-            f"{orig_rt_numeric.std():.3f}" if len(orig_rt_numeric) > 0 else 'No data',
-            f"{orig_rt_numeric.min():.3f}" if len(orig_rt_numeric) > 0 else 'No data',
-            f"{orig_rt_numeric.max():.3f}" if len(orig_rt_numeric) > 0 else 'No data',
-            f"{orig_rt_numeric.median():.3f}" if len(orig_rt_numeric) > 0 else 'No data'
-        ]
-    }
-else:
-    original_summary_data = {
-        'Metric': ['Total Participants', 'Participants with Valid Data'],
-        'Value': [str(len(original_df)), '0']
-    }
+    total_valid_choices = per_row['n_valid_choices'].where(per_row['n_valid_choices'] > 0)
+    prop_negative_chosen = per_row['n_negative_chosen'] / total_valid_choices
+    prop_benign_chosen = per_row['n_benign_chosen'] / total_valid_choices
+    n_valid = per_row['n_valid'].fillna(0).astype(int)
 
-original_summary_df = pd.DataFrame(original_summary_data)
-
-# New WSAP Summary
-new_rss_numeric = pd.to_numeric(new_df['New_Response_Selection_Score'], errors='coerce').dropna()
-new_rt_numeric = pd.to_numeric(new_df['New_RT_Bias_Index'], errors='coerce').dropna()
-
-if len(new_rss_numeric) > 0:
-    new_summary_data = {
-        'Metric': [
-            'Total Participants',
-            'Participants with Valid Data',
-            'Participants with Missing Data',
-            '',
-            'Response Selection Score - Mean',
-            'Response Selection Score - SD',
-            'Response Selection Score - Min',
-            'Response Selection Score - Max',
-            'Response Selection Score - Median',
-            '',
-            'RT Bias Index - Mean',
-            'RT Bias Index - SD',
-            'RT Bias Index - Min',
-            'RT Bias Index - Max',
-            'RT Bias Index - Median'
-        ],
-        'Value': [
-            str(len(new_df)),
-            str(len(new_rss_numeric)),
-            str(len(new_df) - len(new_rss_numeric)),
-            '',
-            f"{new_rss_numeric.mean():.3f}",
-            f"{new_rss_numeric.std():.3f}",
-            f"{new_rss_numeric.min():.3f}",
-            f"{new_rss_numeric.max():.3f}",
-            f"{new_rss_numeric.median():.3f}",
-            '',
-            f"{new_rt_numeric.mean():.3f}" if len(new_rt_numeric) > 0 else 'No data',
-            f"{new_rt_numeric.std():.3f}" if len(new_rt_numeric) > 0 else 'No data',
-            f"{new_rt_numeric.min():.3f}" if len(new_rt_numeric) > 0 else 'No data',
-            f"{new_rt_numeric.max():.3f}" if len(new_rt_numeric) > 0 else 'No data',
-            f"{new_rt_numeric.median():.3f}" if len(new_rt_numeric) > 0 else 'No data'
-        ]
-    }
-else:
-    new_summary_data = {
-        'Metric': ['Total Participants', 'Participants with Valid Data'],
-        'Value': [str(len(new_df)), '0']
-    }
+    new_df = pd.DataFrame({
+        'ResponseId': df['ResponseId'].to_numpy(),
+        'New_Response_Selection_Score': (prop_negative_chosen - prop_benign_chosen).to_numpy(),
+        'New_Prop_Negative_Chosen': prop_negative_chosen.to_numpy(),
+        'New_Prop_Benign_Chosen': prop_benign_chosen.to_numpy(),
+        'New_RT_Bias_Index': (per_row['rt_negative'] - per_row['rt_benign']).to_numpy(),
+        'New_Mean_RT_Negative': per_row['rt_negative'].to_numpy(),
+        'New_Mean_RT_Benign': per_row['rt_benign'].to_numpy(),
+        'New_N_Trials': n_trials,
+        'New_N_Valid_Trials': n_valid.to_numpy(),
+        'New_N_Depression_Chosen': per_row['n_depression'].fillna(0).astype(int).to_numpy(),
+        'New_N_Anxiety_Chosen': per_row['n_anxiety'].fillna(0).astype(int).to_numpy(),
+        'New_N_Positive_Chosen': per_row['n_positive'].fillna(0).astype(int).to_numpy(),
+        'New_Data_Quality': ("Valid: " + n_valid.astype(str) + "/" + pd.Series(n_trials).astype(str) + " trials").to_numpy()
+    })
+
+    mark_no_data(new_df, n_trials == 0,
+                 ['New_Response_Selection_Score', 'New_Prop_Negative_Chosen', 'New_Prop_Benign_Chosen',
+                  'New_RT_Bias_Index', 'New_Mean_RT_Negative', 'New_Mean_RT_Benign'],
+                 'New_Data_Quality')
+
+    # Prepare clean data for DDM (complete trials only); response_binary
+    # represents choosing negative vs positive (1=negative)
+    response_ids = df['ResponseId'].to_numpy()
+    new_ddm_combined = ddm_dataset(trials, valid_rt.to_numpy(), lambda ddm_trials: pd.DataFrame({
+        'rt': ddm_trials['rt'].to_numpy(),
+        'response': ddm_trials['response'].array,
+        'chosen_valence': ddm_trials['chosen_valence'].array,
+        'participant_id': response_ids[ddm_trials['row'].to_numpy()],
+        'response_binary': ddm_trials['chosen_valence'].isin(['anxiety', 'depression']).to_numpy(BINARY_DTYPE)
+    }), ddm_sink)
+
+    return new_df, new_ddm_combined
+
+
+def new_wsap_components(store):
+    """
+    Per-trial terms of the New WSAP scores (see common/bootstrap.py)
+
+    Returns (components, score) of the Response Selection Score (+1 for a
+    negative choice, -1 for a benign one, and whether there was a choice) and
+    of the RT Bias Index (RT and count of negative choices with an RT, then of
+    benign ones).
+    """
+    trials = store.to_frame()
+    chosen_valence = resolve_chosen_valence(trials['response'], trials['valence'])
+    valid_choice = chosen_valence.notna().to_numpy()
+    chose_negative = chosen_valence.isin(['anxiety', 'depression']).to_numpy()
+    chose_benign = chosen_valence.isin(['benign', 'positive']).to_numpy()
+    rt = trials['rt'].to_numpy()
+    rt_negative = valid_choice & chose_negative & ~np.isnan(rt)
+    rt_benign = valid_choice & chose_benign & ~np.isnan(rt)
+
+    rss = np.column_stack([chose_negative.astype(np.float64) - chose_benign, valid_choice])
+    rt_bias = np.column_stack([np.where(rt_negative, rt, 0.0), rt_negative,
+                               np.where(rt_benign, rt, 0.0), rt_benign])
+    return (rss, mean_score), (rt_bias, mean_difference)
+
+
+# DDM datasets: RTs are written with 12 significant digits, which drops the
+# floating-point noise of the recorded timings (e.g. 1330.0000000000582)
+DDM_FLOAT_FORMAT = '%.12g'
+
+# Compact column types of the Parquet DDM datasets
+DDM_PARQUET_DTYPES = {
+    'response': 'category',
+    'scenario_type': 'category',
+    'word_type': 'category',
+    'chosen_valence': 'category',
+    'participant_id': 'category',
+    'rt': 'float32',
+    'response_binary': 'int8'
+}
+
+
+def ddm_stream(output_dir, version, ddm_format):
+    """
+    Open the DDM dataset of one WSAP version ('original' or 'new') for streaming
+    """
+    path = os.path.join(output_dir, f"{version}_wsap_ddm_data.{ddm_format}")
+    return TableStream(path, ddm_format, float_format=DDM_FLOAT_FORMAT, dtypes=DDM_PARQUET_DTYPES)
+
+
+def wsap_summary(results_df, rss_column, rt_column, intervals=(None, None), reliabilities=(None, None)):
+    """
+    Metric/Value summary of one WSAP version's response selection score and
+    RT bias index ("No data" entries are skipped), with the bootstrap
+    intervals of their means and their split-half reliabilities when given
+    """
+    scores = pd.DataFrame({
+        'rss': pd.to_numeric(results_df[rss_column], errors='coerce'),
+        'rt': pd.to_numeric(results_df[rt_column], errors='coerce')
+    })
+    n_valid = scores['rss'].notna().sum()
+
+    if n_valid == 0:
+        return pd.DataFrame({
+            'Metric': ['Total Participants', 'Participants with Valid Data'],
+            'Value': [str(len(results_df)), '0']
+        })
+
+    summary_spec = [
+        ('Total Participants', str(len(results_df))),
+        ('Participants with Valid Data', str(n_valid)),
+        ('Participants with Missing Data', str(len(results_df) - n_valid)),
+        ('', ''),
+        *stat_rows('Response Selection Score', 'rss', '.3f'),
+        *ci_rows('Response Selection Score', intervals[0], '.3f'),
+        *reliability_rows('Response Selection Score', reliabilities[0]),
+        ('', ''),
+        *stat_rows('RT Bias Index', 'rt', '.3f'),
+        *ci_rows('RT Bias Index', intervals[1], '.3f'),
+        *reliability_rows('RT Bias Index', reliabilities[1])
+    ]
+    return render_summary(scores, summary_spec, empty_value='No data')
+
+
+def score_wsap(df, output_dir, engine, incremental, ddm_format, timer):
+    """
+    Score both WSAP versions, streaming their DDM datasets to output_dir
+
+    Returns the original and new WSAP results and the paths of the DDM datasets.
+    """
+    # The vectorized engine scores from the parsed trial stores of both versions
+    vectorized = engine != 'legacy' and not incremental
+    if vectorized:
+        original_store = wsap_trial_store(df, 'original_wsap', ORIGINAL_WSAP_COLUMNS, ORIGINAL_WSAP_VOCABULARIES)
+        new_store = wsap_trial_store(df, 'new_wsap', NEW_WSAP_COLUMNS, NEW_WSAP_VOCABULARIES)
+        timer.lap('parse')
+
+    # ============================================================================
+    # PART 1: ORIGINAL WSAP ANALYSIS (Columns DO-DT)
+    # ============================================================================
+
+    # DDM-ready trials are streamed to disk while scoring (complete trials only)
+    score = score_original_wsap_legacy if engine == 'legacy' else score_original_wsap
+    with ddm_stream(output_dir, 'original', ddm_format) as original_ddm:
+        if incremental:
+            original_df, original_ddm_combined = score_incrementally(
+                df, 'wsap-original', [column for column, _ in ORIGINAL_WSAP_COLUMNS.values()], score,
+                key_columns=('ResponseId', 'participant_id'),
+                params={'engine': engine, 'code': source_fingerprint(__file__)})
+            original_ddm.append(original_ddm_combined)
+        elif vectorized:
+            original_df, _ = score(df, original_store, ddm_sink=original_ddm)
+        else:
+            original_df, _ = score(df, ddm_sink=original_ddm)
+
+    # ============================================================================
+    # PART 2: NEW WSAP ANALYSIS (Columns BW-BZ)
+    # ============================================================================
+
+    score = score_new_wsap_legacy if engine == 'legacy' else score_new_wsap
+    with ddm_stream(output_dir, 'new', ddm_format) as new_ddm:
+        if incremental:
+            new_df, new_ddm_combined = score_incrementally(
+                df, 'wsap-new', [column for column, _ in NEW_WSAP_COLUMNS.values()], score,
+                key_columns=('ResponseId', 'participant_id'),
+                params={'engine': engine, 'code': source_fingerprint(__file__)})
+            new_ddm.append(new_ddm_combined)
+        elif vectorized:
+            new_df, _ = score(df, new_store, ddm_sink=new_ddm)
+        else:
+            new_df, _ = score(df, ddm_sink=new_ddm)
+
+    return original_df, new_df, [original_ddm.path, new_ddm.path]
+
+
+def run_wsap_analysis(df, output_dir=".", engine="vectorized", incremental=False, timer=None,
+                      formats=('xlsx',), xlsx_engine="auto", ddm_format="csv", memo=True,
+                      bootstrap=0, bootstrap_workers=1, reliability=0, reliability_workers=1):
+    """
+    Run the WSAP analysis on a loaded Qualtrics DataFrame and write the
+    output files to output_dir
+
+    With incremental=True only responses that are new or changed since the
+    last run are scored (see common/incremental.py). With memo=True the scores
+    and result files of an earlier run on the same responses, with the same
+    parameters and code, are re-used (see common/memo.py).
+
+    With bootstrap=N the summaries also give confidence intervals of the mean
+    scores from N bootstrap resamples of participants and their trials (see
+    common/bootstrap.py), spread over bootstrap_workers processes. With
+    reliability=N they also give the split-half reliabilities of the scores
+    over N random splits of every participant's trials, within scenario types
+    for the Original WSAP and across all trials for the New WSAP, whose trials
+    record only the chosen valence (see common/reliability.py), spread over
+    reliability_workers processes.
+
+    formats selects the result files to write ('xlsx', 'csv', 'parquet') and
+    xlsx_engine the workbook writer (see common/output.py). The DDM datasets
+    are written while scoring, as 'csv' or 'parquet' (ddm_format).
+
+    timer (see common/stages.py) records the duration and memory use of each
+    stage of the run and writes them to wsap_run_report.json in output_dir.
+    """
+    timer = timer or NO_TIMER
+    timer.start()
+
+    # The DDM datasets are part of the scoring stage
+    score_key = stage_key('wsap', 'score', df, REQUIRED_COLUMNS,
+                          params={'engine': engine, 'ddm_format': ddm_format,
+                                  'output_dir': os.path.abspath(output_dir)},
+                          code=code_version(score_wsap)) if memo else None
+    scores = load_stage(score_key)
+    reused = ['parse', 'score'] if scores is not None else []
+    if scores is None:
+        original_df, new_df, ddm_files = score_wsap(df, output_dir, engine, incremental, ddm_format, timer)
+        scores = (original_df, new_df)
+        save_stage(score_key, scores, outputs=ddm_files)
+    original_df, new_df = scores
+    timer.lap('score')
+    timer.count('rows', len(df))
+    timer.count('trials', original_df['Original_N_Trials'].sum() + new_df['New_N_Trials'].sum())
+
+    # Summary and result files only change with the scores, this function's
+    # code and the output options
+    output_file = os.path.join(output_dir, "wsap_complete_analysis.xlsx")
+    quality_file = os.path.join(output_dir, "wsap_data_quality_report.csv")
+    report_key = stage_key('wsap', 'report', params={'output_file': os.path.abspath(output_file),
+                                                     'formats': list(formats), 'xlsx_engine': xlsx_engine,
+                                                     'bootstrap': bootstrap, 'reliability': reliability},
+                           code=code_version(run_wsap_analysis), upstream=score_key) if memo else None
+    tables = load_stage(report_key)
+    if tables is not None:
+        replay_tables(tables)
+        timer.lap('export')
+        timer.write_report(os.path.join(output_dir, "wsap_run_report.json"),
+                           task='wsap', engine=engine, incremental=incremental, reused=reused + ['report'])
+        print(f"WSAP results are up to date: {output_file}")
+        return
+
+    # ============================================================================
+    # COMBINE RESULTS
+    # ============================================================================
+
+    combined_df = pd.merge(original_df, new_df, on='ResponseId', how='outer')
+
+    # ============================================================================
+    # BOOTSTRAP CONFIDENCE INTERVALS AND SPLIT-HALF RELIABILITIES
+    # ============================================================================
+    # Participants and their trials are resampled; one interval per score
+
+    original_intervals = new_intervals = (None, None)
+    if bootstrap:
+        original_store = wsap_trial_store(df, 'original_wsap', ORIGINAL_WSAP_COLUMNS, ORIGINAL_WSAP_VOCABULARIES)
+        original_intervals = [bootstrap_mean_ci(components, original_store.offsets, score,
+                                                n_resamples=bootstrap, workers=bootstrap_workers)
+                              for components, score in original_wsap_components(original_store)]
+        new_store = wsap_trial_store(df, 'new_wsap', NEW_WSAP_COLUMNS, NEW_WSAP_VOCABULARIES)
+        new_intervals = [bootstrap_mean_ci(components, new_store.offsets, score,
+                                           n_resamples=bootstrap, workers=bootstrap_workers)
+                         for components, score in new_wsap_components(new_store)]
+        timer.lap('bootstrap')
+
+    original_reliabilities = new_reliabilities = (None, None)
+    if reliability:
+        original_store = wsap_trial_store(df, 'original_wsap', ORIGINAL_WSAP_COLUMNS, ORIGINAL_WSAP_VOCABULARIES)
+        original_reliabilities = [split_half_reliability(components, original_store.offsets, score,
+                                                         n_splits=reliability,
+                                                         strata=original_store.fields['scenario_type'],
+                                                         workers=reliability_workers)
+                                  for components, score in original_wsap_components(original_store)]
+        # The New WSAP valence is the chosen one, i.e. the response itself;
+        # splitting within it would balance the scores across the halves
+        new_store = wsap_trial_store(df, 'new_wsap', NEW_WSAP_COLUMNS, NEW_WSAP_VOCABULARIES)
+        new_reliabilities = [split_half_reliability(components, new_store.offsets, score,
+                                                    n_splits=reliability, workers=reliability_workers)
+                             for components, score in new_wsap_components(new_store)]
+        timer.lap('reliability')
+
+    # ============================================================================
+    # CALCULATE SUMMARY STATISTICS
+    # ============================================================================
+
+    # Original WSAP Summary
+    original_summary_df = wsap_summary(original_df, 'Original_Response_Selection_Score', 'Original_RT_Bias_Index',
+                                       original_intervals, original_reliabilities)
+
+    # New WSAP Summary
+    new_summary_df = wsap_summary(new_df, 'New_Response_Selection_Score', 'New_RT_Bias_Index',
+                                  new_intervals, new_reliabilities)
 
-new_summary_df = pd.DataFrame(new_summary_data)
+    timer.lap('summarize')
 
-# ============================================================================
-# EXPORT RESULTS TO EXCEL
-# ============================================================================
+    # ============================================================================
+    # EXPORT RESULTS TO EXCEL
+    # ============================================================================
 
-output_file = "wsap_complete_analysis.xlsx"
+    # Write to Excel with multiple sheets
+    with ResultWriter(output_file, formats, xlsx_engine) as writer:
+        # Sheet 1: Original WSAP Results
+        writer.write(original_df, 'Original WSAP Results')
 
-# Write to Excel with multiple sheets
-with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-    # Sheet 1: Original WSAP Results
-    original_df.to_excel(writer, sheet_name='Original WSAP Results', index=False)
+        # Sheet 2: Original WSAP Summary
+        writer.write(original_summary_df, 'Original WSAP Summary')
 
-    # Sheet 2: Original WSAP Summary
-    original_summary_df.to_excel(writer, sheet_name='Original WSAP Summary', index=False)
+        # Sheet 3: New WSAP Results
+        writer.write(new_df, 'New WSAP Results')
 
-    # Sheet 3: New WSAP Results
-    new_df.to_excel(writer, sheet_name='New WSAP Results', index=False)
+        # Sheet 4: New WSAP Summary
+        writer.write(new_summary_df, 'New WSAP Summary')
 
-    # Sheet 4: New WSAP Summary
-    new_summary_df.to_excel(writer, sheet_name='New WSAP Summary', index=False)
+    # Export data quality report
+    quality_report = combined_df[['ResponseId', 'Original_Data_Quality', 'New_Data_Quality']].copy()
+    quality_report.to_csv(quality_file, index=False)
+    save_stage(report_key, writer.tables, outputs=writer.files + [quality_file])
 
-# Export DDM-ready datasets
-if original_ddm_data:
-    original_ddm_combined = pd.concat(original_ddm_data, ignore_index=True)
-    ddm_file = "original_wsap_ddm_data.csv"
-    original_ddm_combined.to_csv(ddm_file, index=False)
+    timer.lap('export')
+    timer.write_report(os.path.join(output_dir, "wsap_run_report.json"),
+                       task='wsap', engine=engine, incremental=incremental, reused=reused)
 
-if new_ddm_data:
-    new_ddm_combined = pd.concat(new_ddm_data, ignore_index=True)
-    ddm_file = "new_wsap_ddm_data.csv"
-    new_ddm_combined.to_csv(ddm_file, index=False)
+    print(f"WSAP analysis complete. Results saved to: {', '.join(writer.outputs)}")
 
-# Export data quality report
-quality_report = combined_df[['ResponseId', 'Original_Data_Quality', 'New_Data_Quality']].copy()
-quality_file = "wsap_data_quality_report.csv"
-quality_report.to_csv(quality_file, index=False)
 
-print(f"WSAP analysis complete. Results saved to: {output_file}")
\ No newline at end of file
+if __name__ == "__main__":
+    timer = timer_from_argv()
+    df = load_qualtrics_export(file_name, columns=REQUIRED_COLUMNS)
+    timer.lap('load')
+    run_wsap_analysis(df, timer=timer)
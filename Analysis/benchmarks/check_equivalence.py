@@ -0,0 +1,235 @@
+"""
+Check the analyses against the committed reference outputs.
+
+Each selected scoring engine is run on 1_values_excel.xlsx in a fresh process,
+writing into a temporary folder, and every sheet and CSV it produces is
+compared cell by cell with the result files committed in the task subfolders
+(AST/ast_analysis_results.xlsx, WSAP/new_wsap_ddm_data.csv, ...). Numbers are
+compared with a relative and absolute tolerance, everything else exactly;
+empty cells only match empty cells. Differences are listed per file and sheet
+with their cell address.
+
+The legacy engine is always run as well, so its runtime is reported next to
+that of the engines under test. The legacy engines parse the export cells one
+by one, without common/parsing.py or the trial stores, so a regression in the
+shared parsers shows up as a difference of the vectorized engines only.
+
+Usage:
+    python3 check_equivalence.py
+    python3 check_equivalence.py --tasks wsap pst --rtol 1e-6
+    python3 check_equivalence.py --repeat 5 --report equivalence.json
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ANALYSIS_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ANALYSIS_DIR)
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+from common.loader import load_qualtrics_export
+from common.stages import StageTimer
+from run_all_analyses import DEFAULT_INPUT, TASKS, load_task_module
+from run_benchmarks import run_isolated
+
+# Committed reference outputs of each task (in the task's subfolder)
+REFERENCE_OUTPUTS = {
+    'ast': ['ast_analysis_results.xlsx'],
+    'sst': ['sst_analysis_results.xlsx'],
+    'pst': ['pst_analysis_results.xlsx'],
+    'questionnaire': ['questionnaire_analysis_results.xlsx'],
+    'wsap': ['wsap_complete_analysis.xlsx', 'original_wsap_ddm_data.csv', 'new_wsap_ddm_data.csv',
+             'wsap_data_quality_report.csv']
+}
+
+
+def read_output(path):
+    """
+    Read an output file as sheet name -> grid of cell values (header row included)
+    """
+    if path.endswith('.csv'):
+        return {'': pd.read_csv(path, header=None, dtype=str, keep_default_na=False)}
+    return pd.read_excel(path, sheet_name=None, header=None)
+
+
+def compare_cells(expected, actual, rtol, atol):
+    """
+    Compare two grids of cell values
+
+    Returns a list of (row, column, expected value, actual value) for every
+    cell that differs. Grids of different shapes are compared over the larger
+    shape, so missing or extra rows show up as differences.
+    """
+    n_rows = max(expected.shape[0], actual.shape[0])
+    n_cols = max(expected.shape[1], actual.shape[1])
+    expected = expected.reindex(index=range(n_rows), columns=range(n_cols)).to_numpy(dtype=object)
+    actual = actual.reindex(index=range(n_rows), columns=range(n_cols)).to_numpy(dtype=object)
+
+    expected_empty = pd.isna(expected) | (expected == '')
+    actual_empty = pd.isna(actual) | (actual == '')
+    expected_number = pd.to_numeric(pd.Series(expected.ravel()), errors='coerce').to_numpy(float).reshape(expected.shape)
+    actual_number = pd.to_numeric(pd.Series(actual.ravel()), errors='coerce').to_numpy(float).reshape(actual.shape)
+    numeric = ~expected_empty & ~actual_empty & ~np.isnan(expected_number) & ~np.isnan(actual_number)
+
+    with np.errstate(invalid='ignore'):
+        close = np.isclose(expected_number, actual_number, rtol=rtol, atol=atol)
+    equal = np.where(numeric, close,
+                     np.where(expected_empty | actual_empty, expected_empty & actual_empty,
+                              expected.astype(str) == actual.astype(str)))
+
+    return [(row, col, expected[row, col], actual[row, col]) for row, col in np.argwhere(~equal)]
+
+
+def compare_outputs(reference_file, output_file, rtol, atol):
+    """
+    Compare an output file with its reference
+
+    Returns sheet name -> list of differences (see compare_cells); a missing
+    file or sheet is reported as a difference of its own.
+    """
+    if not os.path.exists(output_file):
+        return {'': [(None, None, 'file', 'missing')]}
+
+    expected = read_output(reference_file)
+    actual = read_output(output_file)
+    differences = {}
+    for sheet in expected:
+        if sheet not in actual:
+            differences[sheet] = [(None, None, 'sheet', 'missing')]
+        else:
+            differences[sheet] = compare_cells(expected[sheet], actual[sheet], rtol, atol)
+    for sheet in actual:
+        if sheet not in expected:
+            differences[sheet] = [(None, None, 'no sheet', 'extra sheet')]
+    if list(actual) != list(expected) and not any(differences.values()):
+        differences['(sheet order)'] = [(None, None, list(expected), list(actual))]
+    return {sheet: found for sheet, found in differences.items() if found}
+
+
+def _format_value(value):
+    return '<empty>' if pd.isna(value) or value == '' else repr(value)
+
+
+def format_difference(row, col, expected, actual, header):
+    if row is None:
+        return f"expected {expected}, got {actual}"
+    column = f" ({header[col]})" if col < len(header) and not pd.isna(header[col]) and row > 0 else ""
+    return f"{get_column_letter(col + 1)}{row + 1}{column}: expected {_format_value(expected)}, got {_format_value(actual)}"
+
+
+def run_implementation(task_name, engine, output_dir, export_file):
+    """
+    Run one analysis with the given engine, writing its outputs to output_dir
+
+    Runs in a fresh process with its own trial store, so every run parses the
+    export's task columns from scratch. Returns the runtime and its stages.
+    """
+    import common.trial_store as trial_store
+    store_dir = tempfile.mkdtemp(prefix="qualtrics-equivalence-")
+    trial_store.DEFAULT_STORE_DIR = store_dir
+
+    try:
+        module = load_task_module(task_name)
+        df = load_qualtrics_export(export_file, columns=module.REQUIRED_COLUMNS)
+        timer = StageTimer()
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            getattr(module, TASKS[task_name][2])(df, output_dir=output_dir, engine=engine, timer=timer,
+                                                 memo=False)
+        seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+    return {'seconds': seconds, 'stages': timer.stages}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the analyses' outputs with the committed results.")
+    parser.add_argument('--tasks', nargs='+', choices=list(TASKS), default=list(TASKS),
+                        help="Analyses to check (default: all)")
+    parser.add_argument('--engines', nargs='+', choices=['vectorized', 'legacy'], default=['vectorized'],
+                        help="Scoring engines to check (default: vectorized; legacy is always run)")
+    parser.add_argument('--rtol', type=float, default=1e-9, help="Relative tolerance for numbers (default: 1e-9)")
+    parser.add_argument('--atol', type=float, default=1e-12, help="Absolute tolerance for numbers (default: 1e-12)")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Runs per engine; the fastest is reported (default: 1)")
+    parser.add_argument('--max-diffs', type=int, default=20,
+                        help="Differences listed per sheet (default: 20)")
+    parser.add_argument('--report', default=None, help="Also save the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    task_names = [name for name in TASKS if name in args.tasks]
+    engines = ['legacy'] + [engine for engine in args.engines if engine != 'legacy']
+
+    # Make sure the runs load the export from the columnar cache
+    load_qualtrics_export(DEFAULT_INPUT)
+
+    work_dir = tempfile.mkdtemp(prefix="qualtrics-equivalence-")
+    results = []
+    try:
+        for task_name in task_names:
+            subfolder = TASKS[task_name][0]
+            runtimes = {}
+            for engine in engines:
+                output_dir = os.path.join(work_dir, engine, subfolder)
+                os.makedirs(output_dir)
+                runs = [run_isolated(run_implementation, task_name, engine, output_dir, DEFAULT_INPUT)
+                        for _ in range(max(args.repeat, 1))]
+                runtimes[engine] = min(runs, key=lambda run: run['seconds'])
+
+                print(f"\n{task_name} ({engine}): {runtimes[engine]['seconds']:.3f}s")
+                differences = {}
+                for file_name in REFERENCE_OUTPUTS[task_name]:
+                    reference_file = os.path.join(ANALYSIS_DIR, subfolder, file_name)
+                    output_file = os.path.join(output_dir, file_name)
+                    found = compare_outputs(reference_file, output_file, args.rtol, args.atol)
+                    n_differences = sum(len(cells) for cells in found.values())
+                    print(f"  {file_name}: {'OK' if not found else f'{n_differences} differences'}")
+
+                    header = {}
+                    if found and os.path.exists(output_file):
+                        header = {sheet: grid.iloc[0].tolist() for sheet, grid in read_output(reference_file).items()}
+                    for sheet, cells in found.items():
+                        listed = [format_difference(*cell, header.get(sheet, [])) for cell in cells]
+                        for line in listed[:args.max_diffs]:
+                            print(f"    {f'[{sheet}] ' if sheet else ''}{line}")
+                        if len(listed) > args.max_diffs:
+                            print(f"    ... and {len(listed) - args.max_diffs} more")
+                    differences[file_name] = {sheet: [format_difference(*cell, header.get(sheet, []))
+                                                      for cell in cells]
+                                              for sheet, cells in found.items()}
+
+                results.append({'task': task_name, 'engine': engine, **runtimes[engine],
+                                'equivalent': not any(differences.values()), 'differences': differences})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\nSummary:")
+    print(f"  {'task':<14} {'engine':<11} {'result':<10} {'seconds':>9} {'vs legacy':>10}")
+    legacy_seconds = {r['task']: r['seconds'] for r in results if r['engine'] == 'legacy'}
+    for r in results:
+        speedup = legacy_seconds[r['task']] / r['seconds'] if r['seconds'] > 0 else float('nan')
+        print(f"  {r['task']:<14} {r['engine']:<11} {'OK' if r['equivalent'] else 'DIFFERENT':<10} "
+              f"{r['seconds']:9.3f} {speedup:9.1f}x")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'rtol': args.rtol, 'atol': args.atol, 'results': results}, f, indent=2, default=str)
+        print(f"\nReport saved to: {args.report}")
+
+    return 0 if all(r['equivalent'] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Scaling benchmarks for the analysis scripts.
+
+For every size a synthetic export is generated (see synthetic_export.py; files
+are kept in benchmarks/data/ and re-used), then each analysis is run once per
+engine in a fresh process. The suite records
+
+    load        reading the export (from the workbook, and from the columnar cache)
+    parse       building the trial store from the delimited task columns
+    score       participant-level scoring (includes parsing for SST, the
+                questionnaires and the legacy WSAP engine, which parse as they score)
+    summarize   summary sheets and quality reports
+    export      writing the output workbook and CSV files
+
+plus the peak resident memory of each run. Results are printed as a table and
+saved as JSON in benchmarks/results/ so runs can be compared over time.
+
+Usage:
+    python3 run_benchmarks.py
+    python3 run_benchmarks.py --sizes 1000 10000 100000 --engines vectorized legacy
+    python3 run_benchmarks.py --sizes 10000 --tasks wsap pst --trials pst=60 --missing-rate 0.1
+    python3 run_benchmarks.py --sizes 100000 --xlsx-engines openpyxl xlsxwriter
+"""
+
+import argparse
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ANALYSIS_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ANALYSIS_DIR)
+
+import numpy as np
+import pandas as pd
+
+from common.loader import load_qualtrics_export
+from common.output import XLSX_ENGINES, resolve_xlsx_engine
+from common.readers import benchmark_readers
+from common.stages import StageTimer, peak_rss_mb
+from run_all_analyses import TASKS, load_task_module
+from synthetic_export import DEFAULT_TRIALS, parse_trials, write_synthetic_export
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DATA_DIR = os.path.join(BENCHMARK_DIR, "data")
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+STAGES = ['load', 'parse', 'score', 'summarize', 'export']
+
+
+def synthetic_export_path(n_participants, trials, missing_rate, empty_trial_rate, seed):
+    """
+    Return the path of the synthetic export for these settings, generating it if needed
+    """
+    settings = '-'.join(f"{task}{trials[task]}" for task in sorted(trials))
+    name = f"synthetic_{n_participants}_{settings}_m{missing_rate}_e{empty_trial_rate}_s{seed}.xlsx"
+    path = os.path.join(DATA_DIR, name)
+    if not os.path.exists(path):
+        print(f"Generating {n_participants} participants -> {path}")
+        start = time.perf_counter()
+        write_synthetic_export(path, n_participants, trials=trials, missing_rate=missing_rate,
+                               empty_trial_rate=empty_trial_rate, seed=seed)
+        print(f"  generated in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def benchmark_task(export_file, task_name, engine, xlsx_engine='auto'):
+    """
+    Run one analysis on a cached export and return its stage timings
+
+    Runs in a fresh process, so the trial store is built from scratch and the
+    peak memory belongs to this run alone.
+    """
+    # Keep the benchmark's trial stores out of the analyses' own cache
+    import common.trial_store as trial_store
+    work_dir = tempfile.mkdtemp(prefix="qualtrics-benchmark-")
+    trial_store.DEFAULT_STORE_DIR = os.path.join(work_dir, "trials")
+
+    try:
+        module = load_task_module(task_name)
+        start = time.perf_counter()
+        df = load_qualtrics_export(export_file, columns=module.REQUIRED_COLUMNS)
+        load_time = time.perf_counter() - start
+        rss_after_load = peak_rss_mb()
+
+        timer = StageTimer()
+        with redirect_stdout(io.StringIO()):
+            getattr(module, TASKS[task_name][2])(df, output_dir=work_dir, engine=engine, timer=timer,
+                                                 xlsx_engine=xlsx_engine, memo=False)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'stages': {'load': load_time, **timer.stages},
+        'rss_after_load_mb': rss_after_load,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run_isolated(function, *args):
+    """
+    Run function(*args) in a fresh interpreter and return its result
+    """
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(function, args)
+
+
+def format_seconds(value):
+    return f"{value:8.3f}" if value is not None else f"{'-':>8}"
+
+
+def print_results(records):
+    header = f"  {'participants':>12} {'task':<14} {'engine':<11} {'xlsx':<11}" + ''.join(f"{stage:>10}" for stage in STAGES)
+    print("\nBenchmark results (seconds; peak memory in MB):")
+    print(header + f"{'total':>10}{'peak MB':>10}")
+    for record in records:
+        stages = record['stages']
+        total = sum(stages.get(stage, 0.0) for stage in STAGES)
+        peak = f"{record['peak_rss_mb']:10.0f}" if record['peak_rss_mb'] is not None else f"{'-':>10}"
+        print(f"  {record['participants']:>12} {record['task']:<14} {record['engine']:<11} {record['xlsx_engine']:<11}"
+              + ''.join(f"  {format_seconds(stages.get(stage))}" for stage in STAGES)
+              + f"  {total:8.3f}{peak}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the analyses on synthetic exports.")
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+                        help="Numbers of participants (default: 1000 10000 100000)")
+    parser.add_argument('--tasks', nargs='+', choices=list(TASKS), default=list(TASKS),
+                        help="Analyses to benchmark (default: all)")
+    parser.add_argument('--engines', nargs='+', choices=['vectorized', 'legacy'], default=['vectorized'],
+                        help="Scoring engines to compare (default: vectorized)")
+    parser.add_argument('--xlsx-engines', nargs='+', choices=XLSX_ENGINES, default=['auto'],
+                        help="Workbook writers to compare (default: auto)")
+    parser.add_argument('--trials', nargs='+', metavar='TASK=N',
+                        help=f"Trials per participant (defaults: "
+                             f"{', '.join(f'{task}={n}' for task, n in DEFAULT_TRIALS.items())})")
+    parser.add_argument('--missing-rate', type=float, default=0.02,
+                        help="Share of participants without data for each task (default: 0.02)")
+    parser.add_argument('--empty-trial-rate', type=float, default=0.01,
+                        help="Share of blank trial responses (default: 0.01)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None,
+                        help="Results file (default: results/benchmark-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    trials = {**DEFAULT_TRIALS, **parse_trials(args.trials)}
+    task_names = [name for name in TASKS if name in args.tasks]
+    xlsx_engines = list(dict.fromkeys(resolve_xlsx_engine(engine) for engine in args.xlsx_engines))
+
+    records = []
+    loads = []
+    for n_participants in args.sizes:
+        export_file = synthetic_export_path(n_participants, trials, args.missing_rate,
+                                            args.empty_trial_rate, args.seed)
+
+        # Reading the workbook with each available reader (first run), then
+        # the columnar cache (later runs)
+        reader_times = benchmark_readers(export_file)
+        workbook_time = min(reader_times.values())
+        load_qualtrics_export(export_file)
+        start = time.perf_counter()
+        load_qualtrics_export(export_file)
+        cache_time = time.perf_counter() - start
+        loads.append({'participants': n_participants, 'workbook_s': workbook_time, 'readers_s': reader_times,
+                      'cache_s': cache_time})
+        print(f"{n_participants} participants: workbook load {workbook_time:.2f}s "
+              f"({', '.join(f'{reader} {seconds:.2f}s' for reader, seconds in reader_times.items())}), "
+              f"cached load {cache_time:.3f}s")
+
+        for task_name in task_names:
+            for engine in args.engines:
+                for xlsx_engine in xlsx_engines:
+                    print(f"  running {task_name} ({engine}, {xlsx_engine})")
+                    result = run_isolated(benchmark_task, export_file, task_name, engine, xlsx_engine)
+                    records.append({'participants': n_participants, 'task': task_name, 'engine': engine,
+                                    'xlsx_engine': xlsx_engine, **result})
+
+    print_results(records)
+
+    output_file = args.output or os.path.join(
+        RESULTS_DIR, f"benchmark-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with open(output_file, 'w') as f:
+        json.dump({
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count()
+            },
+            'settings': {'trials': trials, 'missing_rate': args.missing_rate,
+                         'empty_trial_rate': args.empty_trial_rate, 'seed': args.seed},
+            'loads': loads,
+            'runs': records
+        }, f, indent=2)
+    print(f"\nResults saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+Generate synthetic Qualtrics exports for benchmarking.
+
+The generated workbook has the same layout as 1_values_excel.xlsx: the column
+names and question texts are copied from that export, followed by the Qualtrics
+ImportId row, so it is read with the same skiprows=[1, 2]. Every column the
+analyses use is filled with random data in the format of the real export: the
+WSAP __js_* comma fields, the PST, SST and AST main_* fields, and the QIDS,
+GAD-7 and MASQ items. Any other column is left empty.
+
+Usage:
+    python3 synthetic_export.py 10000
+    python3 synthetic_export.py 100000 --output synthetic_100k.xlsx --missing-rate 0.05 --trials pst=60
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_FILE = os.path.join(os.path.dirname(BENCHMARK_DIR), "1_values_excel.xlsx")
+
+# Trials per participant in the real export
+DEFAULT_TRIALS = {
+    'wsap_original': 54,
+    'wsap_new': 27,
+    'pst': 30,
+    'sst': 20,
+    'ast': 16
+}
+
+# Participants generated (and written) at a time
+CHUNK_SIZE = 5000
+
+QIDS_ITEMS = ['Q2', 'Q3', 'Q4', 'Q5', 'Q6', 'Q7', 'Q8', 'Q9', 'Q10', 'Q11', 'Q12', 'Q13', 'Q14', 'Q15', 'Q16']
+GAD_ITEMS = [f"Q1_{i}" for i in range(1, 8)]
+MASQ_ITEMS = [f"Q1_{i}.1" for i in range(1, 8)] + [f"Q1_{i}" for i in range(8, 27)]
+
+DESCRIPTION_WORDS = ['I', 'feel', 'relieved', 'worried', 'because', 'the', 'outcome', 'was', 'better',
+                     'worse', 'than', 'expected', 'and', 'my', 'friends', 'noticed', 'it', 'calm']
+
+
+def deduplicate_columns(names):
+    """
+    Column names as pandas reads them (repeated names get .1, .2, ... suffixes)
+    """
+    seen = {}
+    columns = []
+    for name in names:
+        if name in seen:
+            seen[name] += 1
+            columns.append(f"{name}.{seen[name]}")
+        else:
+            seen[name] = 0
+            columns.append(name)
+    return columns
+
+
+def read_template_header(template_file=TEMPLATE_FILE):
+    """
+    Return the column names and question texts (first two rows) of an export
+    """
+    workbook = load_workbook(template_file, read_only=True)
+    names, labels = list(workbook.active.iter_rows(max_row=2, values_only=True))
+    workbook.close()
+    return list(names), list(labels)
+
+
+def _join_tokens(tokens, sep):
+    """
+    Join an (participants x trials) array of string tokens into one cell per participant
+    """
+    return [sep.join(row) for row in tokens.tolist()]
+
+
+def _choice_tokens(rng, vocabulary, shape, p=None):
+    return np.asarray(vocabulary, dtype=object)[rng.choice(len(vocabulary), size=shape, p=p)]
+
+
+def _rt_tokens(rng, shape, mean, sd):
+    rts = np.round(np.clip(rng.normal(mean, sd, size=shape), 200, None), 1)
+    return rts.astype(str).astype(object)
+
+
+def _blank(rng, tokens, rate):
+    """
+    Empty individual trial tokens (e.g. a missed response) at the given rate
+    """
+    if rate > 0:
+        tokens = tokens.copy()
+        tokens[rng.random(tokens.shape) < rate] = ''
+    return tokens
+
+
+def _missing_cells(rng, values, rate):
+    """
+    Drop whole cells (a participant without data for a task) at the given rate
+    """
+    values = pd.Series(values, dtype=object)
+    if rate > 0:
+        values[rng.random(len(values)) < rate] = None
+    return values
+
+
+def generate_chunk(rng, start, n, trials, missing_rate, empty_trial_rate):
+    """
+    Generate the task columns for participants start .. start + n - 1
+
+    Returns column name (as pandas reads it) -> values.
+    """
+    columns = {}
+    timestamps = pd.Timestamp('2025-10-22') + pd.to_timedelta(rng.integers(0, 30 * 86400, n), unit='s')
+    durations = rng.integers(600, 5400, n)
+    columns['StartDate'] = timestamps
+    columns['EndDate'] = timestamps + pd.to_timedelta(durations, unit='s')
+    columns['RecordedDate'] = columns['EndDate']
+    columns['Status'] = np.zeros(n, dtype=int)
+    columns['Progress'] = np.full(n, 100)
+    columns['Duration (in seconds)'] = durations
+    columns['Finished'] = np.ones(n, dtype=int)
+    columns['ResponseId'] = [f"R_synthetic{i:09d}" for i in range(start, start + n)]
+    columns['list_assignment'] = rng.integers(1, 3, n)
+
+    # Questionnaires: QIDS and GAD-7 items are 0-3, MASQ items 1-5
+    for items, low, high in ((QIDS_ITEMS, 0, 3), (GAD_ITEMS, 0, 3), (MASQ_ITEMS, 1, 5)):
+        block = rng.integers(low, high + 1, size=(n, len(items))).astype(object)
+        block[rng.random(block.shape) < missing_rate / 4] = None
+        for i, item in enumerate(items):
+            columns[item] = block[:, i]
+
+    # Original WSAP (comma-separated)
+    shape = (n, trials['wsap_original'])
+    columns['__js_responses'] = _missing_cells(rng, _join_tokens(
+        _blank(rng, _choice_tokens(rng, ['r', 'u'], shape, p=[0.7, 0.3]), empty_trial_rate), ','), missing_rate)
+    columns['__js_reaction_times'] = _join_tokens(_rt_tokens(rng, shape, 1400, 400), ',')
+    columns['__js_word_types'] = _join_tokens(_choice_tokens(rng, ['threat', 'benign'], shape), ',')
+    columns['__js_scenario_types'] = _join_tokens(
+        _choice_tokens(rng, ['anxiety', 'depression', 'positive'], shape), ',')
+    columns['__js_words'] = _join_tokens(_choice_tokens(rng, ['Delayed', 'Natural', 'Busy', 'Loved'], shape), ',')
+
+    # New WSAP (comma-separated)
+    shape = (n, trials['wsap_new'])
+    columns['__js_reaction_time'] = _missing_cells(rng, _join_tokens(_rt_tokens(rng, shape, 1100, 350), ','),
+                                                   missing_rate)
+    columns['__js_valence'] = _join_tokens(_blank(rng, _choice_tokens(
+        rng, ['benign', 'positive', 'anxiety', 'depression'], shape, p=[0.55, 0.18, 0.15, 0.12]), empty_trial_rate), ',')
+    columns['__js_response'] = _join_tokens(_blank(rng, _choice_tokens(rng, ['j', 'f'], shape), empty_trial_rate), ',')
+
+    # PST (semicolon-separated)
+    n_pst = trials['pst']
+    shape = (n, n_pst)
+    columns['main_reaction_times'] = _missing_cells(rng, _join_tokens(_rt_tokens(rng, shape, 2000, 900), ';'),
+                                                    missing_rate)
+    columns['main_word_accuracy'] = _join_tokens(_choice_tokens(rng, ['true', 'false'], shape, p=[0.95, 0.05]), ';')
+    columns['main_comprehension_accuracy'] = _join_tokens(
+        _choice_tokens(rng, ['true', 'false'], shape, p=[0.87, 0.13]), ';')
+    columns['main_scenario_types'] = _join_tokens(
+        _choice_tokens(rng, ['anxiety', 'depression', 'positive'], shape), ';')
+    columns['main_scenarios_completed'] = np.full(n, n_pst)
+
+    # SST (semicolon-separated)
+    n_sst = trials['sst']
+    shape = (n, n_sst)
+    columns['main_sentence_interpretations'] = _missing_cells(rng, _join_tokens(_choice_tokens(
+        rng, ['positive', 'negative_GA', 'negative_D', 'mixed', 'unclear'], shape,
+        p=[0.52, 0.23, 0.17, 0.06, 0.02]), ';'), missing_rate)
+    columns['main_total_completed'] = np.full(n, n_sst)
+    columns['main_completion_times'] = _join_tokens(_rt_tokens(rng, shape, 8000, 3000), ';')
+
+    # AST (ratings semicolon-separated, descriptions pipe-separated)
+    n_ast = trials['ast']
+    shape = (n, n_ast)
+    columns['main_pleasantness_ratings'] = _missing_cells(rng, _join_tokens(
+        rng.integers(1, 10, size=shape).astype(str).astype(object), ';'), missing_rate)
+    words = _choice_tokens(rng, DESCRIPTION_WORDS, (n * n_ast, 8))
+    descriptions = np.array([' '.join(row) for row in words.tolist()], dtype=object).reshape(shape)
+    descriptions = np.where(rng.random(shape) < empty_trial_rate, 'x', descriptions)
+    columns['main_outcome_descriptions'] = _missing_cells(rng, _join_tokens(descriptions, '|'), missing_rate)
+    columns['main_response_times'] = _join_tokens(_rt_tokens(rng, shape, 25000, 8000), ';')
+    columns['main_scenario_ids'] = _join_tokens(np.tile(np.arange(n_ast).astype(str).astype(object), (n, 1)), ';')
+
+    return columns
+
+
+def write_synthetic_export(output_file, n_participants, trials=None, missing_rate=0.02,
+                           empty_trial_rate=0.01, seed=0, template_file=TEMPLATE_FILE):
+    """
+    Write a synthetic export with n_participants responses to output_file
+
+    trials overrides the trials per participant of DEFAULT_TRIALS;
+    missing_rate is the share of participants without data for each task and
+    empty_trial_rate the share of blank trial responses.
+    """
+    trials = {**DEFAULT_TRIALS, **(trials or {})}
+    rng = np.random.default_rng(seed)
+    names, labels = read_template_header(template_file)
+    columns = deduplicate_columns(names)
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet0')
+    sheet.append(names)
+    sheet.append(labels)
+    sheet.append([f'{{"ImportId":"{name}"}}' for name in names])
+
+    for start in range(0, n_participants, CHUNK_SIZE):
+        n = min(CHUNK_SIZE, n_participants - start)
+        chunk = generate_chunk(rng, start, n, trials, missing_rate, empty_trial_rate)
+        data = pd.DataFrame({column: chunk.get(column, [None] * n) for column in columns})
+        data = data.astype(object).where(data.notna(), None)
+        for row in data.itertuples(index=False, name=None):
+            sheet.append(row)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    workbook.save(output_file)
+    return output_file
+
+
+def parse_trials(values):
+    """
+    Parse task=count overrides (e.g. pst=60) given on the command line
+    """
+    trials = {}
+    for value in values or []:
+        task, _, count = value.partition('=')
+        if task not in DEFAULT_TRIALS or not count.isdigit():
+            raise argparse.ArgumentTypeError(f"Invalid trial count '{value}' (expected one of "
+                                             f"{', '.join(DEFAULT_TRIALS)} as task=count)")
+        trials[task] = int(count)
+    return trials
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Qualtrics export for benchmarking.")
+    parser.add_argument('participants', type=int, help="Number of participants")
+    parser.add_argument('--output', default=None,
+                        help="Output workbook (default: data/synthetic_<participants>.xlsx)")
+    parser.add_argument('--trials', nargs='+', metavar='TASK=N',
+                        help=f"Trials per participant (defaults: "
+                             f"{', '.join(f'{task}={n}' for task, n in DEFAULT_TRIALS.items())})")
+    parser.add_argument('--missing-rate', type=float, default=0.02,
+                        help="Share of participants without data for each task (default: 0.02)")
+    parser.add_argument('--empty-trial-rate', type=float, default=0.01,
+                        help="Share of blank trial responses (default: 0.01)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    output_file = args.output or os.path.join(BENCHMARK_DIR, "data", f"synthetic_{args.participants}.xlsx")
+    write_synthetic_export(output_file, args.participants, trials=parse_trials(args.trials),
+                           missing_rate=args.missing_rate, empty_trial_rate=args.empty_trial_rate,
+                           seed=args.seed)
+    print(f"Synthetic export with {args.participants} participants saved to: {output_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Bootstrap confidence intervals for the mean of a per-participant score.
+
+The bias indices are built from per-participant sums over trials: the PST RT
+bias index, for example, is the summed RT of the negative trials over their
+number minus the same for the positive trials. A score is therefore given as
+
+    components   one row per trial and one column per summed term, laid out
+                 like a TrialStore: participant i's trials are the rows
+                 offsets[i]:offsets[i + 1]
+    score        a function turning summed components (one row per
+                 participant) into scores, NaN where there is none; e.g.
+                 mean_difference for a difference of two means
+
+Each resample draws participants with replacement and then, for every drawn
+participant, as many of their trials as they have, again with replacement.
+Resamples are drawn in blocks: a block is an index matrix of drawn
+participants plus one flat index array of their drawn trials, whose
+components are summed per drawn participant with a single np.add.reduceat.
+The interval is the percentile interval of the resampled means.
+
+Every block has its own seed, spawned from seed, so the interval only depends
+on seed and not on the number of workers the blocks are spread over
+(map_blocks, which common/reliability.py uses as well).
+"""
+
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+CONFIDENCE = 0.95
+DEFAULT_SEED = 0
+
+# Trials drawn per block of resamples; bounds the memory a block takes
+# (about 60 bytes per trial for a score of four components)
+BLOCK_TRIALS = 1 << 20
+
+
+def ratio(numerator, denominator):
+    """
+    numerator / denominator, NaN where the denominator is not positive
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def mean_score(sums):
+    """
+    Mean of a trial value from summed (value, count) components
+    """
+    return ratio(sums[:, 0], sums[:, 1])
+
+
+def mean_difference(sums):
+    """
+    Difference of two means from summed (value a, count a, value b, count b)
+    components; NaN unless both means exist
+    """
+    return ratio(sums[:, 0], sums[:, 1]) - ratio(sums[:, 2], sums[:, 3])
+
+
+def participant_sums(components, offsets):
+    """
+    Sum the components of each participant's trials (zeros without trials)
+    """
+    components = np.asarray(components, dtype=np.float64)
+    n_trials = np.diff(offsets)
+    sums = np.zeros((len(n_trials), components.shape[1]))
+    has_trials = n_trials > 0
+    if has_trials.any():
+        sums[has_trials] = np.add.reduceat(components, offsets[:-1][has_trials], axis=0)
+    return sums
+
+
+def resample_means(columns, offsets, participants, score, n_resamples, seed):
+    """
+    Draw n_resamples two-level resamples of the given participants at once
+    and return the mean score of each
+
+    columns holds the components column by column (one contiguous array per
+    summed term), which makes the gathers of drawn trials much faster.
+    """
+    rng = np.random.default_rng(seed)
+    starts = offsets[:-1][participants]
+    counts = np.diff(offsets)[participants]
+
+    # Participants drawn by each resample (n_resamples x participants), flattened
+    drawn = rng.integers(0, len(participants), size=n_resamples * len(participants))
+    drawn_counts = counts[drawn]
+    first_draw = np.cumsum(drawn_counts) - drawn_counts
+    n_draws = int(first_draw[-1] + drawn_counts[-1])
+
+    # Trial drawn within each drawn participant: the high half of a 32-bit
+    # random number times their trial count, uniform over [0, count)
+    random = rng.integers(0, 1 << 32, size=n_draws, dtype=np.uint32).astype(np.uint64)
+    positions = (random * np.repeat(drawn_counts.astype(np.uint64), drawn_counts)) >> np.uint64(32)
+    trials = np.repeat(starts[drawn], drawn_counts) + positions.astype(np.int64)
+
+    sums = np.column_stack([np.add.reduceat(column.take(trials), first_draw) for column in columns])
+    scores = score(sums).reshape(n_resamples, len(participants))
+    with warnings.catch_warnings():
+        # A resample without any score has a NaN mean
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(scores, axis=1)
+
+
+_worker_task = None
+
+
+def _init_worker(function, data):
+    global _worker_task
+    _worker_task = (function, data)
+
+
+def _run_block(size, seed):
+    function, data = _worker_task
+    return function(*data, size, seed)
+
+
+def map_blocks(function, data, n_total, block_size, seed=DEFAULT_SEED, workers=1):
+    """
+    Return [function(*data, size, block_seed), ...] over blocks of at most
+    block_size of n_total items (e.g. resamples), each with its own seed
+    spawned from seed
+
+    With workers > 1 the blocks run in a process pool that receives data once
+    per worker; function must then be a module-level function.
+    """
+    sizes = [min(block_size, n_total - start) for start in range(0, n_total, block_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(function, data)) as pool:
+            return list(pool.map(_run_block, sizes, seeds))
+    return [function(*data, size, block_seed) for size, block_seed in zip(sizes, seeds)]
+
+
+def bootstrap_mean_ci(components, offsets, score, n_resamples=10_000, confidence=CONFIDENCE,
+                      participants=None, seed=DEFAULT_SEED, workers=1):
+    """
+    Return the percentile bootstrap interval (lower, upper) of the mean score
+    over participants
+
+    participants are the rows that enter the mean (default: every participant
+    with a score). With workers > 1 the blocks of resamples are spread over a
+    process pool; score must then be a module-level function. The interval is
+    NaN when no participant has a score.
+    """
+    components = np.asarray(components, dtype=np.float64)
+    if components.ndim == 1:
+        components = components[:, np.newaxis]
+    offsets = np.asarray(offsets, dtype=np.int64)
+
+    if participants is None:
+        participants = np.flatnonzero(~np.isnan(score(participant_sums(components, offsets))))
+    else:
+        participants = np.asarray(participants)
+        if participants.dtype == bool:
+            participants = np.flatnonzero(participants)
+        participants = participants[np.diff(offsets)[participants] > 0]
+    if len(participants) == 0 or n_resamples <= 0:
+        return np.nan, np.nan
+
+    columns = np.ascontiguousarray(components.T)
+    n_trials = int(np.diff(offsets)[participants].sum())
+    means = map_blocks(resample_means, (columns, offsets, participants, score), n_resamples,
+                       max(1, BLOCK_TRIALS // n_trials), seed, workers)
+
+    alpha = (1 - confidence) / 2
+    lower, upper = np.nanquantile(np.concatenate(means), [alpha, 1 - alpha])
+    return lower, upper
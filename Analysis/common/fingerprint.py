@@ -0,0 +1,78 @@
+"""
+Content fingerprints of Qualtrics columns.
+
+Hashing the raw export columns is much cheaper than parsing them, so
+fingerprints are used to decide whether previously derived data (such as a
+trial store) can be re-used.
+"""
+
+import glob
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def numbers_as_floats(df):
+    """
+    Return df with its numeric (non-boolean) columns as float64
+
+    A column of whole numbers is read as floats once any response leaves it
+    empty, which does not change its values; hashes of the float form do not
+    change either.
+    """
+    numeric = [column for column in df.columns
+               if pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])]
+    return df.astype({column: np.float64 for column in numeric}) if numeric else df
+
+
+def row_hashes(df, columns, as_floats=False):
+    """
+    Return one uint64 hash per row of the given columns, with numbers hashed
+    as floats when as_floats is set (see numbers_as_floats)
+    """
+    if len(columns) == 0:
+        return np.zeros(len(df), dtype=np.uint64)
+    rows = df[list(columns)]
+    if as_floats:
+        rows = numbers_as_floats(rows)
+    return pd.util.hash_pandas_object(rows, index=False).to_numpy()
+
+
+def frame_fingerprint(df, columns):
+    """
+    Return a hex digest identifying the contents of the given columns
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(list(columns)).encode())
+    digest.update(str(len(df)).encode())
+    digest.update(row_hashes(df, columns).tobytes())
+    return digest.hexdigest()
+
+
+def data_fingerprint(df, columns, data_columns):
+    """
+    Return a hex digest of the given columns over the rows that hold data in
+    any of data_columns, so rows without any (e.g. participants who did not do
+    a task) do not change it
+
+    Numbers are hashed as floats (see numbers_as_floats).
+    """
+    has_data = df[list(data_columns)].notna().any(axis=1).to_numpy()
+    return frame_fingerprint(numbers_as_floats(df.loc[has_data, list(columns)]), columns)
+
+
+def source_fingerprint(*paths):
+    """
+    Return a hex digest of the given source files plus the shared helpers in
+    Analysis/common, so derived results can be invalidated when the code that
+    produced them changes
+    """
+    common_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for path in list(paths) + sorted(glob.glob(os.path.join(common_dir, "*.py"))):
+        with open(path, 'rb') as f:
+            digest.update(os.path.basename(path).encode())
+            digest.update(f.read())
+    return digest.hexdigest()
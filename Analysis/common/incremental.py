@@ -0,0 +1,166 @@
+"""
+Incremental scoring of new and changed responses.
+
+Each task keeps a state store holding its per-participant results from the
+last run and a fingerprint of every scored row (its ResponseId and the task
+columns the scores are computed from). On the next run only rows that are new,
+or whose task columns changed, are scored; their results are merged with the
+stored results of the unchanged rows in the order of the current export, and
+the output workbooks are then regenerated from the merged results.
+Participants that are no longer in the export are dropped.
+
+State is kept in Analysis/.qualtrics_cache/incremental/<task>/ and is
+discarded whenever the task's source columns, parameters (e.g. the scoring
+engine) or code change.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from common.fingerprint import row_hashes
+from common.trial_store import unsaved_stores
+
+STATE_FORMAT_VERSION = 2
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 ".qualtrics_cache", "incremental")
+
+
+def _state_key(source_columns, params):
+    key = json.dumps({'version': STATE_FORMAT_VERSION, 'columns': list(source_columns),
+                      'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _load_state(path, state_key):
+    """
+    Return (response ids, row hashes, result frames, whether score returned a
+    single frame) of the last run, or None when there is no usable state
+    """
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get('key') != state_key:
+            return None
+        response_ids = np.load(os.path.join(path, "response_ids.npy"))
+        hashes = np.load(os.path.join(path, "row_hashes.npy"))
+        frames = [pd.read_pickle(os.path.join(path, f"results_{i}.pkl")) for i in range(manifest['n_frames'])]
+    except (OSError, ValueError, KeyError, EOFError):
+        return None
+    return response_ids, hashes, frames, manifest['single']
+
+
+def _save_state(path, state_key, response_ids, hashes, frames, single):
+    """
+    Write the state of this run; the manifest is written last so a partially
+    written state is never used
+    """
+    tmp_dir = f"{path}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    np.save(os.path.join(tmp_dir, "response_ids.npy"), response_ids)
+    np.save(os.path.join(tmp_dir, "row_hashes.npy"), hashes)
+    for i, frame in enumerate(frames):
+        frame.to_pickle(os.path.join(tmp_dir, f"results_{i}.pkl"))
+
+    with open(os.path.join(tmp_dir, "manifest.json"), 'w') as f:
+        json.dump({'key': state_key, 'n_frames': len(frames), 'single': single,
+                   'n_rows': len(response_ids)}, f, indent=2)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_dir, path)
+
+
+def _merge_results(previous, scored, key_column, reused_ids, position):
+    """
+    Combine the stored rows of unchanged participants with freshly scored
+    rows, ordered by participant position in the current export
+    """
+    parts = []
+    if previous is not None and key_column in previous.columns:
+        kept = previous[previous[key_column].astype(str).isin(reused_ids)]
+        if len(kept) > 0:
+            parts.append(kept)
+    if scored is not None and key_column in scored.columns and len(scored) > 0:
+        parts.append(scored)
+
+    if not parts:
+        # Nothing to merge; keep the (empty) layout of whichever frame exists
+        template = scored if scored is not None else previous
+        return template.iloc[0:0].reset_index(drop=True) if len(template.columns) else pd.DataFrame()
+
+    combined = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+    order = np.argsort(position.reindex(combined[key_column].astype(str)).to_numpy(), kind='stable')
+    return combined.iloc[order].reset_index(drop=True)
+
+
+def score_incrementally(df, task_name, source_columns, score, key_columns='ResponseId',
+                        params=None, state_dir=None):
+    """
+    Return score(df), scoring only the rows that are new or changed since the
+    last run
+
+    score(rows) must return a DataFrame or a tuple of DataFrames in which every
+    row belongs to one participant, identified by its key column (key_columns
+    gives one column name, or one per returned frame). The result has the same
+    shape as score's, with rows ordered by participant position in df.
+    params identifies anything besides the source columns that the scores
+    depend on (e.g. the engine and a code fingerprint).
+    """
+    state_dir = state_dir or DEFAULT_STATE_DIR
+    path = os.path.join(state_dir, task_name)
+    state_key = _state_key(source_columns, params)
+
+    # Fixed-width strings, which np.load reads back without pickling
+    response_ids = df['ResponseId'].astype(str).to_numpy().astype(str)
+    # Numbers are hashed as floats, so a column turning from int to float (one
+    # new blank response) does not change the hashes of the other rows
+    hashes = row_hashes(df, ['ResponseId'] + list(source_columns), as_floats=True)
+
+    # Re-use requires a unique ResponseId per row
+    unique_ids = df['ResponseId'].is_unique
+    state = _load_state(path, state_key) if unique_ids else None
+    changed = np.ones(len(df), dtype=bool)
+    if state is not None:
+        previous_ids, previous_hashes, previous, single = state
+        match = pd.Index(previous_ids).get_indexer(response_ids)
+        found = match >= 0
+        changed = ~found
+        changed[found] = previous_hashes[match[found]] != hashes[found]
+
+    if state is None or changed.all():
+        scored = score(df)
+        single = isinstance(scored, pd.DataFrame)
+        results = (scored,) if single else tuple(scored)
+    else:
+        scored = None
+        if changed.any():
+            # Stores of the changed rows only are not worth keeping
+            with unsaved_stores():
+                scored = score(df[changed])
+        if isinstance(scored, pd.DataFrame):
+            scored = (scored,)
+
+        if isinstance(key_columns, str):
+            key_columns = (key_columns,) * len(previous)
+        position = pd.Series(np.arange(len(df)), index=response_ids)
+        reused_ids = set(response_ids[~changed])
+        results = tuple(_merge_results(previous[i], None if scored is None else scored[i],
+                                       key_columns[i], reused_ids, position)
+                        for i in range(len(previous)))
+
+    # Nothing to record when the same responses were all re-used
+    if unique_ids and (state is None or changed.any() or len(previous_ids) != len(df)):
+        try:
+            os.makedirs(state_dir, exist_ok=True)
+            _save_state(path, state_key, response_ids, hashes, list(results), single)
+        except OSError:
+            # A read-only cache directory should not stop the analysis
+            pass
+
+    return results[0] if single else results
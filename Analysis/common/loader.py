@@ -0,0 +1,177 @@
+"""
+Cached loader for the Qualtrics values export (1_values_excel.xlsx).
+
+Parsing the workbook is the slowest part of every analysis script, so the
+parsed DataFrame is written once to a columnar cache next to the export and
+re-used by all scripts until the export changes. The cache is keyed on the
+file's size, modification time and SHA-256 content hash. The export itself is
+read by one of the readers in common/readers.py (xlsx, CSV or TSV).
+
+Each analysis only needs a handful of the export's columns, so callers can
+pass the columns they use: they are then the only columns read from the
+Parquet cache, or from the export itself when no cache is used.
+"""
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from common.readers import QUALTRICS_SKIPROWS, read_qualtrics
+
+CACHE_DIR_NAME = ".qualtrics_cache"
+CACHE_FORMAT_VERSION = 2
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """
+    Return the SHA-256 hex digest of a file's contents
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_paths(file_name):
+    """
+    Return (data path without extension, metadata path) for an export's cache
+    """
+    export_dir, base_name = os.path.split(os.path.abspath(file_name))
+    cache_dir = os.path.join(export_dir, CACHE_DIR_NAME)
+    stem = os.path.splitext(base_name)[0]
+    return os.path.join(cache_dir, stem), os.path.join(cache_dir, f"{stem}.meta.json")
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def _write_cache(df, data_stem):
+    """
+    Write the DataFrame as Parquet when pyarrow is available, falling back to
+    pickle for frames Parquet cannot represent (e.g. mixed-type object columns)
+    """
+    try:
+        import pyarrow  # noqa: F401
+        path = data_stem + ".parquet"
+        tmp_path = path + ".tmp"
+        df.to_parquet(tmp_path, index=False, engine='pyarrow')
+        os.replace(tmp_path, path)
+        return 'parquet', os.path.basename(path)
+    except Exception:
+        path = data_stem + ".pkl"
+        tmp_path = path + ".tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        return 'pickle', os.path.basename(path)
+
+
+def _select_columns(all_columns, columns):
+    """
+    Return the given columns that the export has, in export order
+    """
+    wanted = set(columns)
+    return [column for column in all_columns if column in wanted]
+
+
+def _read_cache(meta, data_stem, columns=None):
+    path = os.path.join(os.path.dirname(data_stem), meta['data_file'])
+    if meta['format'] == 'parquet':
+        if columns is not None:
+            columns = _select_columns(meta['columns'], columns)
+        return pd.read_parquet(path, engine='pyarrow', columns=columns)
+    df = pd.read_pickle(path)
+    return df if columns is None else df[_select_columns(df.columns, columns)]
+
+
+def _cache_is_valid(meta, stat, file_name):
+    """
+    Check a cache entry against the export. Size and mtime are compared first;
+    if only the mtime changed (e.g. the file was copied or touched) the content
+    hash decides whether the cache can still be used.
+    """
+    if meta is None or meta.get('version') != CACHE_FORMAT_VERSION:
+        return False, None
+    if meta.get('skiprows') != QUALTRICS_SKIPROWS or meta.get('size') != stat.st_size:
+        return False, None
+    if meta.get('mtime_ns') == stat.st_mtime_ns:
+        return True, None
+
+    content_hash = file_sha256(file_name)
+    return content_hash == meta.get('sha256'), content_hash
+
+
+def load_qualtrics_export(file_name, use_cache=True, reader='auto', columns=None):
+    """
+    Load a Qualtrics values export, using the columnar cache when it is current
+
+    The first call parses the export with the given reader (see
+    common/readers.py; the two extra Qualtrics header rows are skipped) and
+    writes the cache; later calls load the cache directly. The cache is
+    rebuilt automatically when the export changes.
+
+    With columns, only those columns are returned (in export order; names the
+    export lacks are ignored). The cache always holds the whole export so that
+    it can serve every analysis; without the cache only the given columns are
+    read from the export.
+    """
+    if not use_cache:
+        return read_qualtrics(file_name, reader, columns)[0]
+
+    data_stem, meta_path = _cache_paths(file_name)
+    stat = os.stat(file_name)
+    meta = _read_meta(meta_path)
+
+    is_valid, content_hash = _cache_is_valid(meta, stat, file_name)
+    if is_valid:
+        try:
+            df = _read_cache(meta, data_stem, columns)
+        except Exception:
+            df = None
+        if df is not None:
+            if content_hash is not None:
+                # Same contents under a new mtime: remember it for the fast path
+                meta['mtime_ns'] = stat.st_mtime_ns
+                try:
+                    _write_meta(meta_path, meta)
+                except OSError:
+                    # A read-only data directory should not stop the analysis
+                    pass
+            return df
+
+    df, reader = read_qualtrics(file_name, reader)
+
+    try:
+        os.makedirs(os.path.dirname(data_stem), exist_ok=True)
+        cache_format, data_file = _write_cache(df, data_stem)
+        _write_meta(meta_path, {
+            'version': CACHE_FORMAT_VERSION,
+            'source': os.path.basename(file_name),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': content_hash or file_sha256(file_name),
+            'skiprows': QUALTRICS_SKIPROWS,
+            'reader': reader,
+            'format': cache_format,
+            'data_file': data_file,
+            'columns': [str(column) for column in df.columns]
+        })
+    except OSError:
+        # A read-only data directory should not stop the analysis
+        pass
+
+    return df if columns is None else df[_select_columns(df.columns, columns)]
@@ -0,0 +1,218 @@
+"""
+Memoized analysis stages.
+
+Every stage of an analysis (parsing, scoring, summarizing and exporting) is a
+function of the export columns it reads, its parameters and the code that
+computes it. stage_key() hashes these into a content address, and the stage's
+result is stored under that address in Analysis/.qualtrics_cache/results/.
+Any later run with the same key re-uses the result instead of computing it,
+whichever script or export it comes from.
+
+The code version of a stage (code_version) covers the functions it runs and,
+recursively, the functions and constants of this repository they refer to, so
+editing the summary formatting of a script changes the key of its summary and
+export stage but not that of its scoring. A stage that depends on another
+includes the other's key as upstream, so a change anywhere before a stage
+invalidates it.
+
+Stages that write files record them with their result; the result is only
+re-used while those files are unchanged. The store is kept below
+MAX_CACHE_BYTES by removing the least recently used results first.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import platform
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+
+from common.fingerprint import frame_fingerprint
+
+MEMO_FORMAT_VERSION = 1
+ANALYSIS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.path.join(ANALYSIS_DIR, ".qualtrics_cache", "results")
+MAX_CACHE_BYTES = 1 << 30
+
+_CONSTANT_TYPES = (str, bytes, int, float, bool, tuple, list, dict, set, frozenset)
+
+
+def _source_file(obj):
+    """
+    File a function, class or module is defined in (None if it has none)
+    """
+    if isinstance(obj, types.FunctionType):
+        return obj.__code__.co_filename
+    if not isinstance(obj, types.ModuleType):
+        obj = sys.modules.get(obj.__module__)
+    return getattr(obj, '__file__', None)
+
+
+def _is_ours(obj):
+    """
+    Whether obj is defined in a file of this repository
+    """
+    path = _source_file(obj)
+    return path is not None and os.path.abspath(path).startswith(ANALYSIS_DIR + os.sep)
+
+
+def _global_names(code):
+    """
+    Names a code object and the functions nested in it look up
+    """
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            names |= _global_names(constant)
+    return names
+
+
+def _constant_repr(value):
+    if isinstance(value, (set, frozenset)):
+        return repr(sorted(value, key=repr))
+    return repr(value)
+
+
+def code_version(*functions):
+    """
+    Return a hex digest of the source of the given functions and of what of
+    this repository they use: the functions they call (recursively), the
+    module-level constants they read, and the whole module of every class
+    (e.g. ResultWriter) or module they refer to
+    """
+    digest = hashlib.sha256()
+    seen = set()
+    pending = list(functions)
+    while pending:
+        obj = pending.pop(0)
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        if not isinstance(obj, types.FunctionType):
+            with open(_source_file(obj), 'rb') as f:
+                digest.update(f.read())
+            continue
+
+        digest.update(f"{obj.__module__}.{obj.__qualname__}\n".encode())
+        digest.update(inspect.getsource(obj).encode())
+        for name in sorted(_global_names(obj.__code__)):
+            value = obj.__globals__.get(name)
+            if isinstance(value, (types.FunctionType, types.ModuleType, type)):
+                if _is_ours(value):
+                    pending.append(value)
+            elif isinstance(value, _CONSTANT_TYPES):
+                text = _constant_repr(value)
+                # Reprs with memory addresses differ between runs
+                if ' at 0x' not in text:
+                    digest.update(f"{name}={text}\n".encode())
+    return digest.hexdigest()
+
+
+def stage_key(task_name, stage, df=None, columns=(), params=None, code=None, upstream=None):
+    """
+    Return the content address of a stage's result
+
+    The key covers the contents of df[columns], params (JSON-serializable, e.g.
+    the engine or output formats), code (see code_version), the key of the
+    stage it depends on (upstream) and the Python, pandas and NumPy versions.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'version': MEMO_FORMAT_VERSION,
+        'task': task_name,
+        'stage': stage,
+        'params': params or {},
+        'code': code,
+        'upstream': upstream,
+        'runtime': [platform.python_version(), pd.__version__, np.__version__]
+    }, sort_keys=True, default=str).encode())
+    if df is not None:
+        digest.update(frame_fingerprint(df, list(columns)).encode())
+    return digest.hexdigest()
+
+
+def _entry_path(key, cache_dir=None):
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, f"{key}.pkl")
+
+
+def _file_state(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_stage(key, cache_dir=None):
+    """
+    Return the stored result of a stage, or None if there is none or a file
+    it wrote has changed since (and always for key None, i.e. memoization off)
+    """
+    if key is None:
+        return None
+    path = _entry_path(key, cache_dir)
+    try:
+        with open(path, 'rb') as f:
+            entry = pickle.load(f)
+        if any(_file_state(output) != state for output, state in entry['outputs'].items()):
+            return None
+        # Mark the entry as recently used
+        os.utime(path)
+    except Exception:
+        return None
+    return entry['value']
+
+
+def save_stage(key, value, outputs=(), cache_dir=None, max_bytes=None):
+    """
+    Store the result of a stage under key, together with the state of the
+    files it wrote (outputs that do not exist are skipped), then evict the
+    least recently used results beyond max_bytes (nothing for key None)
+    """
+    if key is None:
+        return
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    path = _entry_path(key, cache_dir)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        entry = {'value': value,
+                 'outputs': {os.path.abspath(output): _file_state(output)
+                             for output in outputs if os.path.exists(output)}}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        evict(cache_dir, MAX_CACHE_BYTES if max_bytes is None else max_bytes)
+    except OSError:
+        # A read-only cache directory should not stop the analysis
+        pass
+
+
+def evict(cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+    """
+    Remove the least recently used results until the store is at most
+    max_bytes
+    """
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.pkl'):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, name))
+        except OSError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except OSError:
+            pass
+        total -= size
@@ -0,0 +1,323 @@
+"""
+Writing result tables.
+
+The analysis scripts write their results as named sheets of one workbook per
+task. A ResultWriter takes the tables sheet by sheet and writes them in each
+requested format:
+
+    xlsx      the usual workbook. With the 'xlsxwriter' engine cells are
+              streamed to disk row by row (constant-memory mode), which is
+              much faster and lighter than openpyxl for large sheets; 'auto'
+              uses xlsxwriter when it is installed and openpyxl otherwise
+    csv       one file per table, named <workbook stem>.<table>.csv
+    parquet   one file per table, named <workbook stem>.<table>.parquet
+              (needs pyarrow)
+
+Sheet names, column order and the position of tables within a sheet are the
+same for every engine.
+
+Long tables that do not belong in a workbook (such as the WSAP trial-level
+DDM data) are written in batches with a TableStream.
+
+Within capture_tables() every table written by a ResultWriter is also kept in
+memory, which lets batch runs merge the results of several exports. Tables
+re-used from an earlier run (see common/memo.py) are recorded there with
+replay_tables().
+"""
+
+import contextlib
+import os
+import re
+
+import pandas as pd
+
+OUTPUT_FORMATS = ('xlsx', 'csv', 'parquet')
+XLSX_ENGINES = ('auto', 'xlsxwriter', 'openpyxl')
+
+# Tables written while capture_tables() is active (None otherwise)
+_captured_tables = None
+
+
+def resolve_xlsx_engine(xlsx_engine):
+    """
+    Return the xlsx engine to use for 'auto' (xlsxwriter when installed)
+    """
+    if xlsx_engine != 'auto':
+        return xlsx_engine
+    try:
+        import xlsxwriter  # noqa: F401
+        return 'xlsxwriter'
+    except ImportError:
+        return 'openpyxl'
+
+
+def table_file_stem(table_name):
+    """
+    File name part of a table: 'Reverse-Scored Ratings' -> 'reverse_scored_ratings'
+    """
+    return re.sub(r'[^0-9a-z]+', '_', table_name.lower()).strip('_')
+
+
+def _parquet_frame(df):
+    """
+    Return df with object columns that mix strings and numbers (e.g. scores
+    with "No data" entries) converted to strings, which Parquet requires
+    """
+    mixed = [column for column in df.columns
+             if df[column].dtype == object and pd.api.types.infer_dtype(df[column], skipna=True) == 'mixed']
+    if not mixed:
+        return df
+    df = df.copy()
+    for column in mixed:
+        df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    return df
+
+
+@contextlib.contextmanager
+def capture_tables():
+    """
+    Record every table written by a ResultWriter in this process
+
+    Yields a list that receives one dict per table, in the order they are
+    written: 'workbook' (file name), 'sheet_name', 'table_name' and 'df'.
+    """
+    global _captured_tables
+    previous = _captured_tables
+    _captured_tables = []
+    try:
+        yield _captured_tables
+    finally:
+        _captured_tables = previous
+
+
+def replay_tables(tables):
+    """
+    Record tables written by an earlier run (ResultWriter.tables) as if they
+    had been written now
+    """
+    if _captured_tables is not None:
+        _captured_tables.extend(tables)
+
+
+class _StreamingWorkbook:
+    """
+    xlsx workbook written with xlsxwriter in constant-memory mode
+
+    Rows are flushed to disk as soon as the next row is started, so tables
+    must be written top to bottom within a sheet (as the analyses do).
+    """
+
+    def __init__(self, path):
+        import xlsxwriter
+        self.workbook = xlsxwriter.Workbook(path, {
+            'constant_memory': True,
+            # Write text as text, as pandas' openpyxl writer does
+            'strings_to_formulas': False,
+            'strings_to_urls': False,
+            'nan_inf_to_errors': True
+        })
+        # Same header style as pandas' to_excel
+        self.header_format = self.workbook.add_format({'bold': True, 'border': 1, 'align': 'center',
+                                                       'valign': 'top'})
+        self.sheets = {}
+
+    def write(self, df, sheet_name, startrow):
+        sheet = self.sheets.get(sheet_name)
+        if sheet is None:
+            sheet = self.sheets[sheet_name] = self.workbook.add_worksheet(sheet_name)
+        if len(df.columns) == 0:
+            return
+
+        sheet.write_row(startrow, 0, [str(column) for column in df.columns], self.header_format)
+        # Missing values become empty cells; astype(object) turns NumPy
+        # scalars into Python numbers
+        values = df.astype(object).where(df.notna(), None).to_numpy()
+        for i, row in enumerate(values.tolist(), startrow + 1):
+            sheet.write_row(i, 0, row)
+
+    def close(self):
+        self.workbook.close()
+
+
+class _OpenpyxlWorkbook:
+    """
+    xlsx workbook written through pd.ExcelWriter with openpyxl
+    """
+
+    def __init__(self, path):
+        self.writer = pd.ExcelWriter(path, engine='openpyxl')
+
+    def write(self, df, sheet_name, startrow):
+        df.to_excel(self.writer, sheet_name=sheet_name, startrow=startrow, index=False)
+
+    def close(self):
+        self.writer.close()
+
+
+class TableStream:
+    """
+    Writes one long table (e.g. trial-level DDM data) to a CSV or Parquet
+    file in batches
+
+    append() buffers frames until batch_rows rows are pending and then writes
+    them, so the full table never has to be held in memory. The file is only
+    created once the first rows arrive. Use as a context manager; pending rows
+    are written on close.
+
+    float_format is the CSV number format (e.g. '%.10g'). For Parquet, dtypes
+    maps column name -> 'category' (stored dictionary encoded) or a NumPy
+    dtype such as 'float32'; every batch must have the same columns.
+    """
+
+    def __init__(self, path, fmt='csv', batch_rows=100_000, float_format=None, dtypes=None):
+        if fmt not in ('csv', 'parquet'):
+            raise ValueError(f"Unknown table format: {fmt}")
+        if fmt == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Parquet output needs pyarrow (pip install pyarrow)") from None
+
+        self.path = path
+        self.fmt = fmt
+        self.batch_rows = batch_rows
+        self.float_format = float_format
+        self.dtypes = dtypes or {}
+        self.n_rows = 0
+        self._pending = []
+        self._n_pending = 0
+        self._file = None
+        self._parquet_writer = None
+        self._schema = None
+
+    def append(self, df):
+        if df is None or len(df) == 0:
+            return
+        self._pending.append(df)
+        self._n_pending += len(df)
+        if self._n_pending >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        batch = pd.concat(self._pending, ignore_index=True) if len(self._pending) > 1 else self._pending[0]
+        self._pending = []
+        self._n_pending = 0
+
+        if self.fmt == 'csv':
+            first = self._file is None
+            if first:
+                self._file = open(self.path, 'w', newline='')
+            batch.to_csv(self._file, header=first, index=False, float_format=self.float_format)
+        else:
+            self._write_parquet(batch)
+        self.n_rows += len(batch)
+
+    def _write_parquet(self, batch):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrays = {}
+        for column in batch.columns:
+            values = batch[column]
+            dtype = self.dtypes.get(column)
+            if dtype == 'category':
+                # Encoded per batch against the values it holds; the index
+                # type is fixed so every batch shares the file's schema
+                text = values.astype(object).where(values.isna(), values.astype(str))
+                arrays[column] = pa.array(text, type=pa.string(), from_pandas=True).dictionary_encode()
+            else:
+                arrays[column] = pa.array(values.astype(dtype) if dtype else values, from_pandas=True)
+        table = pa.table(arrays)
+
+        if self._parquet_writer is None:
+            self._schema = table.schema
+            self._parquet_writer = pq.ParquetWriter(self.path, self._schema)
+        self._parquet_writer.write_table(table.cast(self._schema))
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+class ResultWriter:
+    """
+    Writes an analysis' result tables in one or more formats
+
+    Use as a context manager and call write(df, sheet_name) once per table.
+    path is the workbook path; CSV and Parquet files are written next to it.
+    """
+
+    def __init__(self, path, formats=('xlsx',), xlsx_engine='auto'):
+        unknown = set(formats) - set(OUTPUT_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown output format(s): {', '.join(sorted(unknown))}")
+        if 'parquet' in formats:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Parquet output needs pyarrow (pip install pyarrow)") from None
+
+        self.path = path
+        self.formats = tuple(formats)
+        self.stem = os.path.splitext(path)[0]
+        # Every table written (as recorded by capture_tables) and every file
+        self.tables = []
+        self.files = []
+        self.workbook = None
+        if 'xlsx' in self.formats:
+            engine = resolve_xlsx_engine(xlsx_engine)
+            self.workbook = _StreamingWorkbook(path) if engine == 'xlsxwriter' else _OpenpyxlWorkbook(path)
+
+    @property
+    def outputs(self):
+        """
+        The workbook path and a pattern for the per-table files of each other format
+        """
+        return [self.path if fmt == 'xlsx' else f"{self.stem}.*.{fmt}" for fmt in self.formats]
+
+    def write(self, df, sheet_name, startrow=0, table_name=None):
+        """
+        Write df to sheet_name, starting at startrow in the workbook
+
+        Per-table files are named after table_name (default: the sheet name),
+        so tables sharing a sheet need a name of their own.
+        """
+        if self.workbook is not None:
+            self.workbook.write(df, sheet_name, startrow)
+        table = {'workbook': os.path.basename(self.path), 'sheet_name': sheet_name,
+                 'table_name': table_name or sheet_name, 'df': df}
+        self.tables.append(table)
+        if _captured_tables is not None:
+            _captured_tables.append(table)
+
+        stem = f"{self.stem}.{table_file_stem(table_name or sheet_name)}"
+        if 'csv' in self.formats:
+            df.to_csv(f"{stem}.csv", index=False)
+            self.files.append(f"{stem}.csv")
+        if 'parquet' in self.formats:
+            _parquet_frame(df).to_parquet(f"{stem}.parquet", index=False, engine='pyarrow')
+            self.files.append(f"{stem}.parquet")
+
+    def close(self):
+        if self.workbook is not None:
+            self.workbook.close()
+            self.files.append(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
@@ -0,0 +1,143 @@
+"""
+Bulk parsing of delimited trial-level cells.
+
+Qualtrics stores trial-level task data as one delimited string per participant
+(e.g. "1251,1040,1527" or "true;true;false"). The helpers here split a whole
+column at once into a ragged structure - one flat array of values plus
+per-participant offsets - so parsing cost scales with the total number of
+tokens rather than with per-value interpreter overhead.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class RaggedArray:
+    """
+    Variable-length rows stored as one flat value array plus offsets
+
+    Row i holds values[offsets[i]:offsets[i + 1]]; offsets has one entry more
+    than there are rows.
+    """
+
+    __slots__ = ('values', 'offsets')
+
+    def __init__(self, values, offsets):
+        self.values = values
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def row_ids(self):
+        """
+        Row number of every value in the flat array
+        """
+        return np.repeat(np.arange(len(self)), self.lengths)
+
+    def row(self, i):
+        """
+        Values of row i (a view into the flat array)
+        """
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+
+def split_delimited(series, sep, drop_empty=False, skip_blank_cells=True, lower=False, strip=True):
+    """
+    Split a column of delimited strings into a RaggedArray of string tokens
+
+    Tokens are stripped of surrounding whitespace unless strip=False. Empty
+    tokens become NaN, or are dropped entirely with drop_empty=True. Missing
+    cells have no tokens; cells containing only whitespace also have none
+    unless skip_blank_cells is False, in which case they are split like any
+    other string.
+    """
+    n_rows = len(series)
+    cells = series.reset_index(drop=True)
+    cells = cells[cells.notna()].astype(str)
+    if skip_blank_cells:
+        cells = cells[cells.str.strip() != '']
+
+    tokens = cells.str.split(sep, regex=False).explode()
+    if strip:
+        tokens = tokens.str.strip()
+    if lower:
+        tokens = tokens.str.lower()
+    values = tokens.to_numpy(dtype=object)
+    rows = tokens.index.to_numpy(dtype=np.int64)
+
+    empty = values == ''
+    if drop_empty:
+        values = values[~empty]
+        rows = rows[~empty]
+    else:
+        values[empty] = np.nan
+
+    counts = np.bincount(rows, minlength=n_rows)
+    offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    return RaggedArray(values, offsets)
+
+
+def to_float_array(values):
+    """
+    Convert an object array of string tokens to float64 in one bulk call
+
+    Conversion uses float() semantics, so parsed values are bit-identical to
+    converting each token individually; NaN entries stay NaN and tokens that
+    are not numbers become NaN.
+    """
+    try:
+        return values.astype(np.float64)
+    except ValueError:
+        # Locate the unparseable tokens, then convert the rest exactly
+        numeric = np.full(len(values), np.nan)
+        parseable = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').notna().to_numpy()
+        numeric[parseable] = values[parseable].astype(np.float64)
+        return numeric
+
+
+def parse_delimited_numeric(series, sep, drop_empty=False, skip_blank_cells=True):
+    """
+    Parse a column of delimited numbers into a RaggedArray of float64 values
+
+    Blank and unparseable tokens become NaN (blank tokens are dropped instead
+    with drop_empty=True).
+    """
+    tokens = split_delimited(series, sep, drop_empty=drop_empty, skip_blank_cells=skip_blank_cells)
+    return RaggedArray(to_float_array(tokens.values), tokens.offsets)
+
+
+def explode_aligned(fields):
+    """
+    Align several ragged fields of the same participants into one long trial table
+
+    Each row contributes as many trials as its longest field; shorter fields
+    are padded with NaN. Returns the trial table, with 'row' and 'trial'
+    columns followed by one column per field, and the trial count per row.
+    """
+    fields = dict(fields)
+    n_rows = len(next(iter(fields.values())))
+    n_trials = np.zeros(n_rows, dtype=np.int64)
+    for ragged in fields.values():
+        n_trials = np.maximum(n_trials, ragged.lengths)
+
+    offsets = np.concatenate(([0], np.cumsum(n_trials))).astype(np.int64)
+    row_ids = np.repeat(np.arange(n_rows), n_trials)
+
+    trials = {
+        'row': row_ids,
+        'trial': np.arange(offsets[-1]) - offsets[row_ids]
+    }
+    for name, ragged in fields.items():
+        padded = np.full(offsets[-1], np.nan, dtype=ragged.values.dtype)
+        value_rows = ragged.row_ids
+        value_trial = np.arange(len(ragged.values)) - ragged.offsets[value_rows]
+        padded[offsets[value_rows] + value_trial] = ragged.values
+        trials[name] = padded
+
+    return pd.DataFrame(trials), n_trials
@@ -0,0 +1,277 @@
+"""
+Readers for Qualtrics exports.
+
+Every reader returns the same DataFrame: the first row holds the column names
+and the two extra Qualtrics header rows below it (question text and import
+IDs) are skipped. The readers differ only in how fast they get there:
+
+    calamine         pd.read_excel with the Rust calamine engine; by far the
+                     fastest for xlsx (needs python-calamine)
+    openpyxl-stream  openpyxl in read-only mode, reading cell values row by row
+                     without building cell objects
+    openpyxl         pd.read_excel with openpyxl (the pandas default)
+    csv              Qualtrics CSV and TSV exports, read with pd.read_csv
+
+'auto' picks the first reader in that order that is available for the file;
+'fastest' times every available reader on the file and keeps the result of
+the fastest (see benchmark_readers).
+
+Given columns, a reader only converts and returns those columns (in export
+order; names that are not in the export are ignored). Duplicate column names
+are told apart the way pandas does it (Q1_1, Q1_1.1, ...), so columns are
+selected by the names the full frame would have.
+
+    python -m common.readers 1_values_excel.xlsx
+"""
+
+import math
+import os
+import sys
+import time
+
+import pandas as pd
+
+# Qualtrics exports have two extra header rows (question text and import IDs)
+# below the column names
+QUALTRICS_SKIPROWS = [1, 2]
+
+XLSX_EXTENSIONS = ('.xlsx', '.xlsm')
+DELIMITED_EXTENSIONS = {'.csv': ',', '.tsv': '\t', '.txt': '\t'}
+
+# Timestamps that are date cells in the workbook but text in CSV/TSV exports
+QUALTRICS_DATE_COLUMNS = ['StartDate', 'EndDate', 'RecordedDate']
+
+# In order of preference for 'auto'
+XLSX_READERS = ('calamine', 'openpyxl-stream', 'openpyxl')
+READERS = ('auto', 'fastest') + XLSX_READERS + ('csv',)
+
+
+def _column_filter(columns):
+    """
+    usecols argument of the pandas readers for columns (None: all columns)
+    """
+    if columns is None:
+        return None
+    wanted = set(columns)
+    return lambda name: name in wanted
+
+
+def _read_openpyxl(file_name, columns=None):
+    return pd.read_excel(file_name, header=0, skiprows=QUALTRICS_SKIPROWS, engine='openpyxl',
+                         usecols=_column_filter(columns))
+
+
+def _read_calamine(file_name, columns=None):
+    return pd.read_excel(file_name, header=0, skiprows=QUALTRICS_SKIPROWS, engine='calamine',
+                         usecols=_column_filter(columns))
+
+
+def _unique_names(names):
+    """
+    Rename repeated column names to name.1, name.2, ... as pandas does
+    """
+    counts = {}
+    unique = []
+    for name in names:
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        counts[name] = count + 1
+        unique.append(name)
+    return unique
+
+
+def _convert_cell(value, error_codes):
+    """
+    Convert a cell value the way pd.read_excel converts openpyxl cells: empty
+    cells become '', whole floats become ints and error cells become NaN
+    """
+    if value is None:
+        return ''
+    if type(value) is float:
+        return int(value) if value.is_integer() else value
+    if type(value) is str and value in error_codes:
+        return math.nan
+    return value
+
+
+def _stream_rows(file_name, columns=None):
+    """
+    Return the first sheet's rows (header row first) as lists of converted
+    values, without trailing empty rows and padded to the widest row, as
+    pd.read_excel gets them from openpyxl
+
+    With columns, only the cells of those columns are converted and the header
+    row holds their (de-duplicated) names.
+    """
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import ERROR_CODES
+
+    workbook = load_workbook(file_name, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        # Some writers store a wrong sheet size; read every row there is
+        sheet.reset_dimensions()
+        rows = []
+        positions = None
+        width = 0
+        last_row_with_data = -1
+        for row in sheet.iter_rows(values_only=True):
+            # Width of the row without trailing empty cells
+            used = len(row)
+            while used and row[used - 1] in (None, ''):
+                used -= 1
+            if used:
+                last_row_with_data = len(rows)
+                width = max(width, used)
+
+            if columns is None:
+                rows.append([_convert_cell(value, ERROR_CODES) for value in row[:used]])
+            elif positions is None:
+                header = _unique_names([_convert_cell(value, ERROR_CODES) for value in row[:used]])
+                wanted = set(columns)
+                positions = [i for i, name in enumerate(header) if name in wanted]
+                rows.append([header[i] for i in positions])
+            else:
+                rows.append([_convert_cell(row[i], ERROR_CODES) if i < used else '' for i in positions])
+    finally:
+        workbook.close()
+
+    rows = rows[:last_row_with_data + 1]
+    if columns is None:
+        rows = [row + [''] * (width - len(row)) for row in rows]
+    return rows
+
+
+def _read_openpyxl_stream(file_name, columns=None):
+    from pandas.io.parsers import TextParser
+
+    rows = _stream_rows(file_name, columns)
+    if not rows:
+        return pd.DataFrame()
+    # The parser pandas uses for spreadsheets, so column types are inferred
+    # exactly as in pd.read_excel. Rows that are empty in every selected
+    # column are kept, as they are in the full sheet.
+    with TextParser(rows, header=0, skiprows=QUALTRICS_SKIPROWS, skip_blank_lines=False) as parser:
+        return parser.read()
+
+
+def _text_encoding(file_name):
+    """
+    Qualtrics writes CSV exports as UTF-8 and TSV exports as UTF-16, both with
+    a byte order mark
+    """
+    with open(file_name, 'rb') as f:
+        start = f.read(4)
+    if start.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16'
+    return 'utf-8-sig'
+
+
+def _read_delimited(file_name, columns=None):
+    separator = DELIMITED_EXTENSIONS.get(os.path.splitext(file_name)[1].lower(), ',')
+    df = pd.read_csv(file_name, header=0, skiprows=QUALTRICS_SKIPROWS, sep=separator,
+                     encoding=_text_encoding(file_name), usecols=_column_filter(columns), low_memory=False)
+    for column in QUALTRICS_DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+    return df
+
+
+_READ_FUNCTIONS = {
+    'calamine': _read_calamine,
+    'openpyxl-stream': _read_openpyxl_stream,
+    'openpyxl': _read_openpyxl,
+    'csv': _read_delimited
+}
+
+
+def _is_installed(module_name):
+    try:
+        __import__(module_name)
+        return True
+    except ImportError:
+        return False
+
+
+def available_readers(file_name):
+    """
+    Return the readers that can read file_name here, in order of preference
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension in DELIMITED_EXTENSIONS:
+        return ['csv']
+    if extension not in XLSX_EXTENSIONS:
+        raise ValueError(f"Unsupported export type: {file_name} (expected .xlsx, .csv or .tsv)")
+
+    readers = []
+    if _is_installed('python_calamine'):
+        readers.append('calamine')
+    if _is_installed('openpyxl'):
+        readers += ['openpyxl-stream', 'openpyxl']
+    if not readers:
+        raise ImportError("Reading xlsx exports needs openpyxl or python-calamine")
+    return readers
+
+
+def _timed_read(file_name, reader, columns=None):
+    start = time.perf_counter()
+    df = _READ_FUNCTIONS[reader](file_name, columns)
+    return df, time.perf_counter() - start
+
+
+def benchmark_readers(file_name, readers=None, repeat=1, columns=None):
+    """
+    Time each reader (default: every available one) on file_name, reading
+    only columns if given
+
+    Returns {reader: best time in seconds over repeat reads}, fastest first.
+    """
+    readers = readers or available_readers(file_name)
+    timings = {reader: min(_timed_read(file_name, reader, columns)[1] for _ in range(repeat))
+               for reader in readers}
+    return dict(sorted(timings.items(), key=lambda item: item[1]))
+
+
+def fastest_reader(file_name, repeat=1):
+    """
+    Return the name of the fastest available reader for file_name
+    """
+    return next(iter(benchmark_readers(file_name, repeat=repeat)))
+
+
+def read_qualtrics(file_name, reader='auto', columns=None):
+    """
+    Read a Qualtrics export with the given reader (see READERS), optionally
+    only the given columns
+
+    Returns (DataFrame, name of the reader used). With 'fastest' the file is
+    read once by each available reader and the frame of the fastest is kept.
+    """
+    if reader not in READERS:
+        raise ValueError(f"Unknown reader: {reader} (expected one of {', '.join(READERS)})")
+
+    if reader == 'auto':
+        reader = available_readers(file_name)[0]
+    elif reader == 'fastest':
+        best = None
+        for candidate in available_readers(file_name):
+            df, seconds = _timed_read(file_name, candidate, columns)
+            if best is None or seconds < best[2]:
+                best = (df, candidate, seconds)
+        return best[0], best[1]
+    elif reader not in available_readers(file_name):
+        raise ValueError(f"Reader {reader} is not available for {file_name}")
+
+    return _READ_FUNCTIONS[reader](file_name, columns), reader
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("usage: python -m common.readers EXPORT_FILE [REPEAT]")
+    export_file = sys.argv[1]
+    n_repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    for name, best_seconds in benchmark_readers(export_file, repeat=n_repeat).items():
+        print(f"{name:<16} {best_seconds:8.3f}s")
@@ -0,0 +1,172 @@
+"""
+Permutation split-half reliability of a per-participant score.
+
+Scores are given as in common/bootstrap.py: per-trial components laid out like
+a TrialStore (participant i's trials are the rows offsets[i]:offsets[i + 1])
+and a score function of the per-participant sums, e.g. mean_difference.
+
+Each split divides every participant's trials at random into two halves,
+separately within each stratum (the trial's condition, e.g. its scenario
+type), so that both halves keep the participant's mix of conditions. The score
+is computed on each half; the split-half correlation is Pearson's r of the two
+half scores across the participants that have both, and the reliability of
+the full-length score is its Spearman-Brown correction 2r / (1 + r). The
+correlation is averaged over all splits before it is corrected, as the
+correction of a single split diverges for r near -1 in small samples; the
+interval is the range of the central CONFIDENCE of the corrected estimates.
+
+Splits are drawn in blocks. The trials are first sorted into segments (one per
+participant and stratum) and the segments grouped by length, so a block of
+splits needs one random permutation per split and segment: a single argsort
+of a (splits x segments x length) array per segment length. The halves are
+boolean masks over that array, and the half sums are masked sums over its last
+axis followed by an np.add.reduceat from segments to participants. Blocks run
+through common.bootstrap.map_blocks, so the result only depends on seed and
+not on the number of workers.
+"""
+
+import numpy as np
+
+from common.bootstrap import BLOCK_TRIALS, CONFIDENCE, DEFAULT_SEED, map_blocks, participant_sums
+
+
+def spearman_brown(r):
+    """
+    Reliability of a score twice as long as one whose split-half correlation is r
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 2 * r / (1 + r)
+
+
+def correlate_rows(a, b):
+    """
+    Pearson's r of every row of a with the same row of b, over the columns
+    where both are present (NaN for rows with fewer than 3 such columns)
+    """
+    valid = ~(np.isnan(a) | np.isnan(b))
+    n = valid.sum(axis=1)
+    a = np.where(valid, a, 0.0)
+    b = np.where(valid, b, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(valid, a - (a.sum(axis=1) / n)[:, np.newaxis], 0.0)
+        b = np.where(valid, b - (b.sum(axis=1) / n)[:, np.newaxis], 0.0)
+        r = (a * b).sum(axis=1) / np.sqrt((a * a).sum(axis=1) * (b * b).sum(axis=1))
+    return np.where(n >= 3, r, np.nan)
+
+
+def split_segments(components, offsets, participants, strata=None):
+    """
+    Sort the trials of the given participants into segments, one per
+    participant and stratum, and group the segments by their length
+
+    Returns (segment_participant, groups, totals): the position in participants
+    of every segment's participant, one (segment indices, segment values) pair
+    per segment length where segment values is a (components x segments x
+    length) array of the segments' trials, and the summed components of every
+    participant.
+    """
+    counts = np.diff(offsets)[participants]
+    # Trial indices of the participants' trials, one run of counts[i] per participant
+    first_trial = np.cumsum(counts) - counts
+    trials = np.repeat(offsets[:-1][participants] - first_trial, counts) + np.arange(counts.sum())
+    rows = np.repeat(np.arange(len(participants)), counts)
+    if strata is None:
+        keys = rows
+    else:
+        strata = np.asarray(strata)[trials]
+        order = np.lexsort((strata, rows))
+        trials, rows, strata = trials[order], rows[order], strata[order]
+        keys = rows * (int(strata.max()) - int(strata.min()) + 1) + (strata - strata.min())
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    lengths = np.diff(np.r_[starts, len(keys)])
+    values = np.asarray(components, dtype=np.float64)[trials]
+
+    groups = []
+    for length in np.unique(lengths):
+        segments = np.flatnonzero(lengths == length)
+        positions = starts[segments][:, np.newaxis] + np.arange(length)
+        groups.append((segments, np.ascontiguousarray(np.moveaxis(values[positions], -1, 0))))
+
+    totals = np.add.reduceat(values, np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]), axis=0)
+    return rows[starts], groups, totals
+
+
+def split_correlations(segment_participant, groups, totals, score, n_splits, seed):
+    """
+    Draw n_splits random splits at once and return the split-half correlation
+    of each
+    """
+    rng = np.random.default_rng(seed)
+    n_segments = len(segment_participant)
+    half_sums = np.empty((n_splits, n_segments, totals.shape[1]))
+    for segments, values in groups:
+        length = values.shape[-1]
+        # A random order of every segment's trials per split; the first
+        # length // 2 of them (one more for odd lengths, on a coin flip) form
+        # the first half
+        order = np.argsort(rng.random((n_splits, len(segments), length), dtype=np.float32), axis=-1)
+        size = (length + rng.integers(0, 2, size=(n_splits, len(segments), 1))) // 2
+        in_half = np.empty(order.shape, dtype=bool)
+        np.put_along_axis(in_half, order, np.arange(length) < size, axis=-1)
+        for k, column in enumerate(values):
+            half_sums[:, segments, k] = np.einsum('sgn,gn->sg', in_half, column)
+
+    first_segment = np.flatnonzero(np.r_[True, segment_participant[1:] != segment_participant[:-1]])
+    first = np.add.reduceat(half_sums, first_segment, axis=1)
+    second = totals - first
+    n_participants = len(totals)
+    first = score(first.reshape(-1, totals.shape[1])).reshape(n_splits, n_participants)
+    second = score(second.reshape(-1, totals.shape[1])).reshape(n_splits, n_participants)
+    return correlate_rows(first, second)
+
+
+def split_half_reliability(components, offsets, score, n_splits=5_000, strata=None,
+                           confidence=CONFIDENCE, participants=None, seed=DEFAULT_SEED, workers=1):
+    """
+    Return the permutation split-half reliability of a score as a dict of the
+    mean split-half correlation ('r'), its Spearman-Brown correction
+    ('reliability'), the interval of the corrected estimates of the single
+    splits ('lower', 'upper'), and the numbers of splits and participants
+
+    strata gives the condition of every trial; halves are drawn within each
+    condition (default: across all of a participant's trials). participants
+    are the rows whose scores are correlated (default: every participant with
+    a score). With workers > 1 the blocks of splits are spread over a process
+    pool; score must then be a module-level function. The estimates are NaN
+    when fewer than 3 participants have a score on both halves.
+    """
+    components = np.asarray(components, dtype=np.float64)
+    if components.ndim == 1:
+        components = components[:, np.newaxis]
+    offsets = np.asarray(offsets, dtype=np.int64)
+
+    if participants is None:
+        participants = np.flatnonzero(~np.isnan(score(participant_sums(components, offsets))))
+    else:
+        participants = np.asarray(participants)
+        if participants.dtype == bool:
+            participants = np.flatnonzero(participants)
+    # A participant needs a trial in each half
+    participants = participants[np.diff(offsets)[participants] > 1]
+
+    result = {'r': np.nan, 'reliability': np.nan, 'lower': np.nan, 'upper': np.nan,
+              'n_splits': 0, 'n_participants': len(participants)}
+    if len(participants) < 3 or n_splits <= 0:
+        return result
+
+    segment_participant, groups, totals = split_segments(components, offsets, participants, strata)
+    n_trials = int(np.diff(offsets)[participants].sum())
+    r = np.concatenate(map_blocks(split_correlations, (segment_participant, groups, totals, score),
+                                  n_splits, max(1, BLOCK_TRIALS // n_trials), seed, workers))
+    r = r[~np.isnan(r)]
+    if len(r) == 0:
+        return result
+
+    # The correction is monotonic in r, so it maps the quantiles of r onto
+    # those of the corrected estimates
+    alpha = (1 - confidence) / 2
+    lower, upper = spearman_brown(np.quantile(r, [alpha, 1 - alpha]))
+    result.update({'r': r.mean(), 'reliability': spearman_brown(r.mean()),
+                   'lower': lower, 'upper': upper, 'n_splits': len(r)})
+    return result
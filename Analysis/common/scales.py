@@ -0,0 +1,99 @@
+"""
+Matrix scoring of questionnaire scales.
+
+Each scale is described by a registry entry (see SCALES in
+Questionnaire/questionnaire_analysis.py):
+
+    'items'           item columns, in item order (item 1 is the first column)
+    'reverse_keyed'   1-based item numbers scored in reverse (optional)
+    'response_range'  (min, max) response, used to reverse items as min + max - x
+    'subscales'       subscale name -> 1-based item numbers (optional)
+    'score_prefix'    column prefix of the total and mean scores, for scales
+                      without subscales
+
+All item columns are converted to one float matrix and every total, mean and
+valid-item count is computed with masked NumPy reductions over that matrix,
+so adding an instrument only means adding a registry entry.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _masked_sum(items, valid):
+    """
+    Row sums over the valid items, with the count of valid items per row
+    """
+    return np.where(valid, items, 0.0).sum(axis=1), valid.sum(axis=1)
+
+
+def _completion_rate(n_valid, n_items):
+    return np.char.mod('%.1f%%', n_valid / n_items * 100).astype(object)
+
+
+def score_scale(response_ids, items, all_integer, scale):
+    """
+    Score one scale from its float item matrix (one row per participant)
+
+    all_integer marks item columns that were integer-typed in the export;
+    their scores are reported as integers, as summing the raw responses would.
+    """
+    n_items = len(scale['items'])
+    items = items.copy()
+
+    reverse_keyed = [item - 1 for item in scale.get('reverse_keyed', [])]
+    if reverse_keyed:
+        low, high = scale['response_range']
+        items[:, reverse_keyed] = (low + high) - items[:, reverse_keyed]
+
+    valid = ~np.isnan(items)
+    results = {'ResponseId': response_ids}
+
+    if 'subscales' in scale:
+        for name, subscale_items in scale['subscales'].items():
+            columns = [item - 1 for item in subscale_items]
+            total, n_valid = _masked_sum(items[:, columns], valid[:, columns])
+            # Subscale totals are plain sums, so a subscale without valid items is the integer 0
+            if all_integer or not n_valid.any():
+                total = total.astype(np.int64)
+            results[f"{name}_Total_Score"] = total
+            results[f"{name}_Valid_Items"] = n_valid
+
+        n_valid = valid.sum(axis=1)
+        results['Total_Valid_Items'] = n_valid
+        results['Total_Missing_Items'] = n_items - n_valid
+    else:
+        prefix = scale['score_prefix']
+        total, n_valid = _masked_sum(items, valid)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(n_valid > 0, total / n_valid, np.nan)
+
+        results[f"{prefix}_Total_Score"] = total.astype(np.int64) if all_integer else total
+        results[f"{prefix}_Mean_Score"] = mean
+        results['Valid_Items'] = n_valid
+        results['Missing_Items'] = n_items - n_valid
+
+    results['Total_Items'] = n_items
+    results['Completion_Rate'] = _completion_rate(n_valid, n_items)
+    return pd.DataFrame(results)
+
+
+def score_scales(df, scales):
+    """
+    Score every scale in the registry; returns scale name -> results DataFrame
+
+    The item block of all scales is converted in one pass and each scale is
+    scored from its slice of that matrix.
+    """
+    columns = list(dict.fromkeys(column for scale in scales.values() for column in scale['items']))
+    numeric = df[columns].apply(pd.to_numeric, errors='coerce')
+    matrix = numeric.to_numpy(dtype=np.float64)
+    position = {column: i for i, column in enumerate(columns)}
+    response_ids = df['ResponseId'].to_numpy()
+
+    scored = {}
+    for name, scale in scales.items():
+        scale_columns = [position[column] for column in scale['items']]
+        all_integer = all(pd.api.types.is_integer_dtype(numeric.dtypes.iloc[i]) for i in scale_columns)
+        scored[name] = score_scale(response_ids, matrix[:, scale_columns], all_integer, scale)
+    return scored
@@ -0,0 +1,132 @@
+"""
+Stage timing and memory use of an analysis run.
+
+The analysis scripts mark the end of each stage of a run (load, parse, score,
+summarize, export) on an optional timer, record how many rows and trials they
+processed, and ask the timer to write a JSON run report next to their outputs.
+Without a timer they use NO_TIMER, whose methods do nothing.
+
+A StageTimer records the wall-clock time and the peak resident memory of every
+stage; with track_memory=True it also records the peak of Python allocations
+(tracemalloc) during each stage, which is more precise but slows the run down.
+"""
+
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB (None where unavailable)
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+class StageTimer:
+    """
+    Records the wall-clock time and memory use of consecutive stages
+
+    start() begins timing; each lap(name) closes the stage that has run since
+    the previous lap (or start) and records it under name. count(name, n) adds
+    n to the number of items (e.g. rows or trials) processed by the run.
+    """
+
+    def __init__(self, track_memory=False):
+        self.stages = {}
+        self.memory = {}
+        self.counts = {}
+        self.track_memory = track_memory
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._last = time.perf_counter()
+
+    def start(self):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+        self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.stages[name] = self.stages.get(name, 0.0) + (now - self._last)
+
+        memory = self.memory.setdefault(name, {})
+        memory['peak_rss_mb'] = peak_rss_mb()
+        if self.track_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            memory['tracemalloc_peak_mb'] = max(peak, memory.get('tracemalloc_peak_mb', 0.0))
+            tracemalloc.reset_peak()
+
+        # Measuring memory is not part of the next stage
+        self._last = time.perf_counter()
+
+    def count(self, name, n):
+        self.counts[name] = self.counts.get(name, 0) + int(n)
+
+    def report(self, **info):
+        """
+        Return the run report as a JSON-serializable dict; info (e.g. the task
+        and engine) is included as given
+        """
+        total = sum(self.stages.values())
+        return {
+            **info,
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'total_seconds': total,
+            'peak_rss_mb': peak_rss_mb(),
+            'stages': {name: {'seconds': seconds, **self.memory.get(name, {})}
+                       for name, seconds in self.stages.items()},
+            'counts': dict(self.counts),
+            'per_second': {name: n / total if total > 0 else None for name, n in self.counts.items()}
+        }
+
+    def write_report(self, path, **info):
+        """
+        Write the run report (see report) as JSON to path
+        """
+        with open(path, 'w') as f:
+            json.dump(self.report(**info), f, indent=2)
+
+
+class _NoTimer:
+    def start(self):
+        pass
+
+    def lap(self, name):
+        pass
+
+    def count(self, name, n):
+        pass
+
+    def write_report(self, path, **info):
+        pass
+
+
+NO_TIMER = _NoTimer()
+
+
+def timer_from_argv(argv=None):
+    """
+    Return the timer asked for on a script's command line: a StageTimer with
+    --profile, one that also traces allocations with --profile=memory, and
+    NO_TIMER otherwise
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if '--profile=memory' in argv:
+        return StageTimer(track_memory=True)
+    if '--profile' in argv:
+        return StageTimer()
+    return NO_TIMER
@@ -0,0 +1,104 @@
+"""
+Metric/Value summary sheets.
+
+A summary is described by a spec - a list of rows, each either
+
+    (metric, value)                  a row rendered as given (counts, separators)
+    (metric, column, stat, fmt)      a statistic of a results column, formatted
+                                     with the format spec fmt (e.g. '.3f')
+
+where stat is any reduction accepted by DataFrame.agg ('mean', 'std', 'min',
+'max', 'median', ...). Every statistic of every referenced column is computed
+in a single agg call; missing values are skipped column by column.
+
+Bootstrap confidence intervals (see common/bootstrap.py) and split-half
+reliabilities (see common/reliability.py) are added as preformatted rows with
+ci_rows and reliability_rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+from common.bootstrap import CONFIDENCE
+
+# Standard statistics of a score column, in the order the summary sheets list them
+DESCRIBE = ('mean', 'std', 'min', 'max', 'median')
+
+STAT_LABELS = {'mean': 'Mean', 'std': 'SD', 'min': 'Min', 'max': 'Max', 'median': 'Median'}
+
+
+def stat_rows(label, column, fmt, stats=DESCRIBE):
+    """
+    Spec rows '<label> - Mean', '<label> - SD', ... for one column
+    """
+    return [(f"{label} - {STAT_LABELS[stat]}", column, stat, fmt) for stat in stats]
+
+
+def ci_rows(label, interval, fmt, confidence=CONFIDENCE, empty_value='No data'):
+    """
+    Spec rows '<label> - Mean 95% CI Lower' and '... Upper' for a bootstrap
+    interval of the mean; no rows when interval is None (not computed)
+    """
+    if interval is None:
+        return []
+    return [(f"{label} - Mean {confidence:.0%} CI {bound}", empty_value if np.isnan(value) else format(value, fmt))
+            for bound, value in zip(('Lower', 'Upper'), interval)]
+
+
+def reliability_rows(label, reliability, confidence=CONFIDENCE, empty_value='No data'):
+    """
+    Spec rows for a split_half_reliability result: the mean split-half r, its
+    Spearman-Brown reliability and the interval of the reliability over the
+    splits; no rows when reliability is None (not computed)
+    """
+    if reliability is None:
+        return []
+
+    def value(key):
+        return empty_value if np.isnan(reliability[key]) else f"{reliability[key]:.3f}"
+
+    return [
+        (f"{label} - Split-Half r", value('r')),
+        (f"{label} - Split-Half Reliability (Spearman-Brown)", value('reliability')),
+        (f"{label} - Split-Half Reliability {confidence:.0%} Range Lower", value('lower')),
+        (f"{label} - Split-Half Reliability {confidence:.0%} Range Upper", value('upper')),
+        (f"{label} - Split-Half Splits", str(reliability['n_splits']))
+    ]
+
+
+def compute_stats(data, spec):
+    """
+    Compute every statistic referenced by the spec in one agg call
+
+    Returns a DataFrame indexed by statistic with one column per results
+    column, plus a 'count' row of non-missing values.
+    """
+    columns = list(dict.fromkeys(row[1] for row in spec if len(row) == 4))
+    stats = list(dict.fromkeys(['count'] + [row[2] for row in spec if len(row) == 4]))
+    return data[columns].agg(stats)
+
+
+def render_summary(data, spec, empty_value=None):
+    """
+    Render a spec over data as the Metric/Value summary DataFrame
+
+    Statistics of a column without any values are rendered as empty_value
+    when it is given (otherwise they are formatted like any other value).
+    """
+    stats = compute_stats(data, spec)
+
+    metrics = []
+    values = []
+    for row in spec:
+        if len(row) == 2:
+            metric, value = row
+        else:
+            metric, column, stat, fmt = row
+            if empty_value is not None and stats.at['count', column] == 0:
+                value = empty_value
+            else:
+                value = format(stats.at[stat, column], fmt)
+        metrics.append(metric)
+        values.append(value)
+
+    return pd.DataFrame({'Metric': metrics, 'Value': values})
@@ -0,0 +1,46 @@
+"""
+Column types of trial-level data.
+
+Text fields of the trial-level tasks draw on small fixed vocabularies (response
+keys, scenario and word valences, accuracy flags). They are parsed straight
+into pandas categoricals whose categories are the vocabulary, so every trial
+takes one byte and comparisons such as == 'r' or isin(['anxiety',
+'depression']) compare integer codes. Values outside a vocabulary are kept:
+they are added as extra categories after it.
+
+Binary codes (e.g. the DDM response_binary) are int8. RTs stay float64: the
+recorded timings have sub-millisecond fractions (e.g. 1045.89999998) that
+float32 cannot hold, and rounding them would change the reported RT means.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Original WSAP responses: r = related (endorsed), u = unrelated (rejected)
+ENDORSE_KEYS = ('r', 'u')
+
+# New WSAP responses: j = left option, f = right option
+CHOICE_KEYS = ('j', 'f')
+
+# Scenario, word and chosen valences
+VALENCES = ('depression', 'anxiety', 'positive', 'benign', 'threat')
+
+# PST accuracy flags (lowercased)
+ACCURACY = ('true', 'false')
+
+RT_DTYPE = np.float64
+BINARY_DTYPE = np.int8
+
+# Row and trial numbers within trial tables
+INDEX_DTYPE = np.int32
+
+
+def categorize(values, vocabulary):
+    """
+    Return values as a pandas Categorical over vocabulary, followed by any
+    other values that occur (sorted); missing values stay missing
+    """
+    values = pd.Series(values, dtype=object) if not isinstance(values, pd.Series) else values.astype(object)
+    present = values.dropna().unique()
+    extra = sorted(set(present) - set(vocabulary), key=str)
+    return pd.Categorical(values, categories=list(vocabulary) + extra)
@@ -0,0 +1,243 @@
+"""
+Compact on-disk store of trial-level task data.
+
+A trial store holds one contiguous array per trial field (RTs as float64,
+categorical fields such as responses or scenario types as small integer codes)
+plus an offsets array indexed by participant row, so participant i's trials
+are field[offsets[i]:offsets[i + 1]]. Stores are saved as .npy files and
+opened with mmap_mode, which lets re-runs and downstream scripts slice any
+participant's trials without copying or re-parsing the workbook.
+
+Stores are keyed on a fingerprint of the export columns they were built from
+and of the code that parses them (the calling script and Analysis/common), and
+are kept in Analysis/.qualtrics_cache/trials/.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from common.fingerprint import frame_fingerprint, source_fingerprint
+from common.parsing import RaggedArray
+from common.trial_schema import INDEX_DTYPE, categorize
+
+STORE_FORMAT_VERSION = 2
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 ".qualtrics_cache", "trials")
+
+# Number of stores kept per task (e.g. for a few alternating exports)
+MAX_STORES_PER_TASK = 4
+
+
+def _code_dtype(n_categories):
+    if n_categories < np.iinfo(np.int8).max:
+        return np.int8
+    if n_categories < np.iinfo(np.int16).max:
+        return np.int16
+    return np.int32
+
+
+class TrialStore:
+    """
+    Ragged trial-level arrays for one task, indexed by participant row
+
+    fields maps field name -> flat array over all trials. Categorical fields
+    hold integer codes into categories[name], with -1 for missing values.
+    """
+
+    def __init__(self, fields, offsets, categories=None, participant_ids=None):
+        self.fields = fields
+        self.offsets = offsets
+        self.categories = categories or {}
+        self.participant_ids = participant_ids
+
+    @classmethod
+    def from_trials(cls, trials, n_trials, participant_ids=None, vocabularies=None):
+        """
+        Build a store from an aligned long trial table (see explode_aligned);
+        object columns are encoded as categorical codes
+
+        vocabularies maps field name -> its fixed vocabulary (see
+        common/trial_schema.py), which then comes first in the field's
+        categories; other fields use their sorted values.
+        """
+        vocabularies = vocabularies or {}
+        fields = {}
+        categories = {}
+        for name in trials.columns:
+            if name in ('row', 'trial'):
+                continue
+            values = trials[name].to_numpy()
+            if values.dtype == object:
+                if name in vocabularies:
+                    categorical = categorize(values, vocabularies[name])
+                    codes, uniques = categorical.codes, categorical.categories
+                else:
+                    codes, uniques = pd.factorize(values, sort=True)
+                fields[name] = codes.astype(_code_dtype(len(uniques)))
+                categories[name] = [str(u) for u in uniques]
+            else:
+                fields[name] = values
+
+        offsets = np.concatenate(([0], np.cumsum(n_trials))).astype(np.int64)
+        if participant_ids is not None:
+            participant_ids = np.asarray(participant_ids).astype(str)
+        return cls(fields, offsets, categories, participant_ids)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_trials(self):
+        return np.diff(self.offsets)
+
+    def ragged(self, name):
+        """
+        Return one field as a RaggedArray sharing the store's arrays
+        """
+        return RaggedArray(self.fields[name], self.offsets)
+
+    def participant(self, i):
+        """
+        Return participant i's trials as field name -> array view (no copy)
+        """
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return {name: values[start:end] for name, values in self.fields.items()}
+
+    def decode(self, name, codes):
+        """
+        Map categorical codes back to their labels (NaN for missing)
+        """
+        return pd.Categorical.from_codes(codes, categories=self.categories[name])
+
+    def to_frame(self):
+        """
+        Return the long trial table ('row', 'trial' and one column per field);
+        categorical fields are returned as pandas categoricals
+        """
+        n_trials = self.n_trials
+        row_ids = np.repeat(np.arange(len(self), dtype=INDEX_DTYPE), n_trials)
+        frame = {
+            'row': row_ids,
+            'trial': (np.arange(self.offsets[-1]) - self.offsets[row_ids]).astype(INDEX_DTYPE)
+        }
+        for name, values in self.fields.items():
+            frame[name] = self.decode(name, values) if name in self.categories else values
+        return pd.DataFrame(frame)
+
+    def save(self, directory):
+        """
+        Write the store as .npy files plus a manifest; the manifest is written
+        last so a partially written store is never opened
+        """
+        tmp_dir = f"{directory}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        np.save(os.path.join(tmp_dir, "offsets.npy"), self.offsets)
+        for name, values in self.fields.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(values))
+        if self.participant_ids is not None:
+            np.save(os.path.join(tmp_dir, "participant_ids.npy"), self.participant_ids)
+
+        with open(os.path.join(tmp_dir, "manifest.json"), 'w') as f:
+            json.dump({
+                'version': STORE_FORMAT_VERSION,
+                'fields': list(self.fields),
+                'categories': self.categories,
+                'has_participant_ids': self.participant_ids is not None
+            }, f, indent=2)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp_dir, directory)
+
+    @classmethod
+    def open(cls, directory, mmap_mode='r'):
+        """
+        Open a saved store with its arrays memory-mapped
+        """
+        with open(os.path.join(directory, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported trial store version in {directory}")
+
+        offsets = np.load(os.path.join(directory, "offsets.npy"), mmap_mode=mmap_mode)
+        fields = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in manifest['fields']}
+        participant_ids = None
+        if manifest['has_participant_ids']:
+            participant_ids = np.load(os.path.join(directory, "participant_ids.npy"), mmap_mode=mmap_mode)
+        return cls(fields, offsets, manifest['categories'], participant_ids)
+
+
+def _prune_stores(store_dir, task_name, keep):
+    """
+    Remove all but the most recently used stores of a task
+    """
+    prefix = f"{task_name}-"
+    entries = [os.path.join(store_dir, name) for name in os.listdir(store_dir)
+               if name.startswith(prefix) and ".tmp" not in name]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+_save_stores = True
+
+
+@contextlib.contextmanager
+def unsaved_stores():
+    """
+    Within this block cached_trial_store builds stores without saving them,
+    e.g. for the subsets of rows scored incrementally, which would otherwise
+    evict the stores of the full export
+    """
+    global _save_stores
+    previous, _save_stores = _save_stores, False
+    try:
+        yield
+    finally:
+        _save_stores = previous
+
+
+def cached_trial_store(df, task_name, source_columns, build, store_dir=None):
+    """
+    Return the trial store for df's task columns, building it only if needed
+
+    build() must return a TrialStore; it is only called when no saved store
+    matches the fingerprint of df[source_columns] and of the code that parses
+    them: the file build is defined in (with its vocabularies) and the shared
+    helpers in Analysis/common. Saved stores are opened memory-mapped.
+    Within unsaved_stores() the store is always built and not saved.
+    """
+    if not _save_stores:
+        return build()
+
+    store_dir = store_dir or DEFAULT_STORE_DIR
+    key = frame_fingerprint(df, ['ResponseId'] + list(source_columns))
+    code = source_fingerprint(build.__code__.co_filename)
+    key = hashlib.sha256(f"{task_name}:{STORE_FORMAT_VERSION}:{code}:{key}".encode()).hexdigest()[:16]
+    path = os.path.join(store_dir, f"{task_name}-{key}")
+
+    if os.path.exists(os.path.join(path, "manifest.json")):
+        try:
+            store = TrialStore.open(path)
+            os.utime(path)
+            return store
+        except (OSError, ValueError):
+            pass
+
+    store = build()
+    try:
+        os.makedirs(store_dir, exist_ok=True)
+        store.save(path)
+        _prune_stores(store_dir, task_name, MAX_STORES_PER_TASK)
+    except OSError:
+        # A read-only cache directory should not stop the analysis
+        pass
+    return store
@@ -0,0 +1,390 @@
+"""
+Run all analyses from a single process.
+
+The Qualtrics export is loaded once and the selected analyses are run
+concurrently in a process pool. On platforms that support fork the loaded
+DataFrame is shared copy-on-write with the workers instead of being re-parsed
+or pickled. Each analysis writes its usual output files into its own
+subfolder (AST/, SST/, PST/, Questionnaire/, WSAP/).
+
+Usage:
+    python3 run_all_analyses.py
+    python3 run_all_analyses.py --tasks sst pst --workers 2
+    python3 run_all_analyses.py --incremental
+    python3 run_all_analyses.py --profile               # write JSON run reports
+    python3 run_all_analyses.py --formats xlsx parquet  # also write each sheet as Parquet
+    python3 run_all_analyses.py --watch                 # re-run affected analyses when the export changes
+"""
+
+import argparse
+import datetime
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+ANALYSIS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ANALYSIS_DIR)
+
+from common.fingerprint import data_fingerprint, frame_fingerprint, source_fingerprint
+from common.loader import CACHE_DIR_NAME, load_qualtrics_export
+from common.output import OUTPUT_FORMATS, XLSX_ENGINES
+from common.readers import READERS
+from common.stages import StageTimer, peak_rss_mb
+
+DEFAULT_INPUT = os.path.join(ANALYSIS_DIR, "1_values_excel.xlsx")
+
+# Task name -> (subfolder, script, entry point)
+TASKS = {
+    'ast': ('AST', 'ast_analysis.py', 'run_ast_analysis'),
+    'sst': ('SST', 'sst_analysis.py', 'run_sst_analysis'),
+    'pst': ('PST', 'pst_analysis.py', 'run_pst_analysis'),
+    'questionnaire': ('Questionnaire', 'questionnaire_analysis.py', 'run_questionnaire_analysis'),
+    'wsap': ('WSAP', 'wsap_analysis.py', 'run_wsap_analysis'),
+}
+
+# DataFrame shared with worker processes (inherited through fork, or set by
+# the pool initializer on platforms that spawn)
+_shared_df = None
+
+
+def load_task_module(task_name):
+    """
+    Import a task script from its subfolder as a module
+    """
+    subfolder, script, _ = TASKS[task_name]
+    script_path = os.path.join(ANALYSIS_DIR, subfolder, script)
+    module_name = os.path.splitext(script)[0]
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def required_columns(task_names):
+    """
+    Return the export columns read by any of the given analyses (see each
+    script's REQUIRED_COLUMNS)
+    """
+    columns = {}
+    for task_name in task_names:
+        columns.update(dict.fromkeys(load_task_module(task_name).REQUIRED_COLUMNS))
+    return list(columns)
+
+
+def _init_worker(df):
+    global _shared_df
+    _shared_df = df
+
+
+def run_task(task_name, options=None, profile=None):
+    """
+    Run one analysis on the shared DataFrame; options are passed on to the
+    task's entry point (e.g. incremental=True)
+
+    With profile='time' (or 'memory', which also traces allocations) the task
+    is run with a StageTimer and writes its run report next to its outputs.
+
+    Returns (status, wall-clock seconds, run report or None); a failing
+    analysis is reported rather than aborting the other tasks.
+    """
+    subfolder, _, entry_point = TASKS[task_name]
+    timer = StageTimer(track_memory=profile == 'memory') if profile else None
+
+    start = time.perf_counter()
+    try:
+        module = load_task_module(task_name)
+        getattr(module, entry_point)(_shared_df, output_dir=os.path.join(ANALYSIS_DIR, subfolder),
+                                     timer=timer, **(options or {}))
+        status = 'ok'
+    except Exception as e:
+        status = f"failed: {type(e).__name__}: {e}"
+    report = timer.report(task=task_name) if timer is not None else None
+    return status, time.perf_counter() - start, report
+
+
+def pool_context():
+    # fork shares the loaded DataFrame copy-on-write; fall back to the
+    # platform default elsewhere
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def merge_task_options(task_names, options=None, task_options=None):
+    """
+    Return task name -> options for that task: options shared by every task,
+    updated with the task's own entry in task_options
+    """
+    return {task_name: {**(options or {}), **(task_options or {}).get(task_name, {})}
+            for task_name in task_names}
+
+
+def run_all(df, task_names, workers=None, options=None, profile=None, task_options=None):
+    """
+    Run the given analyses, in parallel when more than one worker is used
+
+    options are passed to every task; task_options maps task name -> options
+    for that task only (e.g. {'wsap': {'ddm_format': 'parquet'}}).
+
+    Returns a dict of task name -> (status, wall-clock seconds, run report
+    or None); see run_task.
+    """
+    global _shared_df
+    _shared_df = df
+
+    # Import the task modules up front so forked workers inherit them
+    for task_name in task_names:
+        load_task_module(task_name)
+
+    task_options = merge_task_options(task_names, options, task_options)
+
+    timings = {}
+    workers = min(workers or os.cpu_count() or 1, len(task_names))
+
+    if workers <= 1:
+        for task_name in task_names:
+            timings[task_name] = run_task(task_name, task_options[task_name], profile)
+        return timings
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                             initializer=_init_worker, initargs=(df,)) as pool:
+        futures = {pool.submit(run_task, task_name, task_options[task_name], profile): task_name
+                   for task_name in task_names}
+        for future in as_completed(futures):
+            timings[futures[future]] = future.result()
+
+    return timings
+
+
+def task_fingerprints(df, task_names, task_options, code_fingerprints):
+    """
+    Return task name -> fingerprint of everything the task's results depend
+    on: the export rows holding its data (see each script's DATA_COLUMNS), the
+    ResponseIds of all rows (every response is listed in the results, as "No
+    data" without task data), its code and its options
+    """
+    response_ids = frame_fingerprint(df, ['ResponseId'])
+    fingerprints = {}
+    for task_name in task_names:
+        module = load_task_module(task_name)
+        digest = hashlib.sha256()
+        digest.update(data_fingerprint(df, module.REQUIRED_COLUMNS, module.DATA_COLUMNS).encode())
+        digest.update(response_ids.encode())
+        digest.update(code_fingerprints[task_name].encode())
+        digest.update(json.dumps(task_options[task_name], sort_keys=True).encode())
+        fingerprints[task_name] = digest.hexdigest()
+    return fingerprints
+
+
+def _watch_state_path(export_file):
+    export_dir, base_name = os.path.split(os.path.abspath(export_file))
+    return os.path.join(export_dir, CACHE_DIR_NAME, f"{os.path.splitext(base_name)[0]}.watch.json")
+
+
+def _read_watch_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_watch_state(path, state):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _export_signature(export_file):
+    try:
+        stat = os.stat(export_file)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def run_changed(export_file, task_names, state, workers=None, task_options=None, code_fingerprints=None,
+                reader='auto', use_cache=True):
+    """
+    Load the export and run the tasks whose fingerprint differs from the one
+    recorded in state (task name -> fingerprint of its last successful run),
+    updating state for the tasks that succeed
+
+    Returns False if the export could not be loaded (e.g. while it is still
+    being written), True otherwise.
+    """
+    now = datetime.datetime.now().strftime('%H:%M:%S')
+    try:
+        df = load_qualtrics_export(export_file, use_cache=use_cache, reader=reader,
+                                   columns=required_columns(task_names))
+    except Exception as e:
+        print(f"[{now}] Could not load the export: {type(e).__name__}: {e}")
+        return False
+
+    fingerprints = task_fingerprints(df, task_names, task_options, code_fingerprints)
+    changed = [task_name for task_name in task_names if state.get(task_name) != fingerprints[task_name]]
+    unchanged = [task_name for task_name in task_names if task_name not in changed]
+    if not changed:
+        print(f"[{now}] {len(df)} responses; no analysis inputs changed")
+        return True
+
+    print(f"[{now}] {len(df)} responses; running {', '.join(changed)}"
+          + (f" (unchanged: {', '.join(unchanged)})" if unchanged else ""))
+    timings = run_all(df, changed, workers=workers, task_options=task_options)
+    for task_name in changed:
+        status, elapsed, _ = timings[task_name]
+        print(f"  {task_name:<15} {elapsed:8.2f}s  {status}")
+        if status == 'ok':
+            state[task_name] = fingerprints[task_name]
+    return True
+
+
+def watch(export_file, task_names, interval=5.0, workers=None, options=None, task_options=None,
+          reader='auto', use_cache=True):
+    """
+    Re-run the analyses affected by each new version of the export, until
+    interrupted
+
+    The export is polled every interval seconds. Once a change has settled
+    (same size and modification time on two polls in a row) it is loaded and
+    only the analyses whose data rows, responses, code or options changed are
+    run (see task_fingerprints); the others keep their previous output files.
+    Runs are always incremental, so a new response without data for an
+    analysis costs it a re-export but scores just that one row. The
+    fingerprints of the last successful runs are saved next to the export's
+    cache, so a restarted watcher skips unchanged analyses too. The code is
+    fingerprinted once at start-up: restart the watcher after editing it.
+    """
+    task_options = merge_task_options(task_names, {**(options or {}), 'incremental': True}, task_options)
+    code_fingerprints = {task_name: source_fingerprint(load_task_module(task_name).__file__)
+                         for task_name in task_names}
+    state_path = _watch_state_path(export_file)
+    state = _read_watch_state(state_path)
+
+    print(f"Watching {export_file} every {interval:g}s (Ctrl+C to stop)")
+    previous = None
+    processed = None
+    try:
+        while True:
+            signature = _export_signature(export_file)
+            if signature is not None and signature == previous and signature != processed:
+                if run_changed(export_file, task_names, state, workers, task_options, code_fingerprints,
+                               reader, use_cache):
+                    processed = signature
+                    _write_watch_state(state_path, state)
+            previous = signature
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Qualtrics analyses from a single process.")
+    parser.add_argument('--input', default=DEFAULT_INPUT,
+                        help="Qualtrics values export, xlsx, CSV or TSV (default: Analysis/1_values_excel.xlsx)")
+    parser.add_argument('--tasks', nargs='+', choices=list(TASKS), default=list(TASKS),
+                        help="Analyses to run (default: all)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes (default: one per task, up to the CPU count; 1 runs serially)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Read the export directly instead of using the columnar cache")
+    parser.add_argument('--reader', choices=READERS, default='auto',
+                        help="Export reader used when the cache is rebuilt (default: the fastest installed "
+                             "one for the file type; 'fastest' times them all on the export)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only score responses that are new or changed since the last run")
+    parser.add_argument('--no-memo', action='store_true',
+                        help="Recompute every stage instead of re-using the results of earlier runs with "
+                             "the same data, options and code")
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                        help="Add confidence intervals of the mean bias indices and scores to the summary sheets, "
+                             "from N bootstrap resamples of participants and their trials (e.g. 10000)")
+    parser.add_argument('--bootstrap-workers', type=int, default=1,
+                        help="Processes each analysis spreads its bootstrap resamples over (default: 1)")
+    parser.add_argument('--reliability', type=int, default=0, metavar='N',
+                        help="Add the permutation split-half reliabilities (Spearman-Brown) of the PST and "
+                             "WSAP bias indices to the summary sheets, averaged over N random splits "
+                             "(e.g. 5000)")
+    parser.add_argument('--reliability-workers', type=int, default=1,
+                        help="Processes each analysis spreads its split-half splits over (default: 1)")
+    parser.add_argument('--profile', nargs='?', const='time', choices=['time', 'memory'], default=None,
+                        help="Record the time and memory use of every stage and write JSON run reports "
+                             "(memory also traces allocations, which slows the run down)")
+    parser.add_argument('--formats', nargs='+', choices=OUTPUT_FORMATS, default=['xlsx'],
+                        help="Result files to write: the xlsx workbook and/or one CSV or Parquet file "
+                             "per sheet (default: xlsx)")
+    parser.add_argument('--ddm-format', choices=['csv', 'parquet'], default='csv',
+                        help="Format of the WSAP DDM datasets (default: csv; parquet needs pyarrow)")
+    parser.add_argument('--xlsx-engine', choices=XLSX_ENGINES, default='auto',
+                        help="Workbook writer (default: xlsxwriter in constant-memory mode when installed, "
+                             "otherwise openpyxl)")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running: whenever the export changes, re-run only the analyses whose "
+                             "data, responses, code or options changed, scoring only new or changed "
+                             "responses (implies --incremental)")
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help="Seconds between checks of the export in --watch mode (default: 5)")
+    args = parser.parse_args(argv)
+
+    # Preserve the order in TASKS regardless of the order given on the command line
+    task_names = [name for name in TASKS if name in args.tasks]
+
+    options = {'incremental': args.incremental, 'formats': args.formats, 'xlsx_engine': args.xlsx_engine,
+               'memo': not args.no_memo}
+    # The questionnaire scores are not built from trials, so they have no bootstrap
+    bootstrap = {'bootstrap': args.bootstrap, 'bootstrap_workers': args.bootstrap_workers}
+    # Split-half reliabilities are computed for the PST and WSAP bias indices
+    reliability = {'reliability': args.reliability, 'reliability_workers': args.reliability_workers}
+    task_options = {'ast': bootstrap, 'sst': bootstrap, 'pst': {**bootstrap, **reliability},
+                    'wsap': {'ddm_format': args.ddm_format, **bootstrap, **reliability}}
+    if args.watch:
+        return watch(args.input, task_names, interval=args.interval, workers=args.workers, options=options,
+                     task_options=task_options, reader=args.reader, use_cache=not args.no_cache)
+
+    columns = required_columns(task_names)
+    start = time.perf_counter()
+    df = load_qualtrics_export(args.input, use_cache=not args.no_cache, reader=args.reader, columns=columns)
+    load_time = time.perf_counter() - start
+
+    timings = run_all(df, task_names, workers=args.workers, options=options, profile=args.profile,
+                      task_options=task_options)
+    total_time = time.perf_counter() - start
+
+    print("\nRun summary:")
+    print(f"  {'load':<15} {load_time:8.2f}s  ({len(df)} responses)")
+    for task_name in task_names:
+        status, elapsed, _ = timings[task_name]
+        print(f"  {task_name:<15} {elapsed:8.2f}s  {status}")
+    print(f"  {'total':<15} {total_time:8.2f}s")
+
+    if args.profile:
+        report_file = os.path.join(ANALYSIS_DIR, "run_report.json")
+        with open(report_file, 'w') as f:
+            json.dump({
+                'input': os.path.abspath(args.input),
+                'responses': len(df),
+                'load_seconds': load_time,
+                'total_seconds': total_time,
+                'peak_rss_mb': peak_rss_mb(),
+                'tasks': {task_name: {'status': status, 'seconds': elapsed, 'report': report}
+                          for task_name, (status, elapsed, report) in timings.items()}
+            }, f, indent=2)
+        print(f"\nRun report saved to: {report_file}")
+
+    return 0 if all(status == 'ok' for status, _, _ in timings.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""
+Run all analyses on many Qualtrics exports (e.g. several sites and waves).
+
+Exports are given as files, directories (searched recursively for exports
+whose name matches --pattern) or glob patterns. Every export is loaded once
+into its columnar cache, then each (export, analysis) pair runs as its own job
+in a process pool, so the run uses every core however the work is split
+between exports and analyses.
+
+Each export gets the usual result files in its own folder under --output,
+named after its path relative to the exports' common folder:
+
+    batch_results/site_a/wave_1/1_values_excel/AST/ast_analysis_results.xlsx
+    batch_results/site_b/wave_1/1_values_excel/AST/ast_analysis_results.xlsx
+
+and batch_results/merged/ holds one workbook per analysis in which every table
+is the concatenation of that table over all exports, with the export it came
+from in a leading Source_File column. Trial-level DDM datasets and the WSAP
+quality report are only written per export.
+
+Usage:
+    python3 run_batch.py exports/
+    python3 run_batch.py "exports/*/wave_*/1_values_excel.xlsx" --workers 8
+    python3 run_batch.py exports/ --tasks sst pst --formats xlsx parquet
+"""
+
+import argparse
+import fnmatch
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+ANALYSIS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ANALYSIS_DIR)
+
+from common.loader import CACHE_DIR_NAME, load_qualtrics_export
+from common.output import OUTPUT_FORMATS, XLSX_ENGINES, ResultWriter, capture_tables
+from common.readers import DELIMITED_EXTENSIONS, READERS, XLSX_EXTENSIONS
+from run_all_analyses import TASKS, load_task_module, pool_context, required_columns
+
+EXPORT_EXTENSIONS = XLSX_EXTENSIONS + tuple(DELIMITED_EXTENSIONS)
+
+SOURCE_COLUMN = 'Source_File'
+MERGED_DIR_NAME = "merged"
+
+
+def find_exports(paths, pattern="*values*"):
+    """
+    Return the export files named by paths (files, directories or glob
+    patterns), sorted and without duplicates
+
+    Directories are searched recursively for files matching pattern with an
+    export extension; cache folders (names starting with '.') are skipped.
+    """
+    exports = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = [name for name in dirs if not name.startswith('.')]
+                exports.update(os.path.join(root, name) for name in fnmatch.filter(files, pattern))
+        elif os.path.isfile(path):
+            exports.add(path)
+        else:
+            exports.update(glob.glob(path, recursive=True))
+    return sorted(os.path.abspath(path) for path in exports
+                  if os.path.splitext(path)[1].lower() in EXPORT_EXTENSIONS
+                  and not os.path.basename(path).startswith('~$'))
+
+
+def source_names(exports):
+    """
+    Return each export's path relative to the exports' common folder, which
+    tags its results and names its output folder
+    """
+    if len(exports) == 1:
+        return [os.path.basename(exports[0])]
+    root = os.path.commonpath([os.path.dirname(path) for path in exports])
+    return [os.path.relpath(path, root) for path in exports]
+
+
+def _export_state_dir(export_file):
+    """
+    Folder of an export's trial stores and incremental state, next to its
+    columnar cache
+    """
+    export_dir, base_name = os.path.split(export_file)
+    return os.path.join(export_dir, CACHE_DIR_NAME, os.path.splitext(base_name)[0])
+
+
+def prepare_export(export_file, reader='auto'):
+    """
+    Build (or validate) an export's columnar cache; returns its number of responses
+    """
+    return len(load_qualtrics_export(export_file, reader=reader, columns=[]))
+
+
+def run_export_task(export_file, task_name, output_dir, options, reader='auto', use_cache=True):
+    """
+    Run one analysis on one export, writing its result files to output_dir
+
+    The analysis' console output goes to <task>_log.txt in its output folder.
+    Returns (status, wall-clock seconds, tables written); a failing analysis
+    is reported rather than aborting the batch.
+    """
+    import common.incremental as incremental
+    import common.trial_store as trial_store
+
+    # Exports must not share (and prune) each other's stores and state
+    state_dir = _export_state_dir(export_file)
+    trial_store.DEFAULT_STORE_DIR = os.path.join(state_dir, "trials")
+    incremental.DEFAULT_STATE_DIR = os.path.join(state_dir, "incremental")
+
+    subfolder, _, entry_point = TASKS[task_name]
+    task_dir = os.path.join(output_dir, subfolder)
+    os.makedirs(task_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    tables = []
+    with open(os.path.join(task_dir, f"{task_name}_log.txt"), 'w') as log, redirect_stdout(log):
+        try:
+            module = load_task_module(task_name)
+            df = load_qualtrics_export(export_file, use_cache=use_cache, reader=reader,
+                                       columns=module.REQUIRED_COLUMNS)
+            with capture_tables() as tables:
+                getattr(module, entry_point)(df, output_dir=task_dir, **options)
+            status = 'ok'
+        except Exception as e:
+            status = f"failed: {type(e).__name__}: {e}"
+    return status, time.perf_counter() - start, tables
+
+
+def merge_tables(tagged_tables):
+    """
+    Concatenate the tables of several exports
+
+    tagged_tables is a list of (source, tables) in export order, with tables
+    as recorded by capture_tables(). Returns {workbook: [(sheet_name,
+    table_name, merged DataFrame), ...]} in the order the tables were first
+    written; every merged table starts with the Source_File column.
+    """
+    merged = {}
+    for source, tables in tagged_tables:
+        for table in tables:
+            df = table['df'].copy()
+            df.insert(0, SOURCE_COLUMN, source)
+            parts = merged.setdefault(table['workbook'], {})
+            key = (table['sheet_name'], table['table_name'])
+            parts.setdefault(key, []).append(df)
+    return {workbook: [(sheet_name, table_name, pd.concat(frames, ignore_index=True))
+                       for (sheet_name, table_name), frames in parts.items()]
+            for workbook, parts in merged.items()}
+
+
+def write_merged(merged, output_dir, formats=('xlsx',), xlsx_engine='auto'):
+    """
+    Write merged tables (see merge_tables) as one workbook per analysis;
+    tables sharing a sheet are placed one below the other, a row apart.
+    Returns the paths written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = []
+    for workbook, tables in merged.items():
+        next_row = {}
+        with ResultWriter(os.path.join(output_dir, workbook), formats, xlsx_engine) as writer:
+            for sheet_name, table_name, df in tables:
+                startrow = next_row.get(sheet_name, 0)
+                writer.write(df, sheet_name, startrow=startrow, table_name=table_name)
+                # Header row, data rows and a blank row
+                next_row[sheet_name] = startrow + len(df) + 2
+        outputs += writer.outputs
+    return outputs
+
+
+def run_batch(exports, output_dir, task_names, workers=None, options=None, task_options=None,
+              reader='auto', use_cache=True):
+    """
+    Run the given analyses on every export in a process pool and write the
+    merged results
+
+    Returns (number of responses per export, {(export, task): (status,
+    seconds)}, merged output paths); exports that cannot be read have None
+    responses and a failed status for every task.
+    """
+    sources = source_names(exports)
+    export_dirs = {export: os.path.join(output_dir, os.path.splitext(source)[0])
+                   for export, source in zip(exports, sources)}
+    task_options = {task_name: {**(options or {}), **(task_options or {}).get(task_name, {})}
+                    for task_name in task_names}
+    workers = workers or os.cpu_count() or 1
+
+    # Import the task modules up front so forked workers inherit them
+    required_columns(task_names)
+
+    responses = {}
+    results = {}
+    tables = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+        # Parse every export into its cache first, so the analyses of an
+        # export share one parse instead of racing to write the cache
+        if use_cache:
+            futures = {pool.submit(prepare_export, export, reader): export for export in exports}
+            for future in as_completed(futures):
+                export = futures[future]
+                try:
+                    responses[export] = future.result()
+                except Exception as e:
+                    responses[export] = None
+                    for task_name in task_names:
+                        results[export, task_name] = (f"failed: {type(e).__name__}: {e}", 0.0)
+
+        futures = {}
+        for export in exports:
+            if use_cache and responses[export] is None:
+                continue
+            for task_name in task_names:
+                future = pool.submit(run_export_task, export, task_name, export_dirs[export],
+                                     task_options[task_name], reader, use_cache)
+                futures[future] = (export, task_name)
+        for future in as_completed(futures):
+            export, task_name = futures[future]
+            status, seconds, tables[export, task_name] = future.result()
+            results[export, task_name] = (status, seconds)
+            print(f"  {sources[exports.index(export)]}: {task_name} {status} ({seconds:.2f}s)")
+
+    # Merge in export order so the merged tables are the same on every run
+    tagged_tables = [(source, tables[export, task_name])
+                     for task_name in task_names for export, source in zip(exports, sources)
+                     if (export, task_name) in tables]
+    merged_outputs = write_merged(merge_tables(tagged_tables), os.path.join(output_dir, MERGED_DIR_NAME),
+                                  task_options[task_names[0]].get('formats', ('xlsx',)),
+                                  task_options[task_names[0]].get('xlsx_engine', 'auto'))
+    return responses, results, merged_outputs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Qualtrics analyses on many exports in parallel.")
+    parser.add_argument('exports', nargs='+',
+                        help="Export files, directories to search, or glob patterns")
+    parser.add_argument('--pattern', default="*values*",
+                        help="File name pattern of exports within directories (default: *values*)")
+    parser.add_argument('--output', default=os.path.join(ANALYSIS_DIR, "batch_results"),
+                        help="Output folder (default: Analysis/batch_results)")
+    parser.add_argument('--tasks', nargs='+', choices=list(TASKS), default=list(TASKS),
+                        help="Analyses to run (default: all)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of worker processes (default: the CPU count)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Read the exports directly instead of using their columnar caches")
+    parser.add_argument('--reader', choices=READERS, default='auto',
+                        help="Export reader (default: the fastest installed one for the file type)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only score responses that are new or changed since the last run of each export")
+    parser.add_argument('--no-memo', action='store_true',
+                        help="Recompute every stage instead of re-using the results of earlier runs")
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                        help="Add bootstrap confidence intervals from N resamples to the summary sheets")
+    parser.add_argument('--bootstrap-workers', type=int, default=1,
+                        help="Processes each analysis spreads its bootstrap resamples over (default: 1)")
+    parser.add_argument('--reliability', type=int, default=0, metavar='N',
+                        help="Add split-half reliabilities of the PST and WSAP scores over N random splits "
+                             "to the summary sheets")
+    parser.add_argument('--reliability-workers', type=int, default=1,
+                        help="Processes each analysis spreads its split-half splits over (default: 1)")
+    parser.add_argument('--formats', nargs='+', choices=OUTPUT_FORMATS, default=['xlsx'],
+                        help="Result files to write (default: xlsx)")
+    parser.add_argument('--ddm-format', choices=['csv', 'parquet'], default='csv',
+                        help="Format of the WSAP DDM datasets (default: csv)")
+    parser.add_argument('--xlsx-engine', choices=XLSX_ENGINES, default='auto',
+                        help="Workbook writer (default: xlsxwriter when installed, otherwise openpyxl)")
+    args = parser.parse_args(argv)
+
+    exports = find_exports(args.exports, args.pattern)
+    if not exports:
+        print("No exports found")
+        return 1
+    task_names = [name for name in TASKS if name in args.tasks]
+    output_dir = os.path.abspath(args.output)
+
+    print(f"Running {len(task_names)} analyses on {len(exports)} exports")
+    start = time.perf_counter()
+    options = {'incremental': args.incremental, 'formats': args.formats, 'xlsx_engine': args.xlsx_engine,
+               'memo': not args.no_memo}
+    # The questionnaire scores are not built from trials, so they have no bootstrap
+    bootstrap = {'bootstrap': args.bootstrap, 'bootstrap_workers': args.bootstrap_workers}
+    # Split-half reliabilities are computed for the PST and WSAP bias indices
+    reliability = {'reliability': args.reliability, 'reliability_workers': args.reliability_workers}
+    task_options = {'ast': bootstrap, 'sst': bootstrap, 'pst': {**bootstrap, **reliability},
+                    'wsap': {'ddm_format': args.ddm_format, **bootstrap, **reliability}}
+    responses, results, merged_outputs = run_batch(
+        exports, output_dir, task_names, workers=args.workers, options=options,
+        task_options=task_options, reader=args.reader,
+        use_cache=not args.no_cache)
+    total_time = time.perf_counter() - start
+
+    print("\nBatch summary:")
+    for export, source in zip(exports, source_names(exports)):
+        n_responses = responses.get(export)
+        statuses = [results[export, task_name][0] for task_name in task_names]
+        n_ok = sum(status == 'ok' for status in statuses)
+        print(f"  {source:<40} {n_ok}/{len(task_names)} ok"
+              + (f"  ({n_responses} responses)" if n_responses is not None else ""))
+        for task_name, status in zip(task_names, statuses):
+            if status != 'ok':
+                print(f"    {task_name}: {status}")
+    total_responses = sum(n for n in responses.values() if n)
+    print(f"  {'total':<40} {total_time:.2f}s"
+          + (f"  ({total_responses / total_time:.0f} responses/s)" if total_responses else ""))
+    print(f"\nPer-export results saved to: {output_dir}")
+    if merged_outputs:
+        print(f"Merged results saved to: {', '.join(merged_outputs)}")
+
+    return 0 if all(status == 'ok' for status, _ in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())